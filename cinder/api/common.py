@@ -102,6 +102,21 @@ def _get_marker_param(request):
     return request.GET['marker']
 
 
+def remove_invalid_options(context, filters, allowed_search_options):
+    """Remove search options that are not valid for non-admin API/context."""
+    if context.is_admin:
+        # Allow all options
+        return
+    # Otherwise, strip out all unknown options
+    unknown_options = [opt for opt in filters
+                       if opt not in allowed_search_options]
+    bad_options = ", ".join(unknown_options)
+    log_msg = _("Removing options '%s' from query") % bad_options
+    LOG.debug(log_msg)
+    for opt in unknown_options:
+        del filters[opt]
+
+
 def limited(items, request, max_limit=CONF.osapi_max_limit):
     """Return a slice of items according to requested offset and limit.
 
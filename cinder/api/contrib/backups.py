@@ -194,10 +194,37 @@ class BackupsController(wsgi.Controller):
         """Returns a detailed list of backups."""
         return self._get_backups(req, is_detail=True)
 
+    def _get_backup_filter_options(self):
+        """Return backup search options allowed by non-admin."""
+        return ('name', 'status', 'volume_id')
+
     def _get_backups(self, req, is_detail):
         """Returns a list of backups, transformed through view builder."""
         context = req.environ['cinder.context']
-        backups = self.backup_api.get_all(context)
+        params = common.get_pagination_params(req)
+        marker = params.get('marker')
+        limit = params.get('limit')
+        if 'offset' in req.GET:
+            # NOTE: common.limited applies the offset to the rows returned,
+            #       so the rows before the offset have to be fetched too.
+            limit = None
+
+        filters = req.GET.copy()
+        for key in ('limit', 'offset', 'marker'):
+            filters.pop(key, None)
+        sort_key = filters.pop('sort_key', 'created_at')
+        sort_dir = filters.pop('sort_dir', 'asc')
+
+        common.remove_invalid_options(context, filters,
+                                      self._get_backup_filter_options())
+
+        if 'name' in filters:
+            filters['display_name'] = filters.pop('name')
+
+        backups = self.backup_api.get_all(context, search_opts=filters,
+                                          marker=marker, limit=limit,
+                                          sort_key=sort_key,
+                                          sort_dir=sort_dir)
         limited_list = common.limited(backups, req)
 
         if is_detail:
@@ -33,15 +33,19 @@ class VolumeImageMetadataController(wsgi.Controller):
         super(VolumeImageMetadataController, self).__init__(*args, **kwargs)
         self.volume_api = volume.API()
 
-    def _get_all_images_metadata(self, context):
-        """Returns the image metadata for all volumes."""
-        try:
-            all_metadata = self.volume_api.get_volumes_image_metadata(context)
-        except Exception as e:
-            LOG.debug('Problem retrieving volume image metadata. '
-                      'It will be skipped. Error: %s', e)
-            all_metadata = {}
-        return all_metadata
+    def _get_images_metadata(self, req, context, volume_ids):
+        """Returns the image metadata for the given volumes."""
+        def fetch(ids):
+            try:
+                return self.volume_api.get_volumes_image_metadata(context,
+                                                                  ids)
+            except Exception as e:
+                LOG.debug('Problem retrieving volume image metadata. '
+                          'It will be skipped. Error: %s', e)
+                return {}
+
+        return req.cached_resources_by_ids(volume_ids, fetch,
+                                           'volume_image_metadata')
 
     def _add_image_metadata(self, context, resp_volume, image_meta=None):
         """Appends the image metadata to the given volume.
@@ -75,9 +79,12 @@ class VolumeImageMetadataController(wsgi.Controller):
         context = req.environ['cinder.context']
         if authorize(context):
             resp_obj.attach(xml=VolumesImageMetadataTemplate())
-            all_meta = self._get_all_images_metadata(context)
-            for volume in list(resp_obj.obj.get('volumes', [])):
-                image_meta = all_meta.get(volume['id'], {})
+            volumes = list(resp_obj.obj.get('volumes', []))
+            # Only look up the volumes on this page.
+            all_meta = self._get_images_metadata(
+                req, context, [volume['id'] for volume in volumes])
+            for volume in volumes:
+                image_meta = all_meta[volume['id']] or {}
                 self._add_image_metadata(context, volume, image_meta)
 
 
@@ -0,0 +1,215 @@
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Stores for the per-user state of the rate limiting middleware.
+"""
+
+import collections
+import contextlib
+import fcntl
+import hashlib
+import os
+import time
+
+from oslo.config import cfg
+
+from cinder.openstack.common import fileutils
+from cinder.openstack.common import jsonutils
+
+
+ratelimit_opts = [
+    cfg.StrOpt('ratelimit_store',
+               default='memory',
+               help='where the rate limiting middleware keeps the state of '
+                    'the limits: "memory" keeps it in each API process, '
+                    '"file" shares it between the API processes of a host'),
+    cfg.IntOpt('ratelimit_max_users',
+               default=10000,
+               help='number of users the "memory" rate limit store keeps '
+                    'limits for, the least recently seen users are '
+                    'dropped first, 0 means no limit'),
+    cfg.StrOpt('ratelimit_store_path',
+               default='$state_path/ratelimit',
+               help='directory the "file" rate limit store keeps its '
+                    'state in'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(ratelimit_opts)
+
+# Attributes of a Limit which change as requests come in.
+LIMIT_STATE = ('water_level', 'last_request', 'next_request', 'remaining')
+
+
+class MemoryStore(object):
+    """Keeps the limits of each user in process.
+
+    Once there are more than `max_users` users, the least recently seen
+    ones are dropped; their limits start over when they come back.
+    """
+
+    def __init__(self, factory, max_users=0):
+        """Initialize a new `MemoryStore`.
+
+        @param factory: Callable returning a fresh list of `Limit` objects
+                        for a username
+        @param max_users: Number of users to keep limits for, 0 for no limit
+        """
+        self._factory = factory
+        self._max_users = max_users
+        self._levels = collections.OrderedDict()
+
+    def __getitem__(self, username):
+        try:
+            limits = self._levels.pop(username)
+        except KeyError:
+            limits = self._factory(username)
+        self._levels[username] = limits
+
+        if self._max_users > 0:
+            while len(self._levels) > self._max_users:
+                self._levels.popitem(last=False)
+        return limits
+
+    def __len__(self):
+        return len(self._levels)
+
+    @contextlib.contextmanager
+    def locked(self, username):
+        """Yield the limits of a user to check a request against."""
+        yield self[username]
+
+
+class FileStore(object):
+    """Keeps the limits of each user in files shared by API processes.
+
+    Every user gets a file holding the state of its limits, a request
+    holds an exclusive lock on the file while it is checked.  Once per
+    longest limit interval the files of users whose limits have all
+    drained are removed; such a user starts over like a new one.
+    """
+
+    def __init__(self, factory, path):
+        """Initialize a new `FileStore`.
+
+        @param factory: Callable returning a fresh list of `Limit` objects
+                        for a username
+        @param path: Directory to keep the state files in
+        """
+        self._factory = factory
+        self._path = path
+        self._expire_interval = max([limit.unit
+                                     for limit in factory(None)] or [0])
+        self._last_expire = time.time()
+        fileutils.ensure_tree(path)
+
+    def _filename(self, username):
+        key = hashlib.sha1((username or '').encode('utf-8')).hexdigest()
+        return os.path.join(self._path, key)
+
+    @staticmethod
+    def _load(limits, data):
+        try:
+            state = jsonutils.loads(data)
+        except ValueError:
+            return
+        # NOTE: state saved for another set of limits, i.e. before the
+        # limits were reconfigured, is dropped.
+        if not isinstance(state, list) or len(state) != len(limits):
+            return
+        for limit, values in zip(limits, state):
+            for name, value in zip(LIMIT_STATE, values):
+                setattr(limit, name, value)
+
+    @staticmethod
+    def _dump(limits):
+        return jsonutils.dumps([[getattr(limit, name) for name in LIMIT_STATE]
+                                for limit in limits])
+
+    def __getitem__(self, username):
+        limits = self._factory(username)
+        try:
+            with open(self._filename(username)) as f:
+                self._load(limits, f.read())
+        except IOError:
+            pass
+        return limits
+
+    @contextlib.contextmanager
+    def locked(self, username):
+        """Yield the limits of a user to check a request against.
+
+        Their state is written back once the check is done.
+        """
+        limits = self._factory(username)
+        fd = os.open(self._filename(username), os.O_RDWR | os.O_CREAT, 0o600)
+        with os.fdopen(fd, 'r+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            self._load(limits, f.read())
+            yield limits
+            f.seek(0)
+            f.truncate()
+            f.write(self._dump(limits))
+
+        # NOTE: expire outside of the lock above, flock would otherwise
+        # block on the file of this user.
+        now = time.time()
+        if now - self._last_expire > self._expire_interval:
+            self._last_expire = now
+            self.expire(now)
+
+    @staticmethod
+    def _drained(limits, now):
+        # NOTE: Limit leaks one unit of water per second.
+        return all(limit.last_request is None or
+                   limit.last_request + limit.water_level <= now
+                   for limit in limits)
+
+    def expire(self, now=None):
+        """Remove the files of users whose limits have all drained.
+
+        A user idle for longer than its limits take to drain has the
+        same state as one never seen, so its file is not needed.
+        """
+        now = now or time.time()
+        for name in os.listdir(self._path):
+            filename = os.path.join(self._path, name)
+            try:
+                with open(filename) as f:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    limits = self._factory(None)
+                    self._load(limits, f.read())
+                    if self._drained(limits, now):
+                        os.unlink(filename)
+            except (IOError, OSError):
+                # NOTE: removed by another API process meanwhile.
+                pass
+
+
+STORES = {
+    'memory': lambda factory: MemoryStore(factory, CONF.ratelimit_max_users),
+    'file': lambda factory: FileStore(factory, CONF.ratelimit_store_path),
+}
+
+
+def get_store(factory):
+    """Return the configured store for the limits `factory` builds."""
+    try:
+        store = STORES[CONF.ratelimit_store]
+    except KeyError:
+        raise ValueError(_("Unknown rate limit store %s") %
+                         CONF.ratelimit_store)
+    return store(factory)
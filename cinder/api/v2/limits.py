@@ -17,7 +17,6 @@
 Module dedicated functions/classes dealing with rate limiting requests.
 """
 
-import collections
 import copy
 import httplib
 import math
@@ -28,6 +27,7 @@ import webob.dec
 import webob.exc
 
 from cinder.api.openstack import wsgi
+from cinder.api import ratelimit
 from cinder.api.views import limits as limits_views
 from cinder.api import xmlutil
 from cinder.openstack.common import importutils
@@ -131,6 +131,7 @@ class Limit(object):
 
         self.last_request = None
         self.next_request = None
+        self._regex = None
 
         self.water_level = 0
         self.capacity = self.unit
@@ -139,13 +140,21 @@ class Limit(object):
                 "made to %(uri)s every %(unit_string)s.")
         self.error_message = msg % self.__dict__
 
+    def __deepcopy__(self, memo):
+        """Copy the limit, sharing its compiled regular expression."""
+        return copy.copy(self)
+
     def __call__(self, verb, url):
         """Represent a call to this limit from a relevant request.
 
         @param verb: string http verb (POST, GET, etc.)
         @param url: string URL
         """
-        if self.verb != verb or not re.match(self.regex, url):
+        if self.verb != verb:
+            return
+        if self._regex is None:
+            self._regex = re.compile(self.regex)
+        if not self._regex.match(url):
             return
 
         now = self._get_time()
@@ -210,7 +219,8 @@ DEFAULT_LIMITS = [
 class RateLimitingMiddleware(base_wsgi.Middleware):
     """Rate-limits requests passing through this middleware.
 
-    All limit information is stored in memory for this implementation.
+    The state of the limits is kept in the store selected by the
+    ratelimit_store option.
     """
 
     def __init__(self, application, limits=None, limiter=None, **kwargs):
@@ -268,7 +278,7 @@ class RateLimitingMiddleware(base_wsgi.Middleware):
 
 
 class Limiter(object):
-    """Rate-limit checking class which handles limits in memory."""
+    """Rate-limit checking class which handles limits in a local store."""
 
     def __init__(self, limits, **kwargs):
         """Initialize the new `Limiter`.
@@ -276,13 +286,32 @@ class Limiter(object):
         @param limits: List of `Limit` objects
         """
         self.limits = copy.deepcopy(limits)
-        self.levels = collections.defaultdict(lambda: copy.deepcopy(limits))
+        self.user_limits = {}
 
         # Pick up any per-user limit information
         for key, value in kwargs.items():
             if key.startswith(LIMITS_PREFIX):
                 username = key[len(LIMITS_PREFIX):]
-                self.levels[username] = self.parse_limits(value)
+                self.user_limits[username] = self.parse_limits(value)
+
+        # Positions of the limits for each verb, so that a request is
+        # only checked against the limits of its verb.
+        self._verb_indexes = self._index_limits(self.limits)
+        self._user_verb_indexes = dict(
+            (username, self._index_limits(user_limits))
+            for username, user_limits in self.user_limits.items())
+
+        self.levels = ratelimit.get_store(self._make_limits)
+
+    @staticmethod
+    def _index_limits(limits):
+        indexes = {}
+        for index, limit in enumerate(limits):
+            indexes.setdefault(limit.verb, []).append(index)
+        return indexes
+
+    def _make_limits(self, username):
+        return copy.deepcopy(self.user_limits.get(username, self.limits))
 
     def get_limits(self, username=None):
         """Return the limits for a given user."""
@@ -295,10 +324,18 @@ class Limiter(object):
         """
         delays = []
 
-        for limit in self.levels[username]:
-            delay = limit(verb, url)
-            if delay:
-                delays.append((delay, limit.error_message))
+        verb_indexes = self._user_verb_indexes.get(username,
+                                                   self._verb_indexes)
+        indexes = verb_indexes.get(verb)
+        if not indexes:
+            return None, None
+
+        with self.levels.locked(username) as levels:
+            for index in indexes:
+                limit = levels[index]
+                delay = limit(verb, url)
+                if delay:
+                    delays.append((delay, limit.error_message))
 
         if delays:
             delays.sort()
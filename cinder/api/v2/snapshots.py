@@ -20,7 +20,6 @@ from webob import exc
 
 from cinder.api import common
 from cinder.api.openstack import wsgi
-from cinder.api.v2 import volumes
 from cinder.api import xmlutil
 from cinder import exception
 from cinder.openstack.common import log as logging
@@ -142,15 +141,25 @@ class SnapshotsController(wsgi.Controller):
         """Returns a list of snapshots, transformed through entity_maker."""
         context = req.environ['cinder.context']
 
-        #pop out limit and offset , they are not search_opts
+        params = common.get_pagination_params(req)
+        marker = params.get('marker')
+        limit = params.get('limit')
+        if 'offset' in req.GET:
+            # NOTE: common.limited applies the offset to the rows returned,
+            #       so the rows before the offset have to be fetched too.
+            limit = None
+
+        #pop out the pagination and sort params, they are not search_opts
         search_opts = req.GET.copy()
-        search_opts.pop('limit', None)
-        search_opts.pop('offset', None)
+        for key in ('limit', 'offset', 'marker'):
+            search_opts.pop(key, None)
+        sort_key = search_opts.pop('sort_key', 'created_at')
+        sort_dir = search_opts.pop('sort_dir', 'asc')
 
         #filter out invalid option
         allowed_search_options = ('status', 'volume_id', 'name')
-        volumes.remove_invalid_options(context, search_opts,
-                                       allowed_search_options)
+        common.remove_invalid_options(context, search_opts,
+                                      allowed_search_options)
 
         # NOTE(thingee): v2 API allows name instead of display_name
         if 'name' in search_opts:
@@ -158,7 +167,11 @@ class SnapshotsController(wsgi.Controller):
             del search_opts['name']
 
         snapshots = self.volume_api.get_all_snapshots(context,
-                                                      search_opts=search_opts)
+                                                      search_opts=search_opts,
+                                                      marker=marker,
+                                                      limit=limit,
+                                                      sort_key=sort_key,
+                                                      sort_dir=sort_dir)
         limited_list = common.limited(snapshots, req)
         res = [entity_maker(context, snapshot) for snapshot in limited_list]
         return {'snapshots': res}
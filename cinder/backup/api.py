@@ -66,21 +66,43 @@ class API(base.Base):
             msg = _('Backup status must be available or error')
             raise exception.InvalidBackup(reason=msg)
 
+        # Incremental backups only hold the chunks that changed since their
+        # parent, so the parent has to outlive all of its children.  Only
+        # finished children count: one which failed, or which is stuck in
+        # 'creating' because its backup service died, holds nothing that
+        # can be restored and must not pin its parent forever.
+        dependents = [b for b in self.db.backup_get_all_by_volume(
+                      context, backup['volume_id'])
+                      if b['parent_id'] == backup_id and
+                      b['status'] in ['available', 'restoring']]
+        if dependents:
+            msg = _('Backup has dependent incremental backups')
+            raise exception.InvalidBackup(reason=msg)
+
         self.db.backup_update(context, backup_id, {'status': 'deleting'})
         self.backup_rpcapi.delete_backup(context,
                                          backup['host'],
                                          backup['id'])
 
-    # TODO(moorehef): Add support for search_opts, discarded atm
-    def get_all(self, context, search_opts=None):
-        if search_opts is None:
-            search_opts = {}
+    def get_all(self, context, search_opts=None, marker=None, limit=None,
+                sort_key='created_at', sort_dir='asc'):
         check_policy(context, 'get_all')
+        search_opts = dict(search_opts or {})
+        # Admins always see the backups of all tenants.
+        search_opts.pop('all_tenants', None)
+
+        if search_opts:
+            LOG.debug(_("Searching by: %s") % search_opts)
+
         if context.is_admin:
-            backups = self.db.backup_get_all(context)
+            backups = self.db.backup_get_all(context, marker, limit, sort_key,
+                                             sort_dir, filters=search_opts)
         else:
             backups = self.db.backup_get_all_by_project(context,
-                                                        context.project_id)
+                                                        context.project_id,
+                                                        marker, limit,
+                                                        sort_key, sort_dir,
+                                                        filters=search_opts)
 
         return backups
 
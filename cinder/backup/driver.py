@@ -172,10 +172,8 @@ class BackupMetadataAPI(base.Base):
         metadata = self._filter(metadata, fields)
         self.db.volume_glance_metadata_delete_by_volume(self.context,
                                                         volume_id)
-        for key, value in metadata.items():
-            self.db.volume_glance_metadata_create(self.context,
-                                                  volume_id,
-                                                  key, value)
+        self.db.volume_glance_metadata_bulk_create(self.context, volume_id,
+                                                   metadata)
 
         # Now mark the volume as bootable
         self.db.volume_update(self.context, volume_id,
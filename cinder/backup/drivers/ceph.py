@@ -86,7 +86,11 @@ service_opts = [
                help='RBD stripe count to use when creating a backup image.'),
     cfg.BoolOpt('restore_discard_excess_bytes', default=True,
                 help='If True, always discard excess bytes when restoring '
-                     'volumes i.e. pad with zeroes.')
+                     'volumes i.e. pad with zeroes.'),
+    cfg.IntOpt('backup_ceph_connection_pool_size', default=4,
+               help='The maximum number of idle connections to the backup '
+                    'Ceph cluster kept open for reuse. Zero connects to the '
+                    'cluster for every operation.')
 ]
 
 CONF = cfg.CONF
@@ -232,25 +236,19 @@ class CephBackupDriver(BackupDriver):
 
         return (old_format, features)
 
+    def _get_connection_pool(self):
+        return rbd_driver.get_connection_pool(
+            self.rados, self._ceph_backup_user, self._ceph_backup_conf,
+            CONF.backup_ceph_connection_pool_size)
+
     def _connect_to_rados(self, pool=None):
         """Establish connection to the backup Ceph cluster."""
-        client = self.rados.Rados(rados_id=self._ceph_backup_user,
-                                  conffile=self._ceph_backup_conf)
-        try:
-            client.connect()
-            pool_to_open = strutils.safe_encode(pool or self._ceph_backup_pool)
-            ioctx = client.open_ioctx(pool_to_open)
-            return client, ioctx
-        except self.rados.Error:
-            # shutdown cannot raise an exception
-            client.shutdown()
-            raise
+        pool_to_open = strutils.safe_encode(pool or self._ceph_backup_pool)
+        return self._get_connection_pool().get(pool_to_open)
 
-    def _disconnect_from_rados(self, client, ioctx):
-        """Terminate connection with the backup Ceph cluster."""
-        # closing an ioctx cannot raise an exception
-        ioctx.close()
-        client.shutdown()
+    def _disconnect_from_rados(self, client, ioctx, failed=False):
+        """Return a connection to the backup Ceph cluster to the pool."""
+        self._get_connection_pool().put(client, failed=failed)
 
     def _get_backup_base_name(self, volume_id, backup_id=None,
                               diff_format=False):
@@ -279,7 +277,8 @@ class CephBackupDriver(BackupDriver):
             LOG.debug(_("Discarding %(length)s bytes from offset %(offset)s") %
                       {'length': length, 'offset': offset})
             if self._file_is_rbd(volume):
-                volume.rbd_image.discard(offset, length)
+                rbd_driver.execute_native(volume.rbd_image.discard, offset,
+                                          length)
             else:
                 zeroes = '\0' * length
                 chunks = int(length / self.chunk_size)
@@ -437,7 +436,8 @@ class CephBackupDriver(BackupDriver):
                 LOG.info(_("Deleting base image='%s'") % (base_name))
                 # Delete base if no more snapshots
                 try:
-                    self.rbd.RBD().remove(client.ioctx, base_name)
+                    rbd_driver.execute_native(self.rbd.RBD().remove,
+                                              client.ioctx, base_name)
                 except self.rbd.ImageBusy as exc:
                     # Allow a retry if the image is busy
                     if retries > 0:
@@ -1002,7 +1002,8 @@ class CephBackupDriver(BackupDriver):
             if exists:
                 extents.append(length)
 
-        rbd_volume.diff_iterate(0, rbd_volume.size(), None, iter_cb)
+        rbd_driver.execute_native(rbd_volume.diff_iterate, 0,
+                                  rbd_volume.size(), None, iter_cb)
 
         if extents:
             LOG.debug(_("RBD has %s extents") % (sum(extents)))
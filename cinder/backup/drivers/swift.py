@@ -27,23 +27,41 @@
                                     failed Swift operations (default: 10).
 :backup_compression_algorithm: Compression algorithm to use for volume
                                backups. Supported options are:
-                               None (to disable), zlib and bz2 (default: zlib)
+                               None (to disable), zlib, bz2, lz4 and zstd
+                               (default: zlib)
+:backup_swift_enable_incremental: Only upload the objects whose content
+                                  changed since the previous backup of the
+                                  same volume (default: False).
+:backup_swift_max_incremental_chain: The number of incremental backups that
+                                     may be stacked on top of a full backup
+                                     before a new full backup is taken
+                                     (default: 10).
+:backup_swift_concurrency: The number of Swift objects uploaded or
+                           downloaded in parallel by a single backup or
+                           restore (default: 4).
 """
 
+import collections
 import hashlib
 import json
 import os
 import six
 import socket
+import stat
 
 import eventlet
+from eventlet import pools
+from eventlet import tpool
 from oslo.config import cfg
 
 from cinder.backup.driver import BackupDriver
 from cinder import exception
+from cinder.openstack.common import excutils
+from cinder.openstack.common import importutils
 from cinder.openstack.common import log as logging
 from cinder.openstack.common import timeutils
 from cinder import units
+from cinder import utils
 from swiftclient import client as swift
 
 
@@ -77,30 +95,52 @@ swiftbackup_service_opts = [
     cfg.StrOpt('backup_compression_algorithm',
                default='zlib',
                help='Compression algorithm (None to disable)'),
+    cfg.BoolOpt('backup_swift_enable_incremental',
+                default=False,
+                help='Only back up the objects that changed since the '
+                     'previous backup of the same volume'),
+    cfg.IntOpt('backup_swift_max_incremental_chain',
+               default=10,
+               help='The maximum number of incremental backups taken on '
+                    'top of a full backup before a new full backup is '
+                    'taken'),
+    cfg.IntOpt('backup_swift_concurrency',
+               default=4,
+               help='The number of Swift objects uploaded or downloaded in '
+                    'parallel by a single backup or restore'),
 ]
 
 CONF = cfg.CONF
 CONF.register_opts(swiftbackup_service_opts)
 
+# Compression algorithms by the names accepted in backup_compression_algorithm
+# and recorded for each object in the backup metadata. Every module listed
+# provides compress() and decompress(); lz4 and zstd are optional.
+COMPRESSORS = {
+    'zlib': 'zlib',
+    'gzip': 'zlib',
+    'bz2': 'bz2',
+    'bzip2': 'bz2',
+    'lz4': 'lz4.frame',
+    'zstd': 'zstd',
+}
+
 
 class SwiftBackupDriver(BackupDriver):
     """Provides backup, restore and delete of backup objects within Swift."""
 
-    DRIVER_VERSION = '1.0.0'
-    DRIVER_VERSION_MAPPING = {'1.0.0': '_restore_v1'}
+    DRIVER_VERSION = '1.1.0'
+    DRIVER_VERSION_MAPPING = {'1.0.0': '_restore_v1',
+                              '1.1.0': '_restore_v1_1'}
 
     def _get_compressor(self, algorithm):
-        try:
-            if algorithm.lower() in ('none', 'off', 'no'):
-                return None
-            elif algorithm.lower() in ('zlib', 'gzip'):
-                import zlib as compressor
-                return compressor
-            elif algorithm.lower() in ('bz2', 'bzip2'):
-                import bz2 as compressor
+        if algorithm.lower() in ('none', 'off', 'no'):
+            return None
+        module = COMPRESSORS.get(algorithm.lower())
+        if module is not None:
+            compressor = importutils.try_import(module)
+            if compressor is not None:
                 return compressor
-        except ImportError:
-            pass
 
         err = _('unsupported compression algorithm: %s') % algorithm
         raise ValueError(unicode(err))
@@ -115,6 +155,7 @@ class SwiftBackupDriver(BackupDriver):
         self.swift_backoff = CONF.backup_swift_retry_backoff
         self.compressor = \
             self._get_compressor(CONF.backup_compression_algorithm)
+        self.concurrency = max(CONF.backup_swift_concurrency, 1)
         LOG.debug('Connect to %s in "%s" mode' % (CONF.backup_swift_url,
                                                   CONF.backup_swift_auth))
         if CONF.backup_swift_auth == 'single_user':
@@ -123,16 +164,23 @@ class SwiftBackupDriver(BackupDriver):
                             "but %(param)s not set")
                           % {'param': 'backup_swift_user'})
                 raise exception.ParameterNotFound(param='backup_swift_user')
-            self.conn = swift.Connection(authurl=CONF.backup_swift_url,
-                                         user=CONF.backup_swift_user,
-                                         key=CONF.backup_swift_key,
-                                         retries=self.swift_attempts,
-                                         starting_backoff=self.swift_backoff)
-        else:
-            self.conn = swift.Connection(retries=self.swift_attempts,
-                                         preauthurl=self.swift_url,
-                                         preauthtoken=self.context.auth_token,
-                                         starting_backoff=self.swift_backoff)
+        self.conn = self._create_connection()
+        # NOTE: a swiftclient connection holds a single HTTP connection, so
+        # the objects transferred in parallel each borrow their own one.
+        self.conn_pool = pools.Pool(max_size=self.concurrency,
+                                    create=self._create_connection)
+
+    def _create_connection(self):
+        if CONF.backup_swift_auth == 'single_user':
+            return swift.Connection(authurl=CONF.backup_swift_url,
+                                    user=CONF.backup_swift_user,
+                                    key=CONF.backup_swift_key,
+                                    retries=self.swift_attempts,
+                                    starting_backoff=self.swift_backoff)
+        return swift.Connection(retries=self.swift_attempts,
+                                preauthurl=self.swift_url,
+                                preauthtoken=self.context.auth_token,
+                                starting_backoff=self.swift_backoff)
 
     def _create_container(self, context, backup):
         backup_id = backup['id']
@@ -174,7 +222,8 @@ class SwiftBackupDriver(BackupDriver):
         return filename
 
     def _write_metadata(self, backup, volume_id, container, object_list,
-                        volume_meta):
+                        volume_meta, sha256_list=None, parent_id=None,
+                        chain_depth=0):
         filename = self._metadata_filename(backup)
         LOG.debug(_('_write_metadata started, container name: %(container)s,'
                     ' metadata filename: %(filename)s') %
@@ -188,6 +237,10 @@ class SwiftBackupDriver(BackupDriver):
         metadata['created_at'] = str(backup['created_at'])
         metadata['objects'] = object_list
         metadata['volume_meta'] = volume_meta
+        metadata['sha256s'] = sha256_list or []
+        metadata['chunk_size'] = self.data_block_size_bytes
+        metadata['parent_id'] = parent_id
+        metadata['chain_depth'] = chain_depth
         metadata_json = json.dumps(metadata, sort_keys=True, indent=2)
         reader = six.StringIO(metadata_json)
         etag = self.conn.put_object(container, filename, reader,
@@ -244,9 +297,66 @@ class SwiftBackupDriver(BackupDriver):
                       'availability_zone': availability_zone,
                   })
         object_meta = {'id': 1, 'list': [], 'prefix': object_prefix,
-                       'volume_meta': None}
+                       'volume_meta': None, 'sha256s': [], 'parent': None,
+                       'pending': collections.deque()}
+        if CONF.backup_swift_enable_incremental:
+            object_meta['parent'] = self._find_parent_backup(backup,
+                                                             container)
         return object_meta, container
 
+    def _find_parent_backup(self, backup, container):
+        """Find the backup an incremental backup can be based on.
+
+        The parent is the most recent available backup of the same volume
+        in the same container whose metadata carries a chunk fingerprint
+        map. Returns a dict holding the parent backup id, its fingerprints
+        and its depth in the incremental chain, or None when a full backup
+        has to be taken.
+        """
+        candidates = [b for b in self.db.backup_get_all_by_volume(
+                      self.context, backup['volume_id'])
+                      if b['id'] != backup['id'] and
+                      b['status'] == 'available' and
+                      b['container'] == container]
+        if not candidates:
+            LOG.debug(_('no parent backup found for %s, taking a full '
+                        'backup') % backup['id'])
+            return None
+
+        parent = candidates[0]
+        try:
+            metadata = self._read_metadata(parent)
+        except Exception:
+            LOG.warn(_('unable to read metadata of backup %s, taking a full '
+                       'backup') % parent['id'])
+            return None
+
+        sha256s = metadata.get('sha256s')
+        if not sha256s:
+            LOG.debug(_('backup %s has no chunk fingerprints, taking a full '
+                        'backup') % parent['id'])
+            return None
+
+        chain_depth = metadata.get('chain_depth', 0) + 1
+        if chain_depth > CONF.backup_swift_max_incremental_chain:
+            LOG.debug(_('incremental chain of backup %s is too long, taking '
+                        'a full backup') % parent['id'])
+            return None
+
+        if metadata.get('chunk_size') not in (None,
+                                              self.data_block_size_bytes):
+            LOG.debug(_('backup %s used a different object size, taking a '
+                        'full backup') % parent['id'])
+            return None
+
+        LOG.debug(_('backup %(backup_id)s is incremental on top of '
+                    '%(parent_id)s') %
+                  {'backup_id': backup['id'], 'parent_id': parent['id']})
+        self.db.backup_update(self.context, backup['id'],
+                              {'parent_id': parent['id']})
+        return {'id': parent['id'], 'sha256s': sha256s,
+                'chain_depth': chain_depth}
+
     def _backup_chunk(self, backup, container, data, data_offset, object_meta):
         """Backup data chunk based on the object metadata and offset."""
         object_prefix = object_meta['prefix']
@@ -258,11 +368,32 @@ class SwiftBackupDriver(BackupDriver):
         obj[object_name]['offset'] = data_offset
         obj[object_name]['length'] = len(data)
         LOG.debug(_('reading chunk of data from volume'))
+
+        # The object is listed in the metadata now, so the order of the
+        # list does not depend on the order the uploads complete in. The
+        # upload fills in the compression algorithm and the MD5.
+        object_list.append(obj)
+        object_id += 1
+        object_meta['list'] = object_list
+        object_meta['id'] = object_id
+
+        pending = object_meta['pending']
+        if len(pending) >= self.concurrency:
+            pending.popleft().wait()
+        pending.append(eventlet.spawn(self._upload_chunk, container,
+                                      object_name, data, obj[object_name]))
+        LOG.debug(_('Calling eventlet.sleep(0)'))
+        eventlet.sleep(0)
+
+    def _upload_chunk(self, container, object_name, data, object_info):
+        """Compress a chunk of volume data and upload it as one object."""
         if self.compressor is not None:
             algorithm = CONF.backup_compression_algorithm.lower()
-            obj[object_name]['compression'] = algorithm
+            object_info['compression'] = algorithm
             data_size_bytes = len(data)
-            data = self.compressor.compress(data)
+            # Compressing a whole object takes seconds, run it in a native
+            # thread so that it does not block the other green threads.
+            data = tpool.execute(self.compressor.compress, data)
             comp_size_bytes = len(data)
             LOG.debug(_('compressed %(data_size_bytes)d bytes of data '
                         'to %(comp_size_bytes)d bytes using '
@@ -274,44 +405,67 @@ class SwiftBackupDriver(BackupDriver):
                       })
         else:
             LOG.debug(_('not compressing data'))
-            obj[object_name]['compression'] = 'none'
+            object_info['compression'] = 'none'
 
+        md5 = hashlib.md5(data).hexdigest()
+        object_info['md5'] = md5
+        LOG.debug(_('backup MD5 for %(object_name)s: %(md5)s') %
+                  {'object_name': object_name, 'md5': md5})
+        self._put_object(container, object_name, data, md5)
+
+    def _backup_hole(self, data_offset, length, object_meta):
+        """Record a chunk of zeros in the metadata without uploading it."""
+        object_name = '%s-%05d' % (object_meta['prefix'], object_meta['id'])
+        LOG.debug(_('chunk at offset %d is all zeros, recording a hole') %
+                  data_offset)
+        object_meta['list'].append({object_name: {'offset': data_offset,
+                                                  'length': length,
+                                                  'compression': 'none',
+                                                  'hole': True}})
+        object_meta['id'] += 1
+
+    def _put_object(self, container, object_name, data, md5):
+        """Upload one backup object and verify its etag."""
         reader = six.StringIO(data)
         LOG.debug(_('About to put_object'))
-        try:
-            etag = self.conn.put_object(container, object_name, reader,
-                                        content_length=len(data))
-        except socket.error as err:
-            raise exception.SwiftConnectionFailed(reason=err)
+        with self.conn_pool.item() as conn:
+            try:
+                etag = conn.put_object(container, object_name, reader,
+                                       content_length=len(data))
+            except socket.error as err:
+                raise exception.SwiftConnectionFailed(reason=err)
         LOG.debug(_('swift MD5 for %(object_name)s: %(etag)s') %
                   {'object_name': object_name, 'etag': etag, })
-        md5 = hashlib.md5(data).hexdigest()
-        obj[object_name]['md5'] = md5
-        LOG.debug(_('backup MD5 for %(object_name)s: %(md5)s') %
-                  {'object_name': object_name, 'md5': md5})
         if etag != md5:
             err = _('error writing object to swift, MD5 of object in '
                     'swift %(etag)s is not the same as MD5 of object sent '
                     'to swift %(md5)s') % {'etag': etag, 'md5': md5}
             raise exception.InvalidBackup(reason=err)
-        object_list.append(obj)
-        object_id += 1
-        object_meta['list'] = object_list
-        object_meta['id'] = object_id
-        LOG.debug(_('Calling eventlet.sleep(0)'))
-        eventlet.sleep(0)
+
+    def _wait_for_transfers(self, pending):
+        """Wait for the in-flight transfers to complete."""
+        while pending:
+            pending.popleft().wait()
 
     def _finalize_backup(self, backup, container, object_meta):
         """Finalize the backup by updating its metadata on Swift."""
         object_list = object_meta['list']
         object_id = object_meta['id']
         volume_meta = object_meta['volume_meta']
+        parent_id = None
+        chain_depth = 0
+        if object_meta['parent']:
+            parent_id = object_meta['parent']['id']
+            chain_depth = object_meta['parent']['chain_depth']
         try:
             self._write_metadata(backup,
                                  backup['volume_id'],
                                  container,
                                  object_list,
-                                 volume_meta)
+                                 volume_meta,
+                                 sha256_list=object_meta['sha256s'],
+                                 parent_id=parent_id,
+                                 chain_depth=chain_depth)
         except socket.error as err:
             raise exception.SwiftConnectionFailed(reason=err)
         self.db.backup_update(self.context, backup['id'],
@@ -337,13 +491,33 @@ class SwiftBackupDriver(BackupDriver):
         """Backup the given volume to Swift."""
 
         object_meta, container = self._prepare_backup(backup)
-        while True:
-            data = volume_file.read(self.data_block_size_bytes)
-            data_offset = volume_file.tell()
-            if data == '':
-                break
-            self._backup_chunk(backup, container, data,
-                               data_offset, object_meta)
+        parent = object_meta['parent']
+        parent_sha256s = parent['sha256s'] if parent else []
+        sha256s = object_meta['sha256s']
+        try:
+            while True:
+                data_offset = volume_file.tell()
+                data = volume_file.read(self.data_block_size_bytes)
+                if data == '':
+                    break
+                sha256 = hashlib.sha256(data).hexdigest()
+                index = len(sha256s)
+                sha256s.append(sha256)
+                if (index < len(parent_sha256s) and
+                        parent_sha256s[index] == sha256):
+                    LOG.debug(_('chunk at offset %d unchanged since parent '
+                                'backup, skipping') % data_offset)
+                    continue
+                if utils.is_zero_data(data):
+                    self._backup_hole(data_offset, len(data), object_meta)
+                    continue
+                self._backup_chunk(backup, container, data,
+                                   data_offset, object_meta)
+            self._wait_for_transfers(object_meta['pending'])
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                for gt in object_meta['pending']:
+                    gt.kill()
 
         if backup_metadata:
             try:
@@ -360,10 +534,47 @@ class SwiftBackupDriver(BackupDriver):
         """Restore a v1 swift volume backup from swift."""
         backup_id = backup['id']
         LOG.debug(_('v1 swift volume backup restore of %s started'), backup_id)
+        self._restore_objects(backup, volume_id, metadata, volume_file)
+        LOG.debug(_('v1 swift volume backup restore of %s finished'),
+                  backup_id)
+
+    def _restore_v1_1(self, backup, volume_id, metadata, volume_file):
+        """Restore a v1.1 swift volume backup from swift.
+
+        An incremental backup only holds the objects that changed since its
+        parent, so the parent chain is restored first and the objects of
+        this backup are then written over it at their recorded offsets.
+        """
+        backup_id = backup['id']
+        LOG.debug(_('v1.1 swift volume backup restore of %s started'),
+                  backup_id)
+        parent_id = metadata.get('parent_id')
+        if parent_id:
+            try:
+                parent = self.db.backup_get(self.context, parent_id)
+            except exception.BackupNotFound:
+                err = (_('restore_backup aborted, parent backup %s of '
+                         'incremental backup is missing') % parent_id)
+                raise exception.InvalidBackup(reason=err)
+            try:
+                parent_metadata = self._read_metadata(parent)
+            except socket.error as err:
+                raise exception.SwiftConnectionFailed(reason=err)
+            self._restore_v1_1(parent, volume_id, parent_metadata,
+                               volume_file)
+        self._restore_objects(backup, volume_id, metadata, volume_file,
+                              seek=True)
+        LOG.debug(_('v1.1 swift volume backup restore of %s finished'),
+                  backup_id)
+
+    def _restore_objects(self, backup, volume_id, metadata, volume_file,
+                         seek=False):
+        """Write the objects listed in the backup metadata to the volume."""
         container = backup['container']
         metadata_objects = metadata['objects']
-        metadata_object_names = sum((obj.keys() for obj in metadata_objects),
-                                    [])
+        metadata_object_names = [name for obj in metadata_objects
+                                 for name, info in obj.items()
+                                 if not info.get('hole')]
         LOG.debug(_('metadata_object_names = %s') % metadata_object_names)
         prune_list = [self._metadata_filename(backup)]
         swift_object_names = [swift_object_name for swift_object_name in
@@ -374,49 +585,110 @@ class SwiftBackupDriver(BackupDriver):
                     'swift does not match object list stored in metadata')
             raise exception.InvalidBackup(reason=err)
 
-        for metadata_object in metadata_objects:
-            object_name = metadata_object.keys()[0]
-            LOG.debug(_('restoring object from swift. backup: %(backup_id)s, '
-                        'container: %(container)s, swift object name: '
-                        '%(object_name)s, volume: %(volume_id)s') %
-                      {
-                          'backup_id': backup_id,
-                          'container': container,
-                          'object_name': object_name,
-                          'volume_id': volume_id,
-                      })
+        # Objects are downloaded up to self.concurrency ahead of the one
+        # being written, and written strictly in metadata order.
+        pending = collections.deque()
+        objects_to_fetch = iter(metadata_objects)
+        try:
+            for metadata_object in metadata_objects:
+                while len(pending) < self.concurrency:
+                    next_object = next(objects_to_fetch, None)
+                    if next_object is None:
+                        break
+                    if next_object.values()[0].get('hole'):
+                        pending.append(None)
+                        continue
+                    pending.append(eventlet.spawn(self._download_chunk,
+                                                  container, next_object))
+                gt = pending.popleft()
+                data = gt.wait() if gt is not None else None
+                self._write_object(backup, volume_id, metadata_object, data,
+                                   volume_file, seek)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                for gt in pending:
+                    if gt is not None:
+                        gt.kill()
+
+    def _download_chunk(self, container, metadata_object):
+        """Download one backup object and return its decompressed data."""
+        object_name = metadata_object.keys()[0]
+        with self.conn_pool.item() as conn:
             try:
-                (resp, body) = self.conn.get_object(container, object_name)
+                (resp, body) = conn.get_object(container, object_name)
             except socket.error as err:
                 raise exception.SwiftConnectionFailed(reason=err)
-            compression_algorithm = metadata_object[object_name]['compression']
-            decompressor = self._get_compressor(compression_algorithm)
-            if decompressor is not None:
-                LOG.debug(_('decompressing data using %s algorithm') %
-                          compression_algorithm)
-                decompressed = decompressor.decompress(body)
-                volume_file.write(decompressed)
-            else:
-                volume_file.write(body)
+        compression_algorithm = metadata_object[object_name]['compression']
+        decompressor = self._get_compressor(compression_algorithm)
+        if decompressor is not None:
+            LOG.debug(_('decompressing data using %s algorithm') %
+                      compression_algorithm)
+            body = tpool.execute(decompressor.decompress, body)
+        return body
+
+    def _write_object(self, backup, volume_id, metadata_object, data,
+                      volume_file, seek):
+        """Write one downloaded object to the volume."""
+        object_name = metadata_object.keys()[0]
+        LOG.debug(_('restoring object from swift. backup: %(backup_id)s, '
+                    'container: %(container)s, swift object name: '
+                    '%(object_name)s, volume: %(volume_id)s') %
+                  {
+                      'backup_id': backup['id'],
+                      'container': backup['container'],
+                      'object_name': object_name,
+                      'volume_id': volume_id,
+                  })
+        if seek:
+            volume_file.seek(metadata_object[object_name]['offset'])
+        if metadata_object[object_name].get('hole'):
+            self._write_hole(volume_file,
+                             metadata_object[object_name]['length'])
+        else:
+            volume_file.write(data)
 
-            # force flush every write to avoid long blocking write on close
-            volume_file.flush()
+        # force flush every write to avoid long blocking write on close
+        volume_file.flush()
 
-            # Be tolerant to IO implementations that do not support fileno()
-            try:
-                fileno = volume_file.fileno()
-            except IOError:
-                LOG.info("volume_file does not support fileno() so skipping "
-                         "fsync()")
-            else:
-                os.fsync(fileno)
+        # Be tolerant to IO implementations that do not support fileno()
+        try:
+            fileno = volume_file.fileno()
+        except IOError:
+            LOG.info("volume_file does not support fileno() so skipping "
+                     "fsync()")
+        else:
+            os.fsync(fileno)
 
-            # Restoring a backup to a volume can take some time. Yield so other
-            # threads can run, allowing for among other things the service
-            # status to be updated
-            eventlet.sleep(0)
-        LOG.debug(_('v1 swift volume backup restore of %s finished'),
-                  backup_id)
+        # Restoring a backup to a volume can take some time. Yield so other
+        # threads can run, allowing for among other things the service
+        # status to be updated
+        eventlet.sleep(0)
+
+    def _write_hole(self, volume_file, length):
+        """Zero a range of the volume, punching a hole where possible."""
+        offset = volume_file.tell()
+        try:
+            fileno = volume_file.fileno()
+        except IOError:
+            fileno = None
+
+        if fileno is not None:
+            volume_file.flush()
+            if utils.punch_hole(fileno, offset, length):
+                # Punching a hole never extends a file, so grow a regular
+                # file whose backup ends with a hole to its full size.
+                file_stat = os.fstat(fileno)
+                if (stat.S_ISREG(file_stat.st_mode) and
+                        file_stat.st_size < offset + length):
+                    os.ftruncate(fileno, offset + length)
+                volume_file.seek(offset + length)
+                return
+
+        LOG.debug(_('unable to punch a hole in the volume, writing zeros'))
+        zeros = '\0' * min(length, units.MiB)
+        while length > 0:
+            volume_file.write(zeros[:length])
+            length -= len(zeros)
 
     def restore(self, backup, volume_id, volume_file):
         """Restore the given volume backup from swift."""
@@ -283,6 +283,12 @@ class TSMBackupDriver(BackupDriver):
 
         backup_cmd = ['dsmc', 'backup']
         if _image_mode(backup_mode):
+            # NOTE: dsmc reads the block device itself, so the data never
+            #       passes through cinder and all-zero extents cannot be
+            #       skipped here the way utils.is_zero_data lets chunked
+            #       drivers do.  dsmc only skips unused blocks of volumes
+            #       holding a file system it knows, which cinder volumes
+            #       are not.
             backup_cmd.append('image')
         backup_cmd.extend(['-quiet',
                            '-compression=%s' % compr_flag,
@@ -322,6 +328,9 @@ class TSMBackupDriver(BackupDriver):
             restore_cmd.append('-noprompt')  # suppress prompt
         else:
             restore_cmd.append('-replace=yes')  # suppress prompt
+            # dsmc tracks the holes of sparse files it backs up, so have it
+            # leave those ranges unallocated instead of writing zeros.
+            restore_cmd.append('-makesparsefile=yes')
 
         restore_cmd.extend(['-quiet',
                            '-password=%s' % self.tsm_password,
@@ -13,10 +13,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
 import os
 import socket
 import time
 
+from eventlet import greenpool
+
 from cinder.brick import exception
 from cinder.brick import executor
 from cinder.brick.initiator import host_driver
@@ -182,7 +185,21 @@ class ISCSIConnector(InitiatorConnector):
         super(ISCSIConnector, self).set_execute(execute)
         self._linuxscsi.set_execute(execute)
 
-    @synchronized('connect_volume')
+    def _synchronized_on_target(self, connection_properties, f, *args):
+        """Run f holding the lock of the target of a volume.
+
+        Volumes on other targets are attached and detached concurrently,
+        unless multipath is used.
+        """
+        if self.use_multipath:
+            # NOTE: with multipath an attach logs into every target found
+            #       by discovery and a detach logs out of all of them, so
+            #       volumes on other targets share their sessions.
+            name = 'connect_volume'
+        else:
+            name = 'connect_volume-%s' % connection_properties['target_iqn']
+        return synchronized(name)(f)(*args)
+
     def connect_volume(self, connection_properties):
         """Attach the volume to instance_name.
 
@@ -191,7 +208,11 @@ class ISCSIConnector(InitiatorConnector):
         target_iqn - iSCSI Qualified Name
         target_lun - LUN id of the volume
         """
+        return self._synchronized_on_target(connection_properties,
+                                            self._connect_volume,
+                                            connection_properties)
 
+    def _connect_volume(self, connection_properties):
         device_info = {'type': 'block'}
 
         if self.use_multipath:
@@ -206,41 +227,27 @@ class ISCSIConnector(InitiatorConnector):
                                           check_exit_code=[0, 255])[0] \
                 or ""
 
+            all_props = []
             for ip, iqn in self._get_target_portals_from_iscsiadm_output(out):
                 props = connection_properties.copy()
                 props['target_portal'] = ip
                 props['target_iqn'] = iqn
-                self._connect_to_iscsi_portal(props)
+                all_props.append(props)
+
+            # Log into all the portals at once, a login can take seconds
+            # when a portal is slow to answer.
+            connect = functools.partial(self._connect_to_iscsi_portal,
+                                        sessions=self._get_iscsi_sessions())
+            pool = greenpool.GreenPool(max(1, len(all_props)))
+            for _result in pool.imap(connect, all_props):
+                pass
 
             self._rescan_iscsi()
         else:
             self._connect_to_iscsi_portal(connection_properties)
 
         host_device = self._get_device_path(connection_properties)
-
-        # The /dev/disk/by-path/... node is not always present immediately
-        # TODO(justinsb): This retry-with-delay is a pattern, move to utils?
-        tries = 0
-        while not os.path.exists(host_device):
-            if tries >= self.device_scan_attempts:
-                raise exception.VolumeDeviceNotFound(device=host_device)
-
-            LOG.warn(_("ISCSI volume not yet found at: %(host_device)s. "
-                       "Will rescan & retry.  Try number: %(tries)s"),
-                     {'host_device': host_device,
-                      'tries': tries})
-
-            # The rescan isn't documented as being necessary(?), but it helps
-            self._run_iscsiadm(connection_properties, ("--rescan",))
-
-            tries = tries + 1
-            if not os.path.exists(host_device):
-                time.sleep(tries ** 2)
-
-        if tries != 0:
-            LOG.debug(_("Found iSCSI node %(host_device)s "
-                        "(after %(tries)s rescans)"),
-                      {'host_device': host_device, 'tries': tries})
+        self._wait_for_device(connection_properties, host_device)
 
         if self.use_multipath:
             #we use the multipath device instead of the single path device
@@ -252,7 +259,6 @@ class ISCSIConnector(InitiatorConnector):
         device_info['path'] = host_device
         return device_info
 
-    @synchronized('connect_volume')
     def disconnect_volume(self, connection_properties, device_info):
         """Detach the volume from instance_name.
 
@@ -261,6 +267,12 @@ class ISCSIConnector(InitiatorConnector):
         target_iqn - iSCSI Qualified Name
         target_lun - LUN id of the volume
         """
+        return self._synchronized_on_target(connection_properties,
+                                            self._disconnect_volume,
+                                            connection_properties,
+                                            device_info)
+
+    def _disconnect_volume(self, connection_properties, device_info):
         # Moved _rescan_iscsi and _rescan_multipath
         # from _disconnect_volume_multipath_iscsi to here.
         # Otherwise, if we do rescan after _linuxscsi.remove_multipath_device
@@ -295,6 +307,45 @@ class ISCSIConnector(InitiatorConnector):
         if not devices:
             self._disconnect_from_iscsi_portal(connection_properties)
 
+    def _wait_for_device(self, connection_properties, host_device):
+        # The /dev/disk/by-path/... node is not always present immediately
+        tries = 0
+        while not os.path.exists(host_device):
+            if tries >= self.device_scan_attempts:
+                raise exception.VolumeDeviceNotFound(device=host_device)
+
+            LOG.warn(_("ISCSI volume not yet found at: %(host_device)s. "
+                       "Will rescan & retry.  Try number: %(tries)s"),
+                     {'host_device': host_device,
+                      'tries': tries})
+
+            # The rescan isn't documented as being necessary(?), but it helps
+            self._run_iscsiadm(connection_properties, ("--rescan",))
+
+            tries = tries + 1
+            if not os.path.exists(host_device):
+                self._wait_for_udev(host_device, tries ** 2)
+
+        if tries != 0:
+            LOG.debug(_("Found iSCSI node %(host_device)s "
+                        "(after %(tries)s rescans)"),
+                      {'host_device': host_device, 'tries': tries})
+
+    def _wait_for_udev(self, path, timeout):
+        """Wait up to timeout seconds for udev to create path."""
+        start = time.time()
+        self._execute('udevadm', 'settle', '--timeout=%d' % timeout,
+                      '--exit-if-exists=%s' % path,
+                      root_helper=self._root_helper, run_as_root=True,
+                      check_exit_code=False)
+
+        # udevadm returns as soon as its queue is empty, which it may be
+        # when the event of the device was not queued yet.
+        for i in xrange(int(timeout - (time.time() - start))):
+            if os.path.exists(path):
+                return
+            time.sleep(1)
+
     def _get_device_path(self, connection_properties):
         path = ("/dev/disk/by-path/ip-%(portal)s-iscsi-%(iqn)s-lun-%(lun)s" %
                 {'portal': connection_properties['target_portal'],
@@ -398,7 +449,23 @@ class ISCSIConnector(InitiatorConnector):
         # as they are used for other luns
         return
 
-    def _connect_to_iscsi_portal(self, connection_properties):
+    def _get_iscsi_sessions(self):
+        """Return the portals and iqns of the active iSCSI sessions.
+
+        The portals come without their target portal group tag.
+        """
+        out = self._run_iscsiadm_bare(["-m", "session"],
+                                      run_as_root=True,
+                                      check_exit_code=[0, 1, 21])[0] or ""
+
+        sessions = set()
+        for line in out.splitlines():
+            if line.startswith("tcp:"):
+                fields = line.split(" ")
+                sessions.add((fields[2].split(",")[0], fields[3]))
+        return sessions
+
+    def _connect_to_iscsi_portal(self, connection_properties, sessions=None):
         # NOTE(vish): If we are on the same host as nova volume, the
         #             discovery makes the target so we don't need to
         #             run --op new. Therefore, we check to see if the
@@ -427,21 +494,12 @@ class ISCSIConnector(InitiatorConnector):
 
         #duplicate logins crash iscsiadm after load,
         #so we scan active sessions to see if the node is logged in.
-        out = self._run_iscsiadm_bare(["-m", "session"],
-                                      run_as_root=True,
-                                      check_exit_code=[0, 1, 21])[0] or ""
-
-        portals = [{'portal': p.split(" ")[2], 'iqn': p.split(" ")[3]}
-                   for p in out.splitlines() if p.startswith("tcp:")]
+        if sessions is None:
+            sessions = self._get_iscsi_sessions()
 
         stripped_portal = connection_properties['target_portal'].split(",")[0]
-        if len(portals) == 0 or len([s for s in portals
-                                     if stripped_portal ==
-                                     s['portal'].split(",")[0]
-                                     and
-                                     s['iqn'] ==
-                                     connection_properties['target_iqn']]
-                                    ) == 0:
+        if (stripped_portal, connection_properties['target_iqn']) \
+                not in sessions:
             try:
                 self._run_iscsiadm(connection_properties,
                                    ("--login",),
@@ -17,6 +17,7 @@
 LVM class for performing LVM operations.
 """
 
+import collections
 import math
 import re
 
@@ -26,9 +27,14 @@ from cinder.brick import exception
 from cinder.brick import executor
 from cinder.openstack.common import log as logging
 from cinder.openstack.common import processutils as putils
+from cinder.openstack.common import timeutils
 
 LOG = logging.getLogger(__name__)
 
+# Seconds the info of an LV is served from the cache, LVs can be changed
+# by other processes and other LVM objects behind the cache.
+LV_CACHE_TTL = 5
+
 
 class LVM(executor.Executor):
     """LVM object to enable various LVM related operations."""
@@ -55,6 +61,10 @@ class LVM(executor.Executor):
         self.vg_name = vg_name
         self.pv_list = []
         self.lv_list = []
+        # LV name -> (LV info, time looked up) of the LVs of this VG that
+        # have been looked up, kept current by the methods of this object
+        # that change LVs and expired after LV_CACHE_TTL.
+        self._lv_cache = collections.OrderedDict()
         self.vg_size = 0.0
         self.vg_free_space = 0.0
         self.vg_lv_count = 0
@@ -232,11 +242,13 @@ class LVM(executor.Executor):
         return self._supports_lvchange_ignoreskipactivation
 
     @staticmethod
-    def get_all_volumes(root_helper, vg_name=None):
+    def get_all_volumes(root_helper, vg_name=None, lv_name=None):
         """Static method to get all LV's on a system.
 
         :param root_helper: root_helper to use for execute
         :param vg_name: optional, gathers info for only the specified VG
+        :param lv_name: optional, gathers info for only the specified LV of
+                        the specified VG
         :returns: List of Dictionaries with LV info
 
         """
@@ -244,40 +256,72 @@ class LVM(executor.Executor):
         cmd = ['env', 'LC_ALL=C', 'lvs', '--noheadings', '--unit=g',
                '-o', 'vg_name,name,size', '--nosuffix']
 
-        if vg_name is not None:
+        if lv_name is not None:
+            cmd.append('%s/%s' % (vg_name, lv_name))
+        elif vg_name is not None:
             cmd.append(vg_name)
 
-        (out, err) = putils.execute(*cmd,
-                                    root_helper=root_helper,
-                                    run_as_root=True)
+        try:
+            (out, err) = putils.execute(*cmd,
+                                        root_helper=root_helper,
+                                        run_as_root=True)
+        except putils.ProcessExecutionError as err:
+            # lvs fails when asked for an LV that does not exist
+            if lv_name is not None and ('not found' in err.stderr or
+                                        'Failed to find' in err.stderr):
+                return []
+            raise
 
         lv_list = []
         if out is not None:
             volumes = out.split()
             for vg, name, size in itertools.izip(*[iter(volumes)] * 3):
-                lv_list.append({"vg": vg, "name": name, "size": size})
+                if lv_name is None or name == lv_name:
+                    lv_list.append({"vg": vg, "name": name, "size": size})
 
         return lv_list
 
     def get_volumes(self):
         """Get all LV's associated with this instantiation (VG).
 
+        This also refreshes the LV info cached by get_volume.
+
         :returns: List of Dictionaries with LV info
 
         """
         self.lv_list = self.get_all_volumes(self._root_helper, self.vg_name)
+        now = timeutils.utcnow()
+        self._lv_cache = collections.OrderedDict(
+            (lv['name'], (lv, now)) for lv in self.lv_list)
         return self.lv_list
 
     def get_volume(self, name):
         """Get reference object of volume specified by name.
 
+        LVs looked up in the last LV_CACHE_TTL seconds are served from the
+        cache, others are queried on their own rather than by listing the
+        whole VG.
+
         :returns: dict representation of Logical Volume if exists
 
         """
-        ref_list = self.get_volumes()
-        for r in ref_list:
-            if r['name'] == name:
-                return r
+        cached = self._lv_cache.get(name)
+        if cached is not None:
+            lv, cached_at = cached
+            if not timeutils.is_older_than(cached_at, LV_CACHE_TTL):
+                return lv
+            del self._lv_cache[name]
+
+        for lv in self.get_all_volumes(self._root_helper, self.vg_name,
+                                       name):
+            self._lv_cache[name] = (lv, timeutils.utcnow())
+            return lv
+        return None
+
+    def _invalidate_volume(self, *names):
+        """Drop LVs changed by this object from the LV info cache."""
+        for name in names:
+            self._lv_cache.pop(name, None)
 
     @staticmethod
     def get_all_physical_volumes(root_helper, vg_name=None):
@@ -375,12 +419,12 @@ class LVM(executor.Executor):
         self.vg_uuid = vg_list[0]['uuid']
 
         if self.vg_thin_pool is not None:
-            for lv in self.get_all_volumes(self._root_helper, self.vg_name):
-                if lv['name'] == self.vg_thin_pool:
-                    self.vg_thin_pool_size = lv['size']
-                    tpfs = self._get_thin_pool_free_space(self.vg_name,
-                                                          self.vg_thin_pool)
-                    self.vg_thin_pool_free_space = tpfs
+            for lv in self.get_all_volumes(self._root_helper, self.vg_name,
+                                           self.vg_thin_pool):
+                self.vg_thin_pool_size = lv['size']
+                tpfs = self._get_thin_pool_free_space(self.vg_name,
+                                                      self.vg_thin_pool)
+                self.vg_thin_pool_free_space = tpfs
 
     def _calculate_thin_pool_size(self):
         """Calculates the correct size for a thin pool.
@@ -438,6 +482,7 @@ class LVM(executor.Executor):
         self._execute(*cmd,
                       root_helper=self._root_helper,
                       run_as_root=True)
+        self._invalidate_volume(name)
 
         self.vg_thin_pool = name
         return size_str
@@ -478,6 +523,8 @@ class LVM(executor.Executor):
             LOG.error(_('StdOut  :%s') % err.stdout)
             LOG.error(_('StdErr  :%s') % err.stderr)
             raise
+        finally:
+            self._invalidate_volume(name)
 
     def create_lv_snapshot(self, name, source_lv_name, lv_type='default'):
         """Creates a snapshot of a logical volume.
@@ -507,6 +554,8 @@ class LVM(executor.Executor):
             LOG.error(_('StdOut  :%s') % err.stdout)
             LOG.error(_('StdErr  :%s') % err.stderr)
             raise
+        finally:
+            self._invalidate_volume(name)
 
     def _mangle_lv_name(self, name):
         # Linux LVM reserves name that starts with snapshot, so that
@@ -606,6 +655,8 @@ class LVM(executor.Executor):
                           '-f',
                           '%s/%s' % (self.vg_name, name),
                           root_helper=self._root_helper, run_as_root=True)
+        finally:
+            self._invalidate_volume(name)
 
     def revert(self, snapshot_name):
         """Revert an LV from snapshot.
@@ -616,6 +667,8 @@ class LVM(executor.Executor):
         self._execute('lvconvert', '--merge',
                       snapshot_name, root_helper=self._root_helper,
                       run_as_root=True)
+        # the merge changes the origin LV as well
+        self._lv_cache.clear()
 
     def lv_has_snapshot(self, name):
         out, err = self._execute(
@@ -642,6 +695,8 @@ class LVM(executor.Executor):
             LOG.error(_('StdOut  :%s') % err.stdout)
             LOG.error(_('StdErr  :%s') % err.stderr)
             raise
+        finally:
+            self._invalidate_volume(lv_name)
 
     def vg_mirror_free_space(self, mirror_count):
         free_capacity = 0.0
@@ -680,3 +735,5 @@ class LVM(executor.Executor):
             LOG.error(_('StdOut  :%s') % err.stdout)
             LOG.error(_('StdErr  :%s') % err.stderr)
             raise
+        finally:
+            self._invalidate_volume(lv_name, new_name)
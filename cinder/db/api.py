@@ -205,9 +205,11 @@ def volume_get(context, volume_id):
     return IMPL.volume_get(context, volume_id)
 
 
-def volume_get_all(context, marker, limit, sort_key, sort_dir):
-    """Get all volumes."""
-    return IMPL.volume_get_all(context, marker, limit, sort_key, sort_dir)
+def volume_get_all(context, marker, limit, sort_key, sort_dir,
+                   filters=None):
+    """Get all volumes matching the filters."""
+    return IMPL.volume_get_all(context, marker, limit, sort_key, sort_dir,
+                               filters=filters)
 
 
 def volume_get_all_by_host(context, host):
@@ -221,10 +223,10 @@ def volume_get_all_by_instance_uuid(context, instance_uuid):
 
 
 def volume_get_all_by_project(context, project_id, marker, limit, sort_key,
-                              sort_dir):
-    """Get all volumes belonging to a project."""
+                              sort_dir, filters=None):
+    """Get all volumes belonging to a project and matching the filters."""
     return IMPL.volume_get_all_by_project(context, project_id, marker, limit,
-                                          sort_key, sort_dir)
+                                          sort_key, sort_dir, filters=filters)
 
 
 def volume_get_iscsi_target_num(context, volume_id):
@@ -259,14 +261,20 @@ def snapshot_get(context, snapshot_id):
     return IMPL.snapshot_get(context, snapshot_id)
 
 
-def snapshot_get_all(context):
-    """Get all snapshots."""
-    return IMPL.snapshot_get_all(context)
+def snapshot_get_all(context, marker=None, limit=None, sort_key='created_at',
+                     sort_dir='asc', filters=None):
+    """Get all snapshots matching the filters."""
+    return IMPL.snapshot_get_all(context, marker, limit, sort_key, sort_dir,
+                                 filters=filters)
 
 
-def snapshot_get_all_by_project(context, project_id):
-    """Get all snapshots belonging to a project."""
-    return IMPL.snapshot_get_all_by_project(context, project_id)
+def snapshot_get_all_by_project(context, project_id, marker=None, limit=None,
+                                sort_key='created_at', sort_dir='asc',
+                                filters=None):
+    """Get all snapshots belonging to a project and matching the filters."""
+    return IMPL.snapshot_get_all_by_project(context, project_id, marker,
+                                            limit, sort_key, sort_dir,
+                                            filters=filters)
 
 
 def snapshot_get_all_for_volume(context, volume_id):
@@ -545,11 +553,23 @@ def volume_glance_metadata_create(context, volume_id, key, value):
                                               value)
 
 
+def volume_glance_metadata_bulk_create(context, volume_id, metadata):
+    """Add Glance metadata key:value pairs to a volume in one transaction."""
+    return IMPL.volume_glance_metadata_bulk_create(context, volume_id,
+                                                   metadata)
+
+
 def volume_glance_metadata_get_all(context):
     """Return the glance metadata for all volumes."""
     return IMPL.volume_glance_metadata_get_all(context)
 
 
+def volume_glance_metadata_get_all_by_volume_ids(context, volume_ids):
+    """Return the glance metadata for the given volumes."""
+    return IMPL.volume_glance_metadata_get_all_by_volume_ids(context,
+                                                             volume_ids)
+
+
 def volume_glance_metadata_get(context, volume_id):
     """Return the glance metadata for a volume."""
     return IMPL.volume_glance_metadata_get(context, volume_id)
@@ -750,9 +770,11 @@ def backup_get(context, backup_id):
     return IMPL.backup_get(context, backup_id)
 
 
-def backup_get_all(context):
-    """Get all backups."""
-    return IMPL.backup_get_all(context)
+def backup_get_all(context, marker=None, limit=None, sort_key='created_at',
+                   sort_dir='asc', filters=None):
+    """Get all backups matching the filters."""
+    return IMPL.backup_get_all(context, marker, limit, sort_key, sort_dir,
+                               filters=filters)
 
 
 def backup_get_all_by_host(context, host):
@@ -765,9 +787,17 @@ def backup_create(context, values):
     return IMPL.backup_create(context, values)
 
 
-def backup_get_all_by_project(context, project_id):
-    """Get all backups belonging to a project."""
-    return IMPL.backup_get_all_by_project(context, project_id)
+def backup_get_all_by_project(context, project_id, marker=None, limit=None,
+                              sort_key='created_at', sort_dir='asc',
+                              filters=None):
+    """Get all backups belonging to a project and matching the filters."""
+    return IMPL.backup_get_all_by_project(context, project_id, marker, limit,
+                                          sort_key, sort_dir, filters=filters)
+
+
+def backup_get_all_by_volume(context, volume_id):
+    """Get all backups of a volume, newest first."""
+    return IMPL.backup_get_all_by_volume(context, volume_id)
 
 
 def backup_update(context, backup_id, values):
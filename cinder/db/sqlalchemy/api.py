@@ -697,28 +697,94 @@ def reservation_destroy(context, uuid):
 # code always acquires the lock on quota_usages before acquiring the lock
 # on reservations.
 
-def _get_quota_usages(context, session, project_id):
+def _get_quota_usages(context, session, project_id, resources=None,
+                      lock=True):
     # Broken out for testability
-    rows = model_query(context, models.QuotaUsage,
-                       read_deleted="no",
-                       session=session).\
-        filter_by(project_id=project_id).\
-        with_lockmode('update').\
-        all()
+    query = model_query(context, models.QuotaUsage,
+                        read_deleted="no",
+                        session=session).\
+        filter_by(project_id=project_id)
+    if resources is not None:
+        query = query.filter(models.QuotaUsage.resource.in_(resources))
+    if lock:
+        # NOTE: lock the rows in a fixed order, so that two requests
+        # locking overlapping resources do not deadlock.
+        query = query.order_by(models.QuotaUsage.id).\
+            with_lockmode('update')
+    rows = query.all()
     return dict((row.resource, row) for row in rows)
 
 
+def _quota_usage_needs_refresh(usage, max_age):
+    """Check whether a usage must be refreshed by its sync function.
+
+    This does not change the usage; a usage with until_refresh set is
+    refreshed once its count runs down to zero.
+    """
+    if usage is None:
+        return True
+    if usage.in_use < 0:
+        return True
+    if usage.until_refresh is not None:
+        return usage.until_refresh <= 1
+    return bool(max_age and usage.updated_at is not None and (
+        (usage.updated_at - timeutils.utcnow()).seconds >= max_age))
+
+
+def _quota_usage_state(usage):
+    return (usage.in_use, usage.reserved, usage.until_refresh,
+            usage.updated_at)
+
+
+def _quota_usage_sync(context, resources, resource, project_id,
+                      session=None):
+    sync = QUOTA_SYNC_FUNCTIONS[resources[resource].sync]
+    volume_type_id = getattr(resources[resource], 'volume_type_id', None)
+    volume_type_name = getattr(resources[resource], 'volume_type_name', None)
+    return sync(context, project_id,
+                volume_type_id=volume_type_id,
+                volume_type_name=volume_type_name,
+                session=session)
+
+
 @require_context
 def quota_reserve(context, resources, quotas, deltas, expire,
                   until_refresh, max_age, project_id=None):
     elevated = context.elevated()
+    if project_id is None:
+        project_id = context.project_id
+
+    # Run the sync functions for the usages which look like they need
+    # a refresh before taking any lock, they count every volume or
+    # snapshot of the project.  The decision is taken again under the
+    # lock below.  The read uses a session of its own, so that the
+    # locked read below does not get these rows back from the identity
+    # map without refreshing them.
+    usages = _get_quota_usages(context, get_session(), project_id,
+                               resources=deltas.keys(), lock=False)
+    seen = dict((resource, _quota_usage_state(usage))
+                for resource, usage in usages.items())
+    synced = {}
+    for resource in deltas.keys():
+        if (resource not in synced and
+                _quota_usage_needs_refresh(usages.get(resource), max_age)):
+            synced.update(_quota_usage_sync(elevated, resources, resource,
+                                            project_id))
+
     session = get_session()
     with session.begin():
-        if project_id is None:
-            project_id = context.project_id
-
-        # Get the current usages
-        usages = _get_quota_usages(context, session, project_id)
+        # Get the current usages, locking only the ones being changed
+        usages = _get_quota_usages(context, session, project_id,
+                                   resources=deltas.keys())
+        dirty = set()
+
+        # A pre-computed sync result only applies to a usage which
+        # nobody changed since it was read.
+        for resource in deltas.keys():
+            usage = usages.get(resource)
+            state = _quota_usage_state(usage) if usage else None
+            if state != seen.get(resource):
+                synced.pop(resource, None)
 
         # Handle usage refresh
         work = set(deltas.keys())
@@ -741,6 +807,7 @@ def quota_reserve(context, resources, quotas, deltas, expire,
                 refresh = True
             elif usages[resource].until_refresh is not None:
                 usages[resource].until_refresh -= 1
+                dirty.add(resource)
                 if usages[resource].until_refresh <= 0:
                     refresh = True
             elif max_age and usages[resource].updated_at is not None and (
@@ -750,31 +817,25 @@ def quota_reserve(context, resources, quotas, deltas, expire,
 
             # OK, refresh the usage
             if refresh:
-                # Grab the sync routine
-                sync = QUOTA_SYNC_FUNCTIONS[resources[resource].sync]
-                volume_type_id = getattr(resources[resource],
-                                         'volume_type_id', None)
-                volume_type_name = getattr(resources[resource],
-                                           'volume_type_name', None)
-                updates = sync(elevated, project_id,
-                               volume_type_id=volume_type_id,
-                               volume_type_name=volume_type_name,
-                               session=session)
+                if resource in synced:
+                    updates = {resource: synced[resource]}
+                else:
+                    # The usage changed since it was read above, so
+                    # there is nothing to do but sync under the lock.
+                    updates = _quota_usage_sync(elevated, resources,
+                                                resource, project_id,
+                                                session=session)
                 for res, in_use in updates.items():
-                    # Make sure we have a destination for the usage!
-                    if res not in usages:
-                        usages[res] = _quota_usage_create(
-                            elevated,
-                            project_id,
-                            res,
-                            0, 0,
-                            until_refresh or None,
-                            session=session
-                        )
+                    # NOTE: only the usages being reserved are locked,
+                    #       refreshing anything else is left to the
+                    #       requests which reserve it.
+                    if res not in deltas:
+                        continue
 
                     # Update the usage
                     usages[res].in_use = in_use
                     usages[res].until_refresh = until_refresh or None
+                    dirty.add(res)
 
                     # Because more than one resource may be refreshed
                     # by the call to the sync routine, and we don't
@@ -834,10 +895,11 @@ def quota_reserve(context, resources, quotas, deltas, expire,
                 #            reserved value if the delta is positive.
                 if delta > 0:
                     usages[resource].reserved += delta
+                    dirty.add(resource)
 
-        # Apply updates to the usages table
-        for usage_ref in usages.values():
-            usage_ref.save(session=session)
+        # Apply updates to the usages which changed
+        for resource in dirty:
+            usages[resource].save(session=session)
 
     if unders:
         LOG.warning(_("Change will make usage less than 0 for the following "
@@ -868,17 +930,19 @@ def reservation_commit(context, reservations, project_id=None):
     session = get_session()
     with session.begin():
         usages = _get_quota_usages(context, session, project_id)
+        changed = set()
 
         for reservation in _quota_reservations(session, context, reservations):
             usage = usages[reservation.resource]
             if reservation.delta >= 0:
                 usage.reserved -= reservation.delta
             usage.in_use += reservation.delta
+            changed.add(reservation.resource)
 
             reservation.delete(session=session)
 
-        for usage in usages.values():
-            usage.save(session=session)
+        for resource in changed:
+            usages[resource].save(session=session)
 
 
 @require_context
@@ -886,16 +950,18 @@ def reservation_rollback(context, reservations, project_id=None):
     session = get_session()
     with session.begin():
         usages = _get_quota_usages(context, session, project_id)
+        changed = set()
 
         for reservation in _quota_reservations(session, context, reservations):
             usage = usages[reservation.resource]
             if reservation.delta >= 0:
                 usage.reserved -= reservation.delta
+                changed.add(reservation.resource)
 
             reservation.delete(session=session)
 
-        for usage in usages.values():
-            usage.save(session=session)
+        for resource in changed:
+            usages[resource].save(session=session)
 
 
 @require_admin_context
@@ -1153,10 +1219,15 @@ def volume_get(context, volume_id):
 
 
 @require_admin_context
-def volume_get_all(context, marker, limit, sort_key, sort_dir):
+def volume_get_all(context, marker, limit, sort_key, sort_dir,
+                   filters=None):
     session = get_session()
     with session.begin():
         query = _volume_get_query(context, session=session)
+        if filters:
+            query = _process_volume_filters(query, filters)
+            if query is None:
+                return []
 
         marker_volume = None
         if marker is not None:
@@ -1192,12 +1263,16 @@ def volume_get_all_by_instance_uuid(context, instance_uuid):
 
 @require_context
 def volume_get_all_by_project(context, project_id, marker, limit, sort_key,
-                              sort_dir):
+                              sort_dir, filters=None):
     session = get_session()
     with session.begin():
         authorize_project_context(context, project_id)
         query = _volume_get_query(context, session).\
             filter_by(project_id=project_id)
+        if filters:
+            query = _process_volume_filters(query, filters)
+            if query is None:
+                return []
 
         marker_volume = None
         if marker is not None:
@@ -1211,6 +1286,46 @@ def volume_get_all_by_project(context, project_id, marker, limit, sort_key,
         return query.all()
 
 
+def _process_volume_filters(query, filters):
+    """Apply the volume list filters to a volume query.
+
+    'metadata' matches volumes that have all of the given key/value pairs,
+    'no_migration_targets' hides the temporary targets of volume
+    migrations and any other filter is an equality match on a column.
+
+    :returns: the filtered query, or None if no volume can match
+    """
+    filters = filters.copy()
+
+    if filters.pop('no_migration_targets', False):
+        query = query.filter(or_(
+            models.Volume.migration_status == None,
+            ~models.Volume.migration_status.startswith('target:')))
+
+    metadata = filters.pop('metadata', None)
+    if metadata:
+        for key, value in metadata.iteritems():
+            query = query.filter(
+                models.Volume.volume_metadata.any(key=key, value=value))
+
+    return _process_model_filters(query, models.Volume, filters)
+
+
+def _process_model_filters(query, model, filters):
+    """Apply equality filters on the columns of a model to a query.
+
+    :returns: the filtered query, or None if a filter names something that
+              is not a column of the model, as no row can match it
+    """
+    for key in filters:
+        if key not in model.__table__.columns:
+            LOG.debug(_("'%(key)s' filter does not match any %(model)s"),
+                      {'key': key, 'model': model.__name__})
+            return None
+
+    return query.filter_by(**filters)
+
+
 @require_admin_context
 def volume_get_iscsi_target_num(context, volume_id):
     result = model_query(context, models.IscsiTarget, read_deleted="yes").\
@@ -1483,11 +1598,34 @@ def snapshot_get(context, snapshot_id):
     return _snapshot_get(context, snapshot_id)
 
 
+def _snapshot_get_all_paginated(context, query, marker, limit, sort_key,
+                                sort_dir, filters, session):
+    if filters:
+        query = _process_model_filters(query, models.Snapshot, filters)
+        if query is None:
+            return []
+
+    marker_snapshot = None
+    if marker is not None:
+        marker_snapshot = _snapshot_get(context, marker, session=session)
+
+    query = sqlalchemyutils.paginate_query(query, models.Snapshot, limit,
+                                           [sort_key, 'created_at', 'id'],
+                                           marker=marker_snapshot,
+                                           sort_dir=sort_dir)
+    return query.all()
+
+
 @require_admin_context
-def snapshot_get_all(context):
-    return model_query(context, models.Snapshot).\
-        options(joinedload('snapshot_metadata')).\
-        all()
+def snapshot_get_all(context, marker=None, limit=None, sort_key='created_at',
+                     sort_dir='asc', filters=None):
+    session = get_session()
+    with session.begin():
+        query = model_query(context, models.Snapshot, session=session).\
+            options(joinedload('snapshot_metadata'))
+        return _snapshot_get_all_paginated(context, query, marker, limit,
+                                           sort_key, sort_dir, filters,
+                                           session)
 
 
 @require_context
@@ -1500,12 +1638,18 @@ def snapshot_get_all_for_volume(context, volume_id):
 
 
 @require_context
-def snapshot_get_all_by_project(context, project_id):
+def snapshot_get_all_by_project(context, project_id, marker=None, limit=None,
+                                sort_key='created_at', sort_dir='asc',
+                                filters=None):
     authorize_project_context(context, project_id)
-    return model_query(context, models.Snapshot).\
-        filter_by(project_id=project_id).\
-        options(joinedload('snapshot_metadata')).\
-        all()
+    session = get_session()
+    with session.begin():
+        query = model_query(context, models.Snapshot, session=session).\
+            filter_by(project_id=project_id).\
+            options(joinedload('snapshot_metadata'))
+        return _snapshot_get_all_paginated(context, query, marker, limit,
+                                           sort_key, sort_dir, filters,
+                                           session)
 
 
 @require_context
@@ -2324,6 +2468,25 @@ def volume_glance_metadata_get_all(context):
     return _volume_glance_metadata_get_all(context)
 
 
+@require_context
+def volume_glance_metadata_get_all_by_volume_ids(context, volume_ids):
+    """Return the Glance metadata for the given volumes in one query."""
+    if not volume_ids:
+        return []
+
+    query = model_query(context, models.VolumeGlanceMetadata).\
+        filter(models.VolumeGlanceMetadata.volume_id.in_(volume_ids)).\
+        filter_by(deleted=False)
+    if is_user_context(context):
+        # NOTE: the glance metadata has no project of its own, it belongs
+        #       to the project of its volume.
+        query = query.join(models.Volume,
+                           models.VolumeGlanceMetadata.volume_id ==
+                           models.Volume.id).\
+            filter(models.Volume.project_id == context.project_id)
+    return query.all()
+
+
 @require_context
 @require_volume_exists
 def _volume_glance_metadata_get(context, volume_id, session=None):
@@ -2398,6 +2561,44 @@ def volume_glance_metadata_create(context, volume_id, key, value):
     return
 
 
+def _volume_glance_metadata_insert(session, metadata, volume_id=None,
+                                   snapshot_id=None):
+    """Insert key:value pairs of Glance metadata in a single statement."""
+    rows = [{'volume_id': volume_id,
+             'snapshot_id': snapshot_id,
+             'key': key,
+             'value': value} for key, value in metadata]
+    if rows:
+        session.execute(models.VolumeGlanceMetadata.__table__.insert(), rows)
+
+
+@require_context
+@require_volume_exists
+def volume_glance_metadata_bulk_create(context, volume_id, metadata):
+    """Update the Glance metadata for a volume by adding new key:value pairs.
+
+    All pairs are written in one transaction.  Keys which already exist for
+    the volume keep their value, like volume_glance_metadata_create this API
+    does not support changing the value of a key once it has been created.
+    """
+    if not metadata:
+        return
+
+    session = get_session()
+    with session.begin():
+        rows = session.query(models.VolumeGlanceMetadata).\
+            filter_by(volume_id=volume_id).\
+            filter(models.VolumeGlanceMetadata.key.in_(metadata.keys())).\
+            filter_by(deleted=False).all()
+        existing = set(row.key for row in rows)
+
+        _volume_glance_metadata_insert(
+            session,
+            [(key, str(value)) for key, value in metadata.items()
+             if key not in existing],
+            volume_id=volume_id)
+
+
 @require_context
 @require_snapshot_exists
 def volume_glance_metadata_copy_to_snapshot(context, snapshot_id, volume_id):
@@ -2412,13 +2613,9 @@ def volume_glance_metadata_copy_to_snapshot(context, snapshot_id, volume_id):
     with session.begin():
         metadata = _volume_glance_metadata_get(context, volume_id,
                                                session=session)
-        for meta in metadata:
-            vol_glance_metadata = models.VolumeGlanceMetadata()
-            vol_glance_metadata.snapshot_id = snapshot_id
-            vol_glance_metadata.key = meta['key']
-            vol_glance_metadata.value = meta['value']
-
-            vol_glance_metadata.save(session=session)
+        _volume_glance_metadata_insert(
+            session, [(meta['key'], meta['value']) for meta in metadata],
+            snapshot_id=snapshot_id)
 
 
 @require_context
@@ -2438,13 +2635,9 @@ def volume_glance_metadata_copy_from_volume_to_volume(context,
         metadata = _volume_glance_metadata_get(context,
                                                src_volume_id,
                                                session=session)
-        for meta in metadata:
-            vol_glance_metadata = models.VolumeGlanceMetadata()
-            vol_glance_metadata.volume_id = volume_id
-            vol_glance_metadata.key = meta['key']
-            vol_glance_metadata.value = meta['value']
-
-            vol_glance_metadata.save(session=session)
+        _volume_glance_metadata_insert(
+            session, [(meta['key'], meta['value']) for meta in metadata],
+            volume_id=volume_id)
 
 
 @require_context
@@ -2460,13 +2653,9 @@ def volume_glance_metadata_copy_to_volume(context, volume_id, snapshot_id):
     with session.begin():
         metadata = _volume_snapshot_glance_metadata_get(context, snapshot_id,
                                                         session=session)
-        for meta in metadata:
-            vol_glance_metadata = models.VolumeGlanceMetadata()
-            vol_glance_metadata.volume_id = volume_id
-            vol_glance_metadata.key = meta['key']
-            vol_glance_metadata.value = meta['value']
-
-            vol_glance_metadata.save(session=session)
+        _volume_glance_metadata_insert(
+            session, [(meta['key'], meta['value']) for meta in metadata],
+            volume_id=volume_id)
 
 
 @require_context
@@ -2491,8 +2680,9 @@ def volume_glance_metadata_delete_by_snapshot(context, snapshot_id):
 
 
 @require_context
-def backup_get(context, backup_id):
-    result = model_query(context, models.Backup, project_only=True).\
+def _backup_get(context, backup_id, session=None):
+    result = model_query(context, models.Backup, session=session,
+                         project_only=True).\
         filter_by(id=backup_id).\
         first()
 
@@ -2502,9 +2692,37 @@ def backup_get(context, backup_id):
     return result
 
 
+@require_context
+def backup_get(context, backup_id):
+    return _backup_get(context, backup_id)
+
+
+def _backup_get_all_paginated(context, query, marker, limit, sort_key,
+                              sort_dir, filters, session):
+    if filters:
+        query = _process_model_filters(query, models.Backup, filters)
+        if query is None:
+            return []
+
+    marker_backup = None
+    if marker is not None:
+        marker_backup = _backup_get(context, marker, session=session)
+
+    query = sqlalchemyutils.paginate_query(query, models.Backup, limit,
+                                           [sort_key, 'created_at', 'id'],
+                                           marker=marker_backup,
+                                           sort_dir=sort_dir)
+    return query.all()
+
+
 @require_admin_context
-def backup_get_all(context):
-    return model_query(context, models.Backup).all()
+def backup_get_all(context, marker=None, limit=None, sort_key='created_at',
+                   sort_dir='asc', filters=None):
+    session = get_session()
+    with session.begin():
+        query = model_query(context, models.Backup, session=session)
+        return _backup_get_all_paginated(context, query, marker, limit,
+                                         sort_key, sort_dir, filters, session)
 
 
 @require_admin_context
@@ -2513,11 +2731,24 @@ def backup_get_all_by_host(context, host):
 
 
 @require_context
-def backup_get_all_by_project(context, project_id):
+def backup_get_all_by_project(context, project_id, marker=None, limit=None,
+                              sort_key='created_at', sort_dir='asc',
+                              filters=None):
     authorize_project_context(context, project_id)
+    session = get_session()
+    with session.begin():
+        query = model_query(context, models.Backup, session=session).\
+            filter_by(project_id=project_id)
+        return _backup_get_all_paginated(context, query, marker, limit,
+                                         sort_key, sort_dir, filters, session)
 
-    return model_query(context, models.Backup).\
-        filter_by(project_id=project_id).all()
+
+@require_context
+def backup_get_all_by_volume(context, volume_id):
+    return model_query(context, models.Backup, project_only=True).\
+        filter_by(volume_id=volume_id).\
+        order_by(models.Backup.created_at.desc()).\
+        all()
 
 
 @require_context
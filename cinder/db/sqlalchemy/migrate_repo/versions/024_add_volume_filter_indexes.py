@@ -0,0 +1,37 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy import Index, MetaData, Table
+
+
+def _indexes(meta):
+    volumes = Table('volumes', meta, autoload=True)
+    volume_metadata = Table('volume_metadata', meta, autoload=True)
+    return [Index('volumes_project_id_deleted_idx',
+                  volumes.c.project_id, volumes.c.deleted),
+            Index('volumes_status_idx', volumes.c.status),
+            Index('volume_metadata_key_value_idx',
+                  volume_metadata.c.key, volume_metadata.c.value)]
+
+
+def upgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+    for index in _indexes(meta):
+        index.create(migrate_engine)
+
+
+def downgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+    for index in _indexes(meta):
+        index.drop(migrate_engine)
@@ -0,0 +1,177 @@
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Cache of fetched and converted images on the volume host.
+
+Creating many volumes from one image would otherwise download, and for
+non-raw images convert, the same image once per volume. Entries are raw
+image files named after the image id and checksum, so a changed image is
+never served from the cache. The cache is bounded in size and evicts the
+least recently used entries first.
+
+**Related Flags**
+
+:image_cache_dir: Directory holding the cached images
+                  (default: $state_path/image-cache).
+:image_cache_max_size_gb: The maximum size of the cache in GiB, 0 disables
+                          the cache (default: 0).
+"""
+
+import collections
+import contextlib
+import os
+import tempfile
+
+from oslo.config import cfg
+
+from cinder.openstack.common import fileutils
+from cinder.openstack.common import log as logging
+from cinder import units
+
+LOG = logging.getLogger(__name__)
+
+image_cache_opts = [
+    cfg.StrOpt('image_cache_dir',
+               default='$state_path/image-cache',
+               help='Directory used to cache fetched and converted images '
+                    'on the volume host'),
+    cfg.IntOpt('image_cache_max_size_gb',
+               default=0,
+               help='The maximum size in GiB of the image cache on the '
+                    'volume host. 0 => disabled'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(image_cache_opts)
+
+STAGING_PREFIX = 'tmp'
+
+_cache = None
+
+
+class ImageCache(object):
+    """Size bounded LRU cache of raw image files."""
+
+    def __init__(self, cache_dir, max_size):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Entries in least recently used order, mapped to their size.
+        self._entries = collections.OrderedDict()
+        self._in_use = collections.defaultdict(int)
+        self._load()
+
+    def _load(self):
+        """Rebuild the LRU order from the files left by a previous run."""
+        fileutils.ensure_tree(self.cache_dir)
+        found = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith(STAGING_PREFIX):
+                fileutils.delete_if_exists(path)
+                continue
+            stat = os.stat(path)
+            found.append((stat.st_mtime, name, stat.st_size))
+        for _mtime, name, size in sorted(found):
+            self._entries[name] = size
+        self._evict()
+
+    @staticmethod
+    def key(image_id, checksum):
+        return '%s_%s' % (image_id, checksum)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    @property
+    def size(self):
+        return sum(self._entries.values())
+
+    def get(self, key):
+        """Return the path of a cached image or None on a miss."""
+        if key not in self._entries:
+            self.misses += 1
+            LOG.debug(_('Image cache miss for %s'), key)
+            return None
+
+        self.hits += 1
+        LOG.debug(_('Image cache hit for %s'), key)
+        self._entries[key] = self._entries.pop(key)
+        path = self._path(key)
+        # The modification time keeps the LRU order across restarts.
+        os.utime(path, None)
+        return path
+
+    @contextlib.contextmanager
+    def staging_file(self):
+        """Yield a file in the cache directory to fetch an image into."""
+        fd, path = tempfile.mkstemp(prefix=STAGING_PREFIX,
+                                    dir=self.cache_dir)
+        os.close(fd)
+        try:
+            yield path
+        finally:
+            fileutils.delete_if_exists(path)
+
+    def add(self, key, staging_path):
+        """Move a fetched image into the cache and return its path."""
+        path = self._path(key)
+        os.rename(staging_path, path)
+        self._entries.pop(key, None)
+        self._entries[key] = os.path.getsize(path)
+        self._evict()
+        return path
+
+    @contextlib.contextmanager
+    def in_use(self, key):
+        """Keep an entry from being evicted while it is being read."""
+        self._in_use[key] += 1
+        try:
+            yield
+        finally:
+            self._in_use[key] -= 1
+            if not self._in_use[key]:
+                del self._in_use[key]
+
+    def _evict(self):
+        for key in list(self._entries):
+            if self.size <= self.max_size:
+                break
+            if key in self._in_use:
+                continue
+            LOG.debug(_('Evicting %s from the image cache'), key)
+            del self._entries[key]
+            self.evictions += 1
+            fileutils.delete_if_exists(self._path(key))
+
+    def get_stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'size_gb': float(self.size) / units.GiB}
+
+
+def get_cache():
+    """Return the image cache of this host, or None if it is disabled."""
+    global _cache
+    if not CONF.image_cache_max_size_gb:
+        return None
+    if _cache is None:
+        _cache = ImageCache(CONF.image_cache_dir,
+                            CONF.image_cache_max_size_gb * units.GiB)
+    return _cache
@@ -19,7 +19,10 @@
 
 from __future__ import absolute_import
 
+import collections
 import copy
+import hashlib
+import httplib
 import itertools
 import random
 import shutil
@@ -27,6 +30,7 @@ import sys
 import time
 import urlparse
 
+from eventlet import greenpool
 import glanceclient.exc
 from oslo.config import cfg
 
@@ -34,6 +38,7 @@ from cinder import exception
 from cinder.openstack.common import jsonutils
 from cinder.openstack.common import log as logging
 from cinder.openstack.common import timeutils
+from cinder import units
 
 glance_opts = [
     cfg.ListOpt('allowed_direct_url_schemes',
@@ -41,12 +46,47 @@ glance_opts = [
                 help='A list of url schemes that can be downloaded directly '
                      'via the direct_url.  Currently supported schemes: '
                      '[file].'),
+    cfg.IntOpt('glance_client_pool_size',
+               default=64,
+               help='Number of glance clients, one per api server, api '
+                    'version and auth token, kept for reuse along with '
+                    'their http connections. 0 creates a new client for '
+                    'every call.'),
+    cfg.IntOpt('glance_image_meta_cache_ttl',
+               default=10,
+               help='Seconds image metadata shown by glance is reused for '
+                    'further requests of the same image in the same project '
+                    'and user. 0 disables the cache.'),
+    cfg.IntOpt('glance_image_meta_cache_size',
+               default=512,
+               help='Number of image metadata entries the cache keeps, the '
+                    'least recently used ones are dropped first.'),
+    cfg.IntOpt('glance_download_ranges',
+               default=1,
+               help='Number of byte ranges of an image downloaded '
+                    'concurrently. Ranges are retried from the last byte '
+                    'received after a failure. Glance servers which do not '
+                    'support range requests get a single request. 1 '
+                    'downloads every image with a single request.'),
+    cfg.IntOpt('glance_download_range_size_mb',
+               default=16,
+               help='Size in MB of the byte ranges images are downloaded '
+                    'in, every concurrent range is held in memory until it '
+                    'is written.'),
 ]
 CONF = cfg.CONF
 CONF.register_opts(glance_opts)
 
 LOG = logging.getLogger(__name__)
 
+# Errors after which a download is retried, including connections dropped
+# while the data is read.
+_DOWNLOAD_RETRY_EXCS = (glanceclient.exc.ServiceUnavailable,
+                        glanceclient.exc.InvalidEndpoint,
+                        glanceclient.exc.CommunicationError,
+                        IOError,
+                        httplib.HTTPException)
+
 
 def _parse_image_ref(image_href):
     """Parse an image href into composite parts.
@@ -84,6 +124,77 @@ def _create_glance_client(context, netloc, use_ssl,
     return glanceclient.Client(str(version), endpoint, **params)
 
 
+class _LRUCache(object):
+    """Per-process mapping which keeps a bounded number of entries.
+
+    The least recently used entries are dropped first.  When a ttl option
+    is given, entries also expire after that many seconds and a ttl of 0
+    disables the cache.
+    """
+
+    def __init__(self, size_opt, ttl_opt=None):
+        self._size_opt = size_opt
+        self._ttl_opt = ttl_opt
+        self._entries = collections.OrderedDict()
+
+    def _ttl(self):
+        if self._ttl_opt is None:
+            return None
+        return getattr(CONF, self._ttl_opt)
+
+    def get(self, key):
+        try:
+            stored_at, value = self._entries.pop(key)
+        except KeyError:
+            return None
+        ttl = self._ttl()
+        if ttl is not None and timeutils.is_older_than(stored_at, ttl):
+            return None
+        self._entries[key] = (stored_at, value)
+        return value
+
+    def put(self, key, value):
+        size = getattr(CONF, self._size_opt)
+        if size <= 0 or self._ttl() == 0:
+            return
+        self._entries.pop(key, None)
+        self._entries[key] = (timeutils.utcnow(), value)
+        while len(self._entries) > size:
+            self._entries.popitem(last=False)
+
+    def discard(self, match):
+        """Drop the entries whose key `match` returns True for."""
+        for key in [key for key in self._entries if match(key)]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+
+_CLIENTS = _LRUCache('glance_client_pool_size')
+_IMAGE_META = _LRUCache('glance_image_meta_cache_size',
+                        'glance_image_meta_cache_ttl')
+
+
+def _get_glance_client(context, netloc, use_ssl, version=None):
+    """Return a pooled glanceclient.Client object, creating it if needed.
+
+    A client holds the auth token of the context it was created for, so
+    clients are only shared by calls made with the same token.
+    """
+    if version is None:
+        version = CONF.glance_api_version
+    token = None
+    if CONF.auth_strategy == 'keystone':
+        token = context.auth_token
+    key = (netloc, use_ssl, version, token)
+    client = _CLIENTS.get(key)
+    if client is None:
+        client = _create_glance_client(context, netloc, use_ssl, version)
+        _CLIENTS.put(key, client)
+    return client
+
+
 def get_api_servers():
     """Return Iterable over shuffled api servers.
 
@@ -122,18 +233,18 @@ class GlanceClientWrapper(object):
         self.netloc = netloc
         self.use_ssl = use_ssl
         self.version = version
-        return _create_glance_client(context,
-                                     self.netloc,
-                                     self.use_ssl, self.version)
+        return _get_glance_client(context,
+                                  self.netloc,
+                                  self.use_ssl, self.version)
 
     def _create_onetime_client(self, context, version):
         """Create a client that will be used for one call."""
         if self.api_servers is None:
             self.api_servers = get_api_servers()
         self.netloc, self.use_ssl = self.api_servers.next()
-        return _create_glance_client(context,
-                                     self.netloc,
-                                     self.use_ssl, version)
+        return _get_glance_client(context,
+                                  self.netloc,
+                                  self.use_ssl, version)
 
     def call(self, context, method, *args, **kwargs):
         """Call a glance client method.
@@ -177,6 +288,114 @@ class GlanceClientWrapper(object):
                 LOG.exception(error_msg)
                 time.sleep(1)
 
+    def data_range(self, context, image_id, start, end):
+        """Request bytes start to end, inclusive, of the data of an image.
+
+        Returns whether the server honoured the range and an iterator over
+        the body. Servers which do not support ranges send all the data,
+        their response is closed and no body is returned.
+        """
+        version = self.version or CONF.glance_api_version
+        if version == 2:
+            url = '/v2/images/%s/file' % image_id
+        else:
+            url = '/v1/images/%s' % image_id
+        client = self.client or self._create_onetime_client(context, version)
+        resp, body = client.http_client.raw_request(
+            'GET', url, headers={'Range': 'bytes=%d-%d' % (start, end)})
+        status = getattr(resp, 'status_code', None) or resp.status
+        if status != httplib.PARTIAL_CONTENT:
+            # NOTE: do not let the connection stream the whole image while
+            #       the caller falls back to another request.
+            resp.close()
+            return False, None
+        return True, body
+
+
+class _RangesNotSupported(Exception):
+    pass
+
+
+class _RangedDownload(object):
+    """Downloads the data of an image in concurrent byte ranges.
+
+    Every range is retried from the last byte received after a failure.
+    Ranges are written in order, which lets the checksum of the image be
+    computed as the data is written.
+    """
+
+    def __init__(self, client, context, image_id, size):
+        self._client = client
+        self._context = context
+        self._image_id = image_id
+        self._size = size
+        self._range_size = CONF.glance_download_range_size_mb * units.MiB
+        self.md5 = hashlib.md5()
+
+    def _fetch_range(self, start, end):
+        """Return bytes start to end, inclusive, of the image data."""
+        chunks = []
+        received = 0
+        num_attempts = 1 + CONF.glance_num_retries
+        for attempt in xrange(1, num_attempts + 1):
+            try:
+                ranged, body = self._client.data_range(
+                    self._context, self._image_id, start + received, end)
+                if not ranged and start == 0:
+                    # NOTE: nothing has been written yet, the caller can
+                    # still download the image with a single request.
+                    raise _RangesNotSupported()
+                if not ranged:
+                    raise exception.GlanceConnectionFailed(
+                        reason=_('glance server does not support range '
+                                 'requests'))
+                for chunk in body:
+                    chunks.append(chunk)
+                    received += len(chunk)
+                if start + received > end:
+                    return ''.join(chunks)[:end - start + 1]
+                raise IOError(_('Connection closed after %d bytes') %
+                              (start + received))
+            except _DOWNLOAD_RETRY_EXCS as e:
+                msg = (_("Error downloading bytes %(start)d-%(end)d of "
+                         "image %(image_id)s at byte %(offset)d") %
+                       {'start': start, 'end': end,
+                        'image_id': self._image_id,
+                        'offset': start + received})
+                if attempt == num_attempts:
+                    LOG.exception(msg)
+                    raise exception.GlanceConnectionFailed(reason=e)
+                LOG.warn(_('%s, retrying.') % msg)
+                time.sleep(1)
+
+    def _write(self, data, chunk):
+        data.write(chunk)
+        self.md5.update(chunk)
+
+    def download(self, data):
+        """Write the image data to data.
+
+        :raises: _RangesNotSupported before anything is written when the
+                 server does not honour range requests
+        """
+        ranges = [(start, min(start + self._range_size, self._size) - 1)
+                  for start in xrange(0, self._size, self._range_size)]
+        # NOTE: the first range tells whether the server supports ranges.
+        self._write(data, self._fetch_range(*ranges[0]))
+
+        pool = greenpool.GreenPool(CONF.glance_download_ranges)
+        pending = collections.deque()
+        try:
+            for start, end in ranges[1:]:
+                pending.append(pool.spawn(self._fetch_range, start, end))
+                if len(pending) >= CONF.glance_download_ranges:
+                    self._write(data, pending.popleft().wait())
+            while pending:
+                self._write(data, pending.popleft().wait())
+        finally:
+            for thread in pending:
+                thread.kill()
+
 
 class GlanceImageService(object):
     """Provides storage and retrieval of disk image objects within Glance."""
@@ -216,16 +435,25 @@ class GlanceImageService(object):
 
     def show(self, context, image_id):
         """Returns a dict with image data for the given opaque image id."""
-        try:
-            image = self._client.call(context, 'get', image_id)
-        except Exception:
-            _reraise_translated_image_exception(image_id)
+        # NOTE: what an image looks like depends on who asks for it, so the
+        # metadata is only reused for the same project, user and role.
+        key = (image_id, getattr(context, 'project_id', None),
+               getattr(context, 'user_id', None),
+               getattr(context, 'is_admin', None))
+        base_image_meta = _IMAGE_META.get(key)
+        if base_image_meta is None:
+            try:
+                image = self._client.call(context, 'get', image_id)
+            except Exception:
+                _reraise_translated_image_exception(image_id)
 
-        if not self._is_image_available(context, image):
-            raise exception.ImageNotFound(image_id=image_id)
+            if not self._is_image_available(context, image):
+                raise exception.ImageNotFound(image_id=image_id)
 
-        base_image_meta = self._translate_from_glance(image)
-        return base_image_meta
+            base_image_meta = self._translate_from_glance(image)
+            _IMAGE_META.put(key, base_image_meta)
+
+        return copy.deepcopy(base_image_meta)
 
     def get_location(self, context, image_id):
         """Returns the direct url representing the backend storage location,
@@ -263,6 +491,17 @@ class GlanceImageService(object):
                     shutil.copyfileobj(f, data)
                 return
 
+        if data and CONF.glance_download_ranges > 1:
+            image_meta = self.show(context, image_id)
+            if image_meta.get('size'):
+                try:
+                    self._download_ranges(context, image_meta, data)
+                    return
+                except _RangesNotSupported:
+                    LOG.debug(_('Glance does not support range requests, '
+                                'downloading image %s with one request.'),
+                              image_id)
+
         try:
             image_chunks = self._client.call(context, 'data', image_id)
         except Exception:
@@ -274,6 +513,24 @@ class GlanceImageService(object):
             for chunk in image_chunks:
                 data.write(chunk)
 
+    def _download_ranges(self, context, image_meta, data):
+        """Download the image data in concurrent ranges and verify it."""
+        image_id = image_meta['id']
+        download = _RangedDownload(self._client, context, image_id,
+                                   image_meta['size'])
+        try:
+            download.download(data)
+        except Exception:
+            _reraise_translated_image_exception(image_id)
+
+        checksum = image_meta.get('checksum')
+        if checksum and download.md5.hexdigest() != checksum:
+            raise exception.ImageUnacceptable(
+                image_id=image_id,
+                reason=_("Checksum of the downloaded data is %(actual)s, "
+                         "expected %(expected)s.") %
+                {'actual': download.md5.hexdigest(), 'expected': checksum})
+
     def create(self, context, image_meta, data=None):
         """Store the image data and return the new image object."""
         sent_service_image_meta = self._translate_to_glance(image_meta)
@@ -298,6 +555,7 @@ class GlanceImageService(object):
         image_meta.pop('id', None)
         if data:
             image_meta['data'] = data
+        _IMAGE_META.discard(lambda key: key[0] == image_id)
         try:
             #NOTE(dosaboy): the v2 api separates update from upload
             if data and CONF.glance_api_version > 1:
@@ -318,6 +576,7 @@ class GlanceImageService(object):
         :raises: NotAuthorized if the user is not an owner.
 
         """
+        _IMAGE_META.discard(lambda key: key[0] == image_id)
         try:
             self._client.call(context, 'delete', image_id)
         except glanceclient.exc.NotFound:
@@ -25,12 +25,14 @@ we should look at maybe pushing this up to Oslo
 
 
 import contextlib
+import math
 import os
 import tempfile
 
 from oslo.config import cfg
 
 from cinder import exception
+from cinder.image import cache as image_cache
 from cinder.openstack.common import fileutils
 from cinder.openstack.common import imageutils
 from cinder.openstack.common import log as logging
@@ -49,6 +51,24 @@ image_helper_opt = [cfg.StrOpt('image_conversion_dir',
 CONF = cfg.CONF
 CONF.register_opts(image_helper_opt)
 
+# Magic numbers, with their offsets, of the image formats qemu probes for.
+# A "raw" image starting with one of them could later be opened as that
+# format by anything probing the volume, so it is not written as raw.
+IMAGE_FORMAT_MAGICS = [
+    (0, 'QFI\xfb'),                   # qcow, qcow2
+    (0, 'QED\x00'),                   # qed
+    (0, 'KDMV'),                      # vmdk
+    (0, 'COWD'),                      # vmdk3
+    (0, '# Disk DescriptorFile'),     # vmdk descriptor
+    (0, 'conectix'),                  # vpc
+    (0, 'vhdxfile'),                  # vhdx
+    (0x40, '\x7f\x10\xda\xbe'),       # vdi
+    (0, 'Bochs Virtual HD Image'),    # bochs
+    (0, 'WithoutFreeSpace'),          # parallels
+    (0, 'WithouFreSpacExt'),          # parallels
+]
+RAW_HEADER_SIZE = 512
+
 
 def qemu_img_info(path):
     """Return a object containing the parsed output from qemu-img info."""
@@ -132,9 +152,70 @@ def fetch_to_volume_format(context, image_service,
             os.path.exists(CONF.image_conversion_dir)):
         os.makedirs(CONF.image_conversion_dir)
 
-    qemu_img = True
     image_meta = image_service.show(context, image_id)
 
+    cache = image_cache.get_cache()
+    if (cache and volume_format == 'raw' and image_meta and
+            image_meta.get('checksum')):
+        _fetch_cached_to_volume(cache, context, image_service, image_id,
+                                dest, image_meta, blocksize,
+                                user_id, project_id, size)
+        return
+
+    _fetch_to_volume_format(context, image_service, image_id, dest,
+                            volume_format, blocksize, image_meta,
+                            user_id, project_id, size)
+
+
+def _fetch_cached_to_volume(cache, context, image_service, image_id, dest,
+                            image_meta, blocksize, user_id, project_id, size):
+    """Copy a raw image to a volume through the image cache.
+
+    A miss fetches and converts the image into the cache first, later
+    volumes created from the same image are copied from the cached file.
+    """
+    key = cache.key(image_id, image_meta['checksum'])
+
+    @utils.synchronized('image-cache-%s' % key)
+    def _get_or_fetch():
+        path = cache.get(key)
+        if path is None:
+            with cache.staging_file() as staging:
+                _fetch_to_volume_format(context, image_service, image_id,
+                                        staging, 'raw', blocksize,
+                                        image_meta, user_id, project_id,
+                                        size)
+                path = cache.add(key, staging)
+        return path
+
+    with cache.in_use(key):
+        path = _get_or_fetch()
+        image_size = os.path.getsize(path)
+        if size is not None and image_size > size * units.GiB:
+            params = {'image_size': image_size, 'volume_size': size}
+            reason = _("Size is %(image_size)d bytes and doesn't fit in a "
+                       "volume of size %(volume_size)dGB.") % params
+            raise exception.ImageUnacceptable(image_id=image_id,
+                                              reason=reason)
+
+        LOG.debug(_('Copying cached image %(path)s to volume %(dest)s') %
+                  {'path': path, 'dest': dest})
+        size_in_m = int(math.ceil(float(image_size) / units.MiB))
+        volume_utils.copy_volume(path, dest, size_in_m, blocksize)
+
+
+def _fetch_to_volume_format(context, image_service, image_id, dest,
+                            volume_format, blocksize, image_meta,
+                            user_id=None, project_id=None, size=None):
+    qemu_img = True
+
+    if (image_meta and volume_format == 'raw' and
+            image_meta.get('disk_format') == 'raw' and
+            image_meta.get('container_format', 'bare') == 'bare'):
+        fetch_raw_to_volume(context, image_service, image_id, dest,
+                            image_meta, size=size)
+        return
+
     # NOTE(avishay): I'm not crazy about creating temp files which may be
     # large and cause disk full errors which would confuse users.
     # Unfortunately it seems that you can't pipe to 'qemu-img convert' because
@@ -206,13 +287,18 @@ def fetch_to_volume_format(context, image_service,
                 reason=_("fmt=%(fmt)s backed by:%(backing_file)s")
                 % {'fmt': fmt, 'backing_file': backing_file, })
 
-        # NOTE(jdg): I'm using qemu-img convert to write
-        # to the volume regardless if it *needs* conversion or not
-        # TODO(avishay): We can speed this up by checking if the image is raw
-        # and if so, writing directly to the device. However, we need to keep
-        # check via 'qemu-img info' that what we copied was in fact a raw
-        # image and not a different format with a backing file, which may be
-        # malicious.
+        # NOTE: images declared raw do not get here, they are streamed
+        # straight to the volume by fetch_raw_to_volume.  Other images
+        # which turn out to be raw need no conversion, so they are
+        # copied by the volume copy engine instead of qemu-img.
+        if fmt == 'raw' and volume_format == 'raw':
+            LOG.debug(_('Copying raw image %(image_id)s from %(tmp)s to '
+                        'volume %(dest)s') %
+                      {'image_id': image_id, 'tmp': tmp, 'dest': dest})
+            size_in_m = int(math.ceil(float(data.virtual_size) / units.MiB))
+            volume_utils.copy_volume(tmp, dest, size_in_m, blocksize)
+            return
+
         LOG.debug("%s was %s, converting to %s " % (image_id, fmt,
                                                     volume_format))
         convert_image(tmp, dest, volume_format)
@@ -227,6 +313,91 @@ def fetch_to_volume_format(context, image_service,
                                                    file_format})
 
 
+def check_raw_header(image_id, header):
+    """Refuse a raw image whose header belongs to another image format."""
+    for offset, magic in IMAGE_FORMAT_MAGICS:
+        if header[offset:offset + len(magic)] == magic:
+            raise exception.ImageUnacceptable(
+                image_id=image_id,
+                reason=_("Image is declared raw but has the header of "
+                         "another image format."))
+
+
+class RawImageWriter(object):
+    """File object that checks the header of a raw image as it is written.
+
+    Nothing reaches the volume until the header has been checked, and
+    nothing beyond max_size bytes reaches it at all.
+    """
+
+    def __init__(self, image_id, image_file, max_size=None):
+        self._image_id = image_id
+        self._image_file = image_file
+        self._max_size = max_size
+        self._written = 0
+        self._header = ''
+
+    def write(self, data):
+        # NOTE: the size glance reports can be missing or wrong, so count
+        # what actually arrives rather than trusting it.
+        self._written += len(data)
+        if self._max_size is not None and self._written > self._max_size:
+            reason = (_("Image is larger than the volume size of %d bytes.")
+                      % self._max_size)
+            raise exception.ImageUnacceptable(image_id=self._image_id,
+                                              reason=reason)
+        if self._header is not None:
+            self._header += data
+            if len(self._header) < RAW_HEADER_SIZE:
+                return
+            data, self._header = self._header, None
+            check_raw_header(self._image_id, data)
+        self._image_file.write(data)
+
+    def finish(self):
+        """Write out an image smaller than the header and flush it."""
+        if self._header:
+            check_raw_header(self._image_id, self._header)
+            self._image_file.write(self._header)
+        self._header = None
+        self._image_file.flush()
+        os.fsync(self._image_file.fileno())
+
+
+def _download_raw(context, image_service, image_id, dest, size=None):
+    # NOTE: the destination is not truncated, a file backed volume keeps
+    # its size when the image is smaller than the volume.
+    max_size = size * units.GiB if size is not None else None
+    with os.fdopen(os.open(dest, os.O_WRONLY), 'wb') as image_file:
+        writer = RawImageWriter(image_id, image_file, max_size)
+        image_service.download(context, image_id, writer)
+        writer.finish()
+
+
+def fetch_raw_to_volume(context, image_service, image_id, dest, image_meta,
+                        size=None):
+    """Stream a raw image straight to a volume.
+
+    There is no temporary copy in image_conversion_dir and no qemu-img
+    convert pass. The image header is checked as it arrives instead of
+    with qemu-img info.
+    """
+    image_size = image_meta.get('size')
+    if size is not None and image_size and image_size > size * units.GiB:
+        params = {'image_size': image_size, 'volume_size': size}
+        reason = _("Size is %(image_size)d bytes and doesn't fit in a "
+                   "volume of size %(volume_size)dGB.") % params
+        raise exception.ImageUnacceptable(image_id=image_id, reason=reason)
+
+    LOG.debug(_('Streaming raw image %(image_id)s to %(dest)s') %
+              {'image_id': image_id, 'dest': dest})
+    if os.name == 'nt' or os.access(dest, os.W_OK):
+        _download_raw(context, image_service, image_id, dest, size)
+    else:
+        with utils.temporary_chown(dest):
+            _download_raw(context, image_service, image_id, dest, size)
+
+
 def upload_volume(context, image_service, image_meta, volume_path,
                   volume_format='raw'):
     image_id = image_meta['id']
@@ -56,7 +56,12 @@ quota_opts = [
                help='default driver to use for quota checks'),
     cfg.BoolOpt('use_default_quota_class',
                 default=True,
-                help='whether to use default quota class for default quota'), ]
+                help='whether to use default quota class for default quota'),
+    cfg.IntOpt('quota_volume_type_cache_ttl',
+               default=60,
+               help='number of seconds volume type quota resources are '
+                    'cached before the volume types are read again, 0 '
+                    'disables the cache'), ]
 
 CONF = cfg.CONF
 CONF.register_opts(quota_opts)
@@ -703,8 +708,9 @@ class QuotaEngine(object):
                            common user's tenant.
         """
 
-        return self._driver.limit_check(context, self.resources, values,
-                                        project_id=project_id)
+        return self._driver.limit_check(context,
+                                        self._get_resources(values),
+                                        values, project_id=project_id)
 
     def reserve(self, context, expire=None, project_id=None, **deltas):
         """Check quotas and reserve resources.
@@ -741,8 +747,9 @@ class QuotaEngine(object):
                            common user's tenant.
         """
 
-        reservations = self._driver.reserve(context, self.resources, deltas,
-                                            expire=expire,
+        reservations = self._driver.reserve(context,
+                                            self._get_resources(deltas),
+                                            deltas, expire=expire,
                                             project_id=project_id)
 
         LOG.debug(_("Created reservations %s") % reservations)
@@ -836,6 +843,14 @@ class QuotaEngine(object):
                 vtype_quota = "%s_%s" % (quota, volume_type['name'])
                 opts[vtype_quota] = opts[quota]
 
+    def _get_resources(self, names):
+        """Fetches the resources needed to handle the given names.
+
+        :param names: The names of the resources a request touches.
+        """
+
+        return self.resources
+
     @property
     def resource_names(self):
         return sorted(self.resources.keys())
@@ -848,26 +863,104 @@ class QuotaEngine(object):
 class VolumeTypeQuotaEngine(QuotaEngine):
     """Represent the set of all quotas."""
 
-    @property
-    def resources(self):
-        """Fetches all possible quota resources."""
+    def __init__(self, quota_driver_class=None):
+        """Initialize a VolumeTypeQuotaEngine."""
+
+        super(VolumeTypeQuotaEngine, self).__init__(quota_driver_class)
 
-        result = {}
         # Global quotas.
         argses = [('volumes', '_sync_volumes', 'quota_volumes'),
                   ('snapshots', '_sync_snapshots', 'quota_snapshots'),
                   ('gigabytes', '_sync_gigabytes', 'quota_gigabytes'), ]
         for args in argses:
             resource = ReservableResource(*args)
-            result[resource.name] = resource
-
-        # Volume type quotas.
+            self._resources[resource.name] = resource
+
+        # Volume type quotas, as (loaded_at, resources) keyed by the
+        # name of the volume type.
+        self._volume_type_resources = {}
+        self._volume_types_loaded_at = None
+
+    @staticmethod
+    def _is_stale(loaded_at):
+        ttl = CONF.quota_volume_type_cache_ttl
+        return (ttl <= 0 or loaded_at is None or
+                timeutils.is_older_than(loaded_at, ttl))
+
+    @staticmethod
+    def _make_volume_type_resources(volume_type):
+        resources = {}
+        for part_name in ('volumes', 'gigabytes', 'snapshots'):
+            resource = VolumeTypeResource(part_name, volume_type)
+            resources[resource.name] = resource
+        return resources
+
+    def _load_volume_types(self):
         volume_types = db.volume_type_get_all(context.get_admin_context(),
                                               False)
-        for volume_type in volume_types.values():
-            for part_name in ('volumes', 'gigabytes', 'snapshots'):
-                resource = VolumeTypeResource(part_name, volume_type)
-                result[resource.name] = resource
+        loaded_at = timeutils.utcnow()
+        self._volume_type_resources = dict(
+            (name, (loaded_at, self._make_volume_type_resources(vtype)))
+            for name, vtype in volume_types.items())
+        self._volume_types_loaded_at = loaded_at
+
+    def _get_volume_type_resources(self, name):
+        entry = self._volume_type_resources.get(name)
+        if entry is None or self._is_stale(entry[0]):
+            try:
+                volume_type = db.volume_type_get_by_name(
+                    context.get_admin_context(), name)
+            except exception.VolumeTypeNotFoundByName:
+                self._volume_type_resources.pop(name, None)
+                return {}
+            entry = (timeutils.utcnow(),
+                     self._make_volume_type_resources(volume_type))
+            self._volume_type_resources[name] = entry
+        return entry[1]
+
+    def _get_resources(self, names):
+        """Fetches the resources needed to handle the given names.
+
+        Only the volume types named by volume type quotas are looked
+        up.  Names which do not resolve to a resource are left out, so
+        that the driver reports them as unknown.
+
+        :param names: The names of the resources a request touches.
+        """
+
+        result = {}
+        for name in names:
+            if name in self._resources:
+                result[name] = self._resources[name]
+                continue
+            part_name, sep, volume_type_name = name.partition('_')
+            if not sep or part_name not in self._resources:
+                continue
+            resources = self._get_volume_type_resources(volume_type_name)
+            if name in resources:
+                result[name] = resources[name]
+        return result
+
+    def invalidate_volume_types(self):
+        """Drops the cached volume type quota resources.
+
+        Called when volume types are created or deleted, so that the
+        next request reads the volume types again.
+        """
+
+        self._volume_type_resources = {}
+        self._volume_types_loaded_at = None
+
+    @property
+    def resources(self):
+        """Fetches all possible quota resources."""
+
+        if self._is_stale(self._volume_types_loaded_at):
+            self._load_volume_types()
+
+        result = dict(self._resources)
+        for loaded_at, resources in self._volume_type_resources.values():
+            result.update(resources)
         return result
 
     def register_resource(self, resource):
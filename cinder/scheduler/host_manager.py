@@ -17,6 +17,7 @@
 Manage hosts in the current zone.
 """
 
+import collections
 import UserDict
 
 from oslo.config import cfg
@@ -25,6 +26,9 @@ from cinder import db
 from cinder import exception
 from cinder.openstack.common import log as logging
 from cinder.openstack.common.scheduler import filters
+from cinder.openstack.common.scheduler.filters import availability_zone_filter
+from cinder.openstack.common.scheduler.filters import capabilities_filter
+from cinder.openstack.common.scheduler.filters import extra_specs_ops
 from cinder.openstack.common.scheduler import weights
 from cinder.openstack.common import timeutils
 from cinder import utils
@@ -49,6 +53,7 @@ host_manager_opts = [
 CONF = cfg.CONF
 CONF.register_opts(host_manager_opts)
 CONF.import_opt('scheduler_driver', 'cinder.scheduler.manager')
+CONF.import_opt('report_interval', 'cinder.service')
 
 LOG = logging.getLogger(__name__)
 
@@ -162,9 +167,23 @@ class HostManager(object):
 
     host_state_cls = HostState
 
+    # Capabilities that hosts are indexed by, so that requests whose volume
+    # type asks for one of them only run the filters over matching hosts.
+    indexed_capabilities = ('volume_backend_name', 'storage_protocol')
+
     def __init__(self):
         self.service_states = {}  # { <host>: {<service>: {cap k : v}}}
         self.host_state_map = {}
+        # The capabilities report and service row each host state was last
+        # refreshed from.
+        self._host_state_sources = {}
+        # The volume service rows, when they were read and their hosts.
+        self._volume_services = None
+        self._volume_services_read_at = None
+        self._volume_service_hosts = set()
+        # { <capability or 'availability_zone'>: {<value>: set(<host>)} }
+        self._host_index = collections.defaultdict(
+            lambda: collections.defaultdict(set))
         self.filter_handler = filters.HostFilterHandler('cinder.scheduler.'
                                                         'filters')
         self.filter_classes = self.filter_handler.get_all_classes()
@@ -244,10 +263,70 @@ class HostManager(object):
             raise exception.SchedulerHostWeigherNotFound(weigher_name=msg)
         return good_weighers
 
+    def _index_host(self, host_state):
+        self._unindex_host(host_state.host)
+        values = [(key, host_state.capabilities.get(key))
+                  for key in self.indexed_capabilities]
+        values.append(('availability_zone',
+                       host_state.service.get('availability_zone')))
+        for key, value in values:
+            if value is not None:
+                self._host_index[key][value].add(host_state.host)
+
+    def _unindex_host(self, host):
+        for values in self._host_index.itervalues():
+            for hosts in values.itervalues():
+                hosts.discard(host)
+
+    def _get_candidate_hosts(self, filter_classes, filter_properties):
+        """Return the names of the hosts the indexed filters may pass.
+
+        None means that the request does not ask for any indexed value.
+        """
+        requirements = []
+        if any(issubclass(cls, capabilities_filter.CapabilitiesFilter)
+               for cls in filter_classes):
+            resource_type = filter_properties.get('resource_type') or {}
+            extra_specs = resource_type.get('extra_specs') or {}
+            for key in self.indexed_capabilities:
+                for spec in (key, 'capabilities:%s' % key):
+                    if spec in extra_specs:
+                        requirements.append(
+                            (key, lambda value, req=extra_specs[spec]:
+                             extra_specs_ops.match(value, req)))
+        if any(issubclass(cls, availability_zone_filter.AvailabilityZoneFilter)
+               for cls in filter_classes):
+            spec = filter_properties.get('request_spec') or {}
+            props = spec.get('resource_properties') or {}
+            availability_zone = props.get('availability_zone')
+            if availability_zone:
+                requirements.append(
+                    ('availability_zone',
+                     lambda value: value == availability_zone))
+
+        candidates = None
+        for key, matches in requirements:
+            matching = set()
+            for value, hosts in self._host_index[key].iteritems():
+                if hosts and matches(value):
+                    matching.update(hosts)
+            if candidates is None:
+                candidates = matching
+            else:
+                candidates &= matching
+        return candidates
+
     def get_filtered_hosts(self, hosts, filter_properties,
                            filter_class_names=None):
         """Filter hosts and return only ones passing all filters."""
         filter_classes = self._choose_host_filters(filter_class_names)
+        candidates = self._get_candidate_hosts(filter_classes,
+                                               filter_properties)
+        if candidates is not None:
+            # Hosts this manager does not track are left to the filters.
+            hosts = [host for host in hosts
+                     if host.host in candidates or
+                     host.host not in self.host_state_map]
         return self.filter_handler.get_filtered_objects(filter_classes,
                                                         hosts,
                                                         filter_properties)
@@ -277,6 +356,32 @@ class HostManager(object):
         capab_copy["timestamp"] = timeutils.utcnow()  # Reported time
         self.service_states[host] = capab_copy
 
+    def _volume_services_stale(self):
+        if self._volume_services is None:
+            return True
+        read_at = self._volume_services_read_at
+        if timeutils.is_older_than(read_at, CONF.report_interval):
+            return True
+        return any(host not in self._volume_service_hosts and
+                   capabs['timestamp'] > read_at
+                   for host, capabs in self.service_states.iteritems())
+
+    def _get_volume_services(self, context):
+        """Return the volume service rows, read again only when needed.
+
+        Services update their row once per report_interval, so the rows
+        are read again once they are that old, or as soon as a host which
+        had no row reports its capabilities.  A service which is disabled
+        or removed is noticed within report_interval seconds.
+        """
+        if self._volume_services_stale():
+            self._volume_services = db.service_get_all_by_topic(
+                context, CONF.volume_topic)
+            self._volume_services_read_at = timeutils.utcnow()
+            self._volume_service_hosts = set(
+                service['host'] for service in self._volume_services)
+        return self._volume_services
+
     def get_all_host_states(self, context):
         """Returns a dict of all the hosts the HostManager knows about.
 
@@ -288,8 +393,7 @@ class HostManager(object):
         """
 
         # Get resource usage across the available volume nodes:
-        topic = CONF.volume_topic
-        volume_services = db.service_get_all_by_topic(context, topic)
+        volume_services = self._get_volume_services(context)
         active_hosts = set()
         for service in volume_services:
             host = service['host']
@@ -297,8 +401,19 @@ class HostManager(object):
                 LOG.warn(_("volume service is down or disabled. "
                            "(host: %s)") % host)
                 continue
+            active_hosts.add(host)
             capabilities = self.service_states.get(host, None)
             host_state = self.host_state_map.get(host)
+            # Only rebuild the host state when a new capabilities report
+            # arrived or the service row changed since the last request.
+            sources = (capabilities, service['updated_at'],
+                       service['availability_zone'])
+            last_sources = self._host_state_sources.get(host)
+            if (host_state and last_sources and
+                    last_sources[0] is sources[0] and
+                    last_sources[1:] == sources[1:]):
+                continue
+
             if host_state:
                 # copy capabilities to host_state.capabilities
                 host_state.update_capabilities(capabilities,
@@ -311,7 +426,8 @@ class HostManager(object):
                 self.host_state_map[host] = host_state
             # update attributes in host_state that scheduler is interested in
             host_state.update_from_volume_capability(capabilities)
-            active_hosts.add(host)
+            self._host_state_sources[host] = sources
+            self._index_host(host_state)
 
         # remove non-active hosts from host_state_map
         nonactive_hosts = set(self.host_state_map.keys()) - active_hosts
@@ -319,5 +435,7 @@ class HostManager(object):
             LOG.info(_("Removing non-active host: %(host)s from "
                        "scheduler cache.") % {'host': host})
             del self.host_state_map[host]
+            self._host_state_sources.pop(host, None)
+            self._unindex_host(host)
 
         return self.host_state_map.itervalues()
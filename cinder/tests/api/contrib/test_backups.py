@@ -57,7 +57,7 @@ class BackupsAPITestCase(test.TestCase):
                        display_description='this is a test backup',
                        container='volumebackups',
                        status='creating',
-                       size=0, object_count=0):
+                       size=0, object_count=0, parent_id=None):
         """Create a backup object."""
         backup = {}
         backup['volume_id'] = volume_id
@@ -72,6 +72,7 @@ class BackupsAPITestCase(test.TestCase):
         backup['fail_reason'] = ''
         backup['size'] = size
         backup['object_count'] = object_count
+        backup['parent_id'] = parent_id
         return db.backup_create(context.get_admin_context(), backup)['id']
 
     @staticmethod
@@ -333,6 +334,34 @@ class BackupsAPITestCase(test.TestCase):
         db.backup_destroy(context.get_admin_context(), backup_id2)
         db.backup_destroy(context.get_admin_context(), backup_id1)
 
+    def test_list_backups_with_filters_marker_and_limit(self):
+        backup_id1 = self._create_backup(status='available')
+        backup_id2 = self._create_backup(status='error')
+        backup_id3 = self._create_backup(status='available')
+
+        def _list(query):
+            req = webob.Request.blank('/v2/fake/backups?%s' % query)
+            req.method = 'GET'
+            req.headers['Content-Type'] = 'application/json'
+            res = req.get_response(fakes.wsgi_app())
+            self.assertEqual(res.status_int, 200)
+            return [b['id'] for b in json.loads(res.body)['backups']]
+
+        self.assertEqual([backup_id1, backup_id3], _list('status=available'))
+        self.assertEqual([backup_id2, backup_id3],
+                         _list('marker=%s' % backup_id1))
+        self.assertEqual([backup_id3],
+                         _list('status=available&marker=%s&limit=1' %
+                               backup_id1))
+        self.assertEqual([backup_id3, backup_id2, backup_id1],
+                         _list('sort_dir=desc'))
+        self.assertEqual([backup_id2], _list('offset=1&limit=1'))
+        self.assertEqual([backup_id3], _list('offset=2&limit=1'))
+
+        db.backup_destroy(context.get_admin_context(), backup_id3)
+        db.backup_destroy(context.get_admin_context(), backup_id2)
+        db.backup_destroy(context.get_admin_context(), backup_id1)
+
     @mock.patch('cinder.db.service_get_all_by_topic')
     def test_create_backup_json(self, _mock_service_get_all_by_topic):
         _mock_service_get_all_by_topic.return_value = [
@@ -626,6 +655,61 @@ class BackupsAPITestCase(test.TestCase):
 
         db.backup_destroy(context.get_admin_context(), backup_id)
 
+    def test_delete_backup_with_dependent_backup(self):
+        backup_id = self._create_backup(status='available')
+        child_id = self._create_backup(status='available',
+                                       parent_id=backup_id)
+        req = webob.Request.blank('/v2/fake/backups/%s' %
+                                  backup_id)
+        req.method = 'DELETE'
+        req.headers['Content-Type'] = 'application/json'
+        res = req.get_response(fakes.wsgi_app())
+        res_dict = json.loads(res.body)
+
+        self.assertEqual(res.status_int, 400)
+        self.assertEqual(res_dict['badRequest']['message'],
+                         'Invalid backup: Backup has dependent incremental '
+                         'backups')
+        self.assertEqual(self._get_backup_attrib(backup_id, 'status'),
+                         'available')
+
+        db.backup_destroy(context.get_admin_context(), child_id)
+        db.backup_destroy(context.get_admin_context(), backup_id)
+
+    def test_delete_backup_with_failed_dependent_backup(self):
+        backup_id = self._create_backup(status='available')
+        child_id = self._create_backup(status='error',
+                                       parent_id=backup_id)
+        req = webob.Request.blank('/v2/fake/backups/%s' %
+                                  backup_id)
+        req.method = 'DELETE'
+        req.headers['Content-Type'] = 'application/json'
+        res = req.get_response(fakes.wsgi_app())
+
+        self.assertEqual(res.status_int, 202)
+        self.assertEqual(self._get_backup_attrib(backup_id, 'status'),
+                         'deleting')
+
+        db.backup_destroy(context.get_admin_context(), child_id)
+        db.backup_destroy(context.get_admin_context(), backup_id)
+
+    def test_delete_backup_with_stuck_creating_dependent_backup(self):
+        backup_id = self._create_backup(status='available')
+        child_id = self._create_backup(status='creating',
+                                       parent_id=backup_id)
+        req = webob.Request.blank('/v2/fake/backups/%s' %
+                                  backup_id)
+        req.method = 'DELETE'
+        req.headers['Content-Type'] = 'application/json'
+        res = req.get_response(fakes.wsgi_app())
+
+        self.assertEqual(res.status_int, 202)
+        self.assertEqual(self._get_backup_attrib(backup_id, 'status'),
+                         'deleting')
+
+        db.backup_destroy(context.get_admin_context(), child_id)
+        db.backup_destroy(context.get_admin_context(), backup_id)
+
     def test_restore_backup_volume_id_specified_json(self):
         backup_id = self._create_backup(status='available')
         # need to create the volume referenced below first
@@ -61,7 +61,7 @@ def fake_get_volume_image_metadata(*args, **kwargs):
     return fake_image_metadata
 
 
-def fake_get_volumes_image_metadata(*args, **kwargs):
+def fake_get_volumes_image_metadata(self, context, volume_ids=None):
     return {'fake': fake_image_metadata}
 
 
@@ -106,6 +106,27 @@ class VolumeImageMetadataTest(test.TestCase):
         self.assertEqual(self._get_image_metadata_list(res.body)[0],
                          fake_image_metadata)
 
+    def test_list_detail_volumes_fetches_page_only(self):
+        calls = []
+
+        def fake_get_metadata(self, context, volume_ids=None):
+            calls.append(volume_ids)
+            return {'fake': fake_image_metadata}
+
+        self.stubs.Set(volume.API, 'get_volumes_image_metadata',
+                       fake_get_metadata)
+        res = self._make_request('/v2/fake/volumes/detail')
+        self.assertEqual(res.status_int, 200)
+        self.assertEqual(calls, [['fake']])
+
+    def test_list_detail_volumes_without_image_metadata(self):
+        self.stubs.Set(volume.API, 'get_volumes_image_metadata',
+                       lambda *args, **kwargs: {})
+        res = self._make_request('/v2/fake/volumes/detail')
+        self.assertEqual(res.status_int, 200)
+        self.assertNotIn('volume_image_metadata',
+                         json.loads(res.body)['volumes'][0])
+
 
 class ImageMetadataXMLDeserializer(common.MetadataXMLDeserializer):
     metadata_node_name = "volume_image_metadata"
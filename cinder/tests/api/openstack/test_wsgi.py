@@ -139,6 +139,25 @@ class RequestTest(test.TestCase):
                          request.cached_resource_by_id('o-0',
                                                        name='other-resource'))
 
+    def test_cached_resources_by_ids(self):
+        request = wsgi.Request.blank('/foo')
+        calls = []
+
+        def fetch(ids):
+            calls.append(ids)
+            return dict((i, 'data-%s' % i) for i in ids if i != 'r-2')
+
+        self.assertEqual({'r-0': 'data-r-0', 'r-1': 'data-r-1'},
+                         request.cached_resources_by_ids(['r-0', 'r-1'],
+                                                         fetch, 'data'))
+        self.assertEqual({'r-1': 'data-r-1', 'r-2': None},
+                         request.cached_resources_by_ids(['r-1', 'r-2'],
+                                                         fetch, 'data'))
+        self.assertEqual({'r-2': None},
+                         request.cached_resources_by_ids(['r-2'],
+                                                         fetch, 'data'))
+        self.assertEqual([['r-0', 'r-1'], ['r-2']], calls)
+
 
 class ActionDispatcherTest(test.TestCase):
     def test_dispatch(self):
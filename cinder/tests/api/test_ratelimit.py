@@ -0,0 +1,137 @@
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Tests for the stores of the rate limiting middleware.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+from cinder.api import ratelimit
+from cinder import test
+
+
+class FakeLimit(object):
+    def __init__(self):
+        self.water_level = 0
+        self.last_request = None
+        self.next_request = None
+        self.remaining = 10
+        self.unit = 60
+
+
+def _make_limits(username):
+    return [FakeLimit(), FakeLimit()]
+
+
+class MemoryStoreTest(test.TestCase):
+
+    def test_limits_are_kept(self):
+        store = ratelimit.MemoryStore(_make_limits)
+        with store.locked('user1') as limits:
+            limits[0].water_level = 5
+        self.assertEqual(store['user1'][0].water_level, 5)
+        self.assertEqual(store['user2'][0].water_level, 0)
+
+    def test_least_recently_seen_user_is_dropped(self):
+        store = ratelimit.MemoryStore(_make_limits, max_users=2)
+        user1 = store['user1']
+        store['user2']
+        store['user1']
+        store['user3']
+
+        self.assertEqual(len(store), 2)
+        self.assertIs(store['user1'], user1)
+        self.assertEqual(len(store), 2)
+        self.assertNotIn('user2', store._levels)
+
+
+class FileStoreTest(test.TestCase):
+
+    def setUp(self):
+        super(FileStoreTest, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+    def test_limits_are_shared(self):
+        store1 = ratelimit.FileStore(_make_limits, self.path)
+        store2 = ratelimit.FileStore(_make_limits, self.path)
+        with store1.locked('user1') as limits:
+            limits[1].water_level = 2.5
+            limits[1].last_request = 10.0
+
+        with store2.locked('user1') as limits:
+            self.assertEqual(limits[1].water_level, 2.5)
+            self.assertEqual(limits[1].last_request, 10.0)
+            limits[1].water_level = 3.5
+
+        self.assertEqual(store1['user1'][1].water_level, 3.5)
+        self.assertEqual(store1['user2'][1].water_level, 0)
+        self.assertEqual(store1[None][1].water_level, 0)
+
+    def test_state_of_other_limits_is_dropped(self):
+        store = ratelimit.FileStore(lambda username: [FakeLimit()],
+                                    self.path)
+        with store.locked('user1') as limits:
+            limits[0].water_level = 5
+
+        store = ratelimit.FileStore(_make_limits, self.path)
+        self.assertEqual(store['user1'][0].water_level, 0)
+
+    def test_drained_users_are_expired(self):
+        store = ratelimit.FileStore(_make_limits, self.path)
+        now = time.time()
+        with store.locked('idle') as limits:
+            limits[0].water_level = 10
+            limits[0].last_request = now - 60
+        with store.locked('busy') as limits:
+            limits[0].water_level = 10
+            limits[0].last_request = now - 5
+        with store.locked('fresh'):
+            pass
+
+        store.expire(now)
+
+        self.assertFalse(os.path.exists(store._filename('idle')))
+        self.assertFalse(os.path.exists(store._filename('fresh')))
+        self.assertTrue(os.path.exists(store._filename('busy')))
+        self.assertEqual(store['busy'][0].water_level, 10)
+
+    def test_expire_runs_once_per_interval(self):
+        store = ratelimit.FileStore(_make_limits, self.path)
+        with store.locked('user1'):
+            pass
+        self.assertTrue(os.path.exists(store._filename('user1')))
+
+        store._last_expire -= 61
+        with store.locked('user2'):
+            pass
+        self.assertFalse(os.path.exists(store._filename('user1')))
+        self.assertFalse(os.path.exists(store._filename('user2')))
+
+
+class GetStoreTest(test.TestCase):
+
+    def test_memory_store(self):
+        self.flags(ratelimit_store='memory')
+        store = ratelimit.get_store(_make_limits)
+        self.assertIsInstance(store, ratelimit.MemoryStore)
+
+    def test_unknown_store(self):
+        self.flags(ratelimit_store='bogus')
+        self.assertRaises(ValueError, ratelimit.get_store, _make_limits)
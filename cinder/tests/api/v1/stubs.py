@@ -119,16 +119,27 @@ def stub_snapshot(id, **kwargs):
     return snapshot
 
 
-def stub_snapshot_get_all(self):
+def stub_snapshot_get_all(context, marker=None, limit=None,
+                          sort_key='created_at', sort_dir='asc',
+                          filters=None):
     return [stub_snapshot(100, project_id='fake'),
             stub_snapshot(101, project_id='superfake'),
             stub_snapshot(102, project_id='superduperfake')]
 
 
-def stub_snapshot_get_all_by_project(self, context):
+def stub_snapshot_get_all_by_project(context, project_id, marker=None,
+                                     limit=None, sort_key='created_at',
+                                     sort_dir='asc', filters=None):
     return [stub_snapshot(1)]
 
 
+def stub_filter_snapshots(snapshots, filters):
+    """Filter stub snapshots the way the database query does."""
+    return [snapshot for snapshot in snapshots
+            if all(snapshot.get(key) == value
+                   for key, value in (filters or {}).iteritems())]
+
+
 def stub_snapshot_update(self, context, *args, **param):
     pass
 
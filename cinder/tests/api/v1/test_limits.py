@@ -18,7 +18,9 @@ Tests dealing with HTTP rate-limiting.
 """
 
 import httplib
+import shutil
 import six
+import tempfile
 from xml.dom import minidom
 
 from lxml import etree
@@ -558,6 +560,28 @@ class LimiterTest(BaseLimitTestSuite):
         results = list(self._check(2, "PUT", "/anything", "user0"))
         self.assertEqual(expected, results)
 
+    def test_unlimited_verb_keeps_no_state(self):
+        """Requests without a limit for their verb are not recorded."""
+        delay = self.limiter.check_for_delay("HEAD", "/anything", "user4")
+        self.assertEqual(delay, (None, None))
+        self.assertEqual(len(self.limiter.levels), 0)
+
+    def test_limits_shared_between_limiters(self):
+        """Limiters using the file store share the limits of a user."""
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        self.flags(ratelimit_store='file', ratelimit_store_path=path)
+        limiter1 = limits.Limiter(TEST_LIMITS)
+        limiter2 = limits.Limiter(TEST_LIMITS)
+
+        expected = [None] * 5
+        results = [limiter1.check_for_delay("PUT", "/volumes", "user1")[0]
+                   for i in xrange(5)]
+        self.assertEqual(expected, results)
+
+        delay = limiter2.check_for_delay("PUT", "/volumes", "user1")[0]
+        self.assertEqual(12.0, delay)
+
 
 class WsgiLimiterTest(BaseLimitTestSuite):
     """Tests for `limits.WsgiLimiter` class."""
@@ -235,15 +235,17 @@ class SnapshotApiTest(test.TestCase):
         self.assertEqual(resp_snapshot['id'], UUID)
 
     def test_snapshot_list_by_status(self):
-        def stub_snapshot_get_all_by_project(context, project_id):
-            return [
+        def stub_snapshot_get_all_by_project(context, project_id, marker,
+                                             limit, sort_key, sort_dir,
+                                             filters=None):
+            return stubs.stub_filter_snapshots([
                 stubs.stub_snapshot(1, display_name='backup1',
                                     status='available'),
                 stubs.stub_snapshot(2, display_name='backup2',
                                     status='available'),
                 stubs.stub_snapshot(3, display_name='backup3',
                                     status='creating'),
-            ]
+            ], filters)
         self.stubs.Set(db, 'snapshot_get_all_by_project',
                        stub_snapshot_get_all_by_project)
 
@@ -268,12 +270,14 @@ class SnapshotApiTest(test.TestCase):
         self.assertEqual(len(resp['snapshots']), 0)
 
     def test_snapshot_list_by_volume(self):
-        def stub_snapshot_get_all_by_project(context, project_id):
-            return [
+        def stub_snapshot_get_all_by_project(context, project_id, marker,
+                                             limit, sort_key, sort_dir,
+                                             filters=None):
+            return stubs.stub_filter_snapshots([
                 stubs.stub_snapshot(1, volume_id='vol1', status='creating'),
                 stubs.stub_snapshot(2, volume_id='vol1', status='available'),
                 stubs.stub_snapshot(3, volume_id='vol2', status='available'),
-            ]
+            ], filters)
         self.stubs.Set(db, 'snapshot_get_all_by_project',
                        stub_snapshot_get_all_by_project)
 
@@ -297,12 +301,14 @@ class SnapshotApiTest(test.TestCase):
         self.assertEqual(resp['snapshots'][0]['status'], 'available')
 
     def test_snapshot_list_by_name(self):
-        def stub_snapshot_get_all_by_project(context, project_id):
-            return [
+        def stub_snapshot_get_all_by_project(context, project_id, marker,
+                                             limit, sort_key, sort_dir,
+                                             filters=None):
+            return stubs.stub_filter_snapshots([
                 stubs.stub_snapshot(1, display_name='backup1'),
                 stubs.stub_snapshot(2, display_name='backup2'),
                 stubs.stub_snapshot(3, display_name='backup3'),
-            ]
+            ], filters)
         self.stubs.Set(db, 'snapshot_get_all_by_project',
                        stub_snapshot_get_all_by_project)
 
@@ -330,7 +336,9 @@ class SnapshotApiTest(test.TestCase):
 
     def test_list_snapshots_with_limit_and_offset(self):
         def list_snapshots_with_limit_and_offset(is_admin):
-            def stub_snapshot_get_all_by_project(context, project_id):
+            def stub_snapshot_get_all_by_project(context, project_id, marker,
+                                                 limit, sort_key, sort_dir,
+                                                 filters=None):
                 return [
                     stubs.stub_snapshot(1, display_name='backup1'),
                     stubs.stub_snapshot(2, display_name='backup2'),
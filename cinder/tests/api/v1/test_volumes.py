@@ -519,12 +519,12 @@ class VolumeApiTest(test.TestCase):
 
     def test_volume_list_by_name(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
-                                           sort_key, sort_dir):
-            return [
+                                           sort_key, sort_dir, filters=None):
+            return stubs.stub_filter_volumes([
                 stubs.stub_volume(1, display_name='vol1'),
                 stubs.stub_volume(2, display_name='vol2'),
                 stubs.stub_volume(3, display_name='vol3'),
-            ]
+            ], filters)
         self.stubs.Set(db, 'volume_get', stubs.stub_volume_get_db)
         self.stubs.Set(db, 'volume_get_all_by_project',
                        stub_volume_get_all_by_project)
@@ -545,8 +545,8 @@ class VolumeApiTest(test.TestCase):
 
     def test_volume_list_by_metadata(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
-                                           sort_key, sort_dir):
-            return [
+                                           sort_key, sort_dir, filters=None):
+            return stubs.stub_filter_volumes([
                 stubs.stub_volume(1, display_name='vol1',
                                   status='available',
                                   volume_metadata=[{'key': 'key1',
@@ -559,7 +559,7 @@ class VolumeApiTest(test.TestCase):
                                   status='in-use',
                                   volume_metadata=[{'key': 'key1',
                                                     'value': 'value2'}]),
-            ]
+            ], filters)
         self.stubs.Set(db, 'volume_get_all_by_project',
                        stub_volume_get_all_by_project)
 
@@ -603,12 +603,12 @@ class VolumeApiTest(test.TestCase):
 
     def test_volume_list_by_status(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
-                                           sort_key, sort_dir):
-            return [
+                                           sort_key, sort_dir, filters=None):
+            return stubs.stub_filter_volumes([
                 stubs.stub_volume(1, display_name='vol1', status='available'),
                 stubs.stub_volume(2, display_name='vol2', status='available'),
                 stubs.stub_volume(3, display_name='vol3', status='in-use'),
-            ]
+            ], filters)
         self.stubs.Set(db, 'volume_get', stubs.stub_volume_get_db)
         self.stubs.Set(db, 'volume_get_all_by_project',
                        stub_volume_get_all_by_project)
@@ -740,7 +740,8 @@ class VolumeApiTest(test.TestCase):
     def test_volume_detail_limit_offset(self):
         def volume_detail_limit_offset(is_admin):
             def stub_volume_get_all_by_project(context, project_id, marker,
-                                               limit, sort_key, sort_dir):
+                                               limit, sort_key, sort_dir,
+                                               filters=None):
                 return [
                     stubs.stub_volume(1, display_name='vol1'),
                     stubs.stub_volume(2, display_name='vol2'),
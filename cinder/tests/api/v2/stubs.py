@@ -109,17 +109,37 @@ def stub_volume_get_db(context, volume_id):
 
 
 def stub_volume_get_all(context, search_opts=None, marker=None, limit=None,
-                        sort_key='created_at', sort_dir='desc'):
+                        sort_key='created_at', sort_dir='asc', filters=None):
     return [stub_volume(100, project_id='fake'),
             stub_volume(101, project_id='superfake'),
             stub_volume(102, project_id='superduperfake')]
 
 
 def stub_volume_get_all_by_project(self, context, marker, limit, sort_key,
-                                   sort_dir, filters={}):
+                                   sort_dir, filters=None):
     return [stub_volume_get(self, context, '1')]
 
 
+def stub_filter_volumes(volumes, filters):
+    """Filter stub volumes the way the database query does."""
+    def _match(volume):
+        for key, value in (filters or {}).iteritems():
+            if key == 'metadata':
+                metadata = dict((item['key'], item['value'])
+                                for item in volume.get('volume_metadata', []))
+                for meta_key, meta_value in value.iteritems():
+                    if metadata.get(meta_key) != meta_value:
+                        return False
+            elif key == 'no_migration_targets':
+                status = volume.get('migration_status')
+                if status and status.startswith('target:'):
+                    return False
+            elif volume.get(key) != value:
+                return False
+        return True
+    return [volume for volume in volumes if _match(volume)]
+
+
 def stub_snapshot(id, **kwargs):
     snapshot = {'id': id,
                 'volume_id': 12,
@@ -134,16 +154,27 @@ def stub_snapshot(id, **kwargs):
     return snapshot
 
 
-def stub_snapshot_get_all(self):
+def stub_snapshot_get_all(context, marker=None, limit=None,
+                          sort_key='created_at', sort_dir='asc',
+                          filters=None):
     return [stub_snapshot(100, project_id='fake'),
             stub_snapshot(101, project_id='superfake'),
             stub_snapshot(102, project_id='superduperfake')]
 
 
-def stub_snapshot_get_all_by_project(self, context):
+def stub_snapshot_get_all_by_project(context, project_id, marker=None,
+                                     limit=None, sort_key='created_at',
+                                     sort_dir='asc', filters=None):
     return [stub_snapshot(1)]
 
 
+def stub_filter_snapshots(snapshots, filters):
+    """Filter stub snapshots the way the database query does."""
+    return [snapshot for snapshot in snapshots
+            if all(snapshot.get(key) == value
+                   for key, value in (filters or {}).iteritems())]
+
+
 def stub_snapshot_update(self, context, *args, **param):
     pass
 
@@ -246,15 +246,17 @@ class SnapshotApiTest(test.TestCase):
         self.assertEqual(resp_snapshot['id'], UUID)
 
     def test_snapshot_list_by_status(self):
-        def stub_snapshot_get_all_by_project(context, project_id):
-            return [
+        def stub_snapshot_get_all_by_project(context, project_id, marker,
+                                             limit, sort_key, sort_dir,
+                                             filters=None):
+            return stubs.stub_filter_snapshots([
                 stubs.stub_snapshot(1, display_name='backup1',
                                     status='available'),
                 stubs.stub_snapshot(2, display_name='backup2',
                                     status='available'),
                 stubs.stub_snapshot(3, display_name='backup3',
                                     status='creating'),
-            ]
+            ], filters)
         self.stubs.Set(db, 'snapshot_get_all_by_project',
                        stub_snapshot_get_all_by_project)
 
@@ -279,12 +281,14 @@ class SnapshotApiTest(test.TestCase):
         self.assertEqual(len(resp['snapshots']), 0)
 
     def test_snapshot_list_by_volume(self):
-        def stub_snapshot_get_all_by_project(context, project_id):
-            return [
+        def stub_snapshot_get_all_by_project(context, project_id, marker,
+                                             limit, sort_key, sort_dir,
+                                             filters=None):
+            return stubs.stub_filter_snapshots([
                 stubs.stub_snapshot(1, volume_id='vol1', status='creating'),
                 stubs.stub_snapshot(2, volume_id='vol1', status='available'),
                 stubs.stub_snapshot(3, volume_id='vol2', status='available'),
-            ]
+            ], filters)
         self.stubs.Set(db, 'snapshot_get_all_by_project',
                        stub_snapshot_get_all_by_project)
 
@@ -308,12 +312,14 @@ class SnapshotApiTest(test.TestCase):
         self.assertEqual(resp['snapshots'][0]['status'], 'available')
 
     def test_snapshot_list_by_name(self):
-        def stub_snapshot_get_all_by_project(context, project_id):
-            return [
+        def stub_snapshot_get_all_by_project(context, project_id, marker,
+                                             limit, sort_key, sort_dir,
+                                             filters=None):
+            return stubs.stub_filter_snapshots([
                 stubs.stub_snapshot(1, display_name='backup1'),
                 stubs.stub_snapshot(2, display_name='backup2'),
                 stubs.stub_snapshot(3, display_name='backup3'),
-            ]
+            ], filters)
         self.stubs.Set(db, 'snapshot_get_all_by_project',
                        stub_snapshot_get_all_by_project)
 
@@ -339,14 +345,36 @@ class SnapshotApiTest(test.TestCase):
         self.assertIn('snapshots', res)
         self.assertEqual(1, len(res['snapshots']))
 
+    def test_list_snapshots_with_marker_and_sort(self):
+        def stub_snapshot_get_all_by_project(context, project_id, marker,
+                                             limit, sort_key, sort_dir,
+                                             filters=None):
+            self.assertEqual(marker, '1')
+            self.assertEqual(limit, 2)
+            self.assertEqual(sort_key, 'display_name')
+            self.assertEqual(sort_dir, 'desc')
+            self.assertEqual(filters, {'status': 'available'})
+            return [stubs.stub_snapshot(2), stubs.stub_snapshot(3)]
+        self.stubs.Set(db, 'snapshot_get_all_by_project',
+                       stub_snapshot_get_all_by_project)
+
+        req = fakes.HTTPRequest.blank('/v2/snapshots?marker=1&limit=2'
+                                      '&sort_key=display_name&sort_dir=desc'
+                                      '&status=available')
+        resp = self.controller.index(req)
+        self.assertEqual([2, 3], [s['id'] for s in resp['snapshots']])
+
     def test_list_snapshots_with_limit_and_offset(self):
         def list_snapshots_with_limit_and_offset(is_admin):
-            def stub_snapshot_get_all_by_project(context, project_id):
-                return [
+            def stub_snapshot_get_all_by_project(context, project_id, marker,
+                                                 limit, sort_key, sort_dir,
+                                                 filters=None):
+                snapshots = [
                     stubs.stub_snapshot(1, display_name='backup1'),
                     stubs.stub_snapshot(2, display_name='backup2'),
                     stubs.stub_snapshot(3, display_name='backup3'),
                 ]
+                return snapshots[:limit] if limit else snapshots
 
             self.stubs.Set(db, 'snapshot_get_all_by_project',
                            stub_snapshot_get_all_by_project)
@@ -584,7 +584,7 @@ class VolumeApiTest(test.TestCase):
 
     def test_volume_index_with_marker(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
-                                           sort_key, sort_dir):
+                                           sort_key, sort_dir, filters=None):
             return [
                 stubs.stub_volume(1, display_name='vol1'),
                 stubs.stub_volume(2, display_name='vol2'),
@@ -635,7 +635,7 @@ class VolumeApiTest(test.TestCase):
 
     def test_volume_index_limit_offset(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
-                                           sort_key, sort_dir):
+                                           sort_key, sort_dir, filters=None):
             return [
                 stubs.stub_volume(1, display_name='vol1'),
                 stubs.stub_volume(2, display_name='vol2'),
@@ -662,7 +662,7 @@ class VolumeApiTest(test.TestCase):
 
     def test_volume_detail_with_marker(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
-                                           sort_key, sort_dir):
+                                           sort_key, sort_dir, filters=None):
             return [
                 stubs.stub_volume(1, display_name='vol1'),
                 stubs.stub_volume(2, display_name='vol2'),
@@ -713,7 +713,7 @@ class VolumeApiTest(test.TestCase):
 
     def test_volume_detail_limit_offset(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
-                                           sort_key, sort_dir):
+                                           sort_key, sort_dir, filters=None):
             return [
                 stubs.stub_volume(1, display_name='vol1'),
                 stubs.stub_volume(2, display_name='vol2'),
@@ -747,7 +747,7 @@ class VolumeApiTest(test.TestCase):
 
     def test_volume_with_limit_zero(self):
         def stub_volume_get_all(context, marker, limit,
-                                sort_key, sort_dir):
+                                sort_key, sort_dir, filters=None):
             return []
         self.stubs.Set(db, 'volume_get_all', stub_volume_get_all)
         req = fakes.HTTPRequest.blank('/v2/volumes?limit=0')
@@ -760,7 +760,7 @@ class VolumeApiTest(test.TestCase):
 
         # Number of volumes equals the max, include next link
         def stub_volume_get_all(context, marker, limit,
-                                sort_key, sort_dir):
+                                sort_key, sort_dir, filters=None):
             vols = [stubs.stub_volume(i)
                     for i in xrange(CONF.osapi_max_limit)]
             if limit == None or limit >= len(vols):
@@ -777,7 +777,7 @@ class VolumeApiTest(test.TestCase):
 
         # Number of volumes less then max, do not include
         def stub_volume_get_all2(context, marker, limit,
-                                 sort_key, sort_dir):
+                                 sort_key, sort_dir, filters=None):
             vols = [stubs.stub_volume(i)
                     for i in xrange(100)]
             if limit == None or limit >= len(vols):
@@ -793,7 +793,7 @@ class VolumeApiTest(test.TestCase):
 
         # Number of volumes more then the max, include next link
         def stub_volume_get_all3(context, marker, limit,
-                                 sort_key, sort_dir):
+                                 sort_key, sort_dir, filters=None):
             vols = [stubs.stub_volume(i)
                     for i in xrange(CONF.osapi_max_limit + 100)]
             if limit == None or limit >= len(vols):
@@ -821,12 +821,12 @@ class VolumeApiTest(test.TestCase):
 
     def test_volume_list_by_name(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
-                                           sort_key, sort_dir):
-            return [
+                                           sort_key, sort_dir, filters=None):
+            return stubs.stub_filter_volumes([
                 stubs.stub_volume(1, display_name='vol1'),
                 stubs.stub_volume(2, display_name='vol2'),
                 stubs.stub_volume(3, display_name='vol3'),
-            ]
+            ], filters)
         self.stubs.Set(db, 'volume_get_all_by_project',
                        stub_volume_get_all_by_project)
         self.stubs.Set(volume_api.API, 'get', stubs.stub_volume_get)
@@ -847,8 +847,8 @@ class VolumeApiTest(test.TestCase):
 
     def test_volume_list_by_metadata(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
-                                           sort_key, sort_dir):
-            return [
+                                           sort_key, sort_dir, filters=None):
+            return stubs.stub_filter_volumes([
                 stubs.stub_volume(1, display_name='vol1',
                                   status='available',
                                   volume_metadata=[{'key': 'key1',
@@ -861,7 +861,7 @@ class VolumeApiTest(test.TestCase):
                                   status='in-use',
                                   volume_metadata=[{'key': 'key1',
                                                     'value': 'value2'}]),
-            ]
+            ], filters)
         self.stubs.Set(db, 'volume_get_all_by_project',
                        stub_volume_get_all_by_project)
 
@@ -905,12 +905,12 @@ class VolumeApiTest(test.TestCase):
 
     def test_volume_list_by_status(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
-                                           sort_key, sort_dir):
-            return [
+                                           sort_key, sort_dir, filters=None):
+            return stubs.stub_filter_volumes([
                 stubs.stub_volume(1, display_name='vol1', status='available'),
                 stubs.stub_volume(2, display_name='vol2', status='available'),
                 stubs.stub_volume(3, display_name='vol3', status='in-use'),
-            ]
+            ], filters)
         self.stubs.Set(db, 'volume_get_all_by_project',
                        stub_volume_get_all_by_project)
         self.stubs.Set(volume_api.API, 'get', stubs.stub_volume_get)
@@ -212,7 +212,7 @@ class ISCSIConnectorTestCase(ConnectorTestCase):
                        lambda x: [[location, iqn]])
         self.stubs.Set(self.connector_with_multipath,
                        '_connect_to_iscsi_portal',
-                       lambda x: None)
+                       lambda x, sessions=None: None)
         self.stubs.Set(self.connector_with_multipath,
                        '_rescan_iscsi',
                        lambda: None)
@@ -241,6 +241,99 @@ class ISCSIConnectorTestCase(ConnectorTestCase):
                           self.connector.connect_volume,
                           connection_info['data'])
 
+        dev_str = '/dev/disk/by-path/ip-%s-iscsi-%s-lun-1' % (location, iqn)
+        self.assertIn('udevadm settle --timeout=1 --exit-if-exists=%s' %
+                      dev_str, self.cmds)
+
+    def test_connect_volume_with_multipath_logs_in_concurrently(self):
+        location = '10.0.2.15:3260'
+        location2 = '10.0.3.15:3260'
+        name = 'volume-00000001'
+        iqn = 'iqn.2010-10.org.openstack:%s' % name
+        vol = {'id': 1, 'name': name}
+        connection_properties = self.iscsi_connection(vol, location, iqn)
+        connected = []
+
+        def fake_connect_to_iscsi_portal(props, sessions=None):
+            connected.append((props['target_portal'], sessions))
+
+        self.connector.use_multipath = True
+        self.stubs.Set(self.connector,
+                       '_get_target_portals_from_iscsiadm_output',
+                       lambda x: [[location, iqn], [location2, iqn]])
+        self.stubs.Set(self.connector, '_get_iscsi_sessions',
+                       lambda: set([(location2, iqn)]))
+        self.stubs.Set(self.connector, '_connect_to_iscsi_portal',
+                       fake_connect_to_iscsi_portal)
+        self.stubs.Set(self.connector, '_rescan_iscsi', lambda: None)
+        self.stubs.Set(self.connector, '_rescan_multipath', lambda: None)
+        self.stubs.Set(self.connector, '_get_multipath_device_name',
+                       lambda x: '/dev/mapper/mpatha')
+        result = self.connector.connect_volume(connection_properties['data'])
+
+        self.assertEqual(result['path'], '/dev/mapper/mpatha')
+        self.assertEqual(sorted(connected),
+                         [(location, set([(location2, iqn)])),
+                          (location2, set([(location2, iqn)]))])
+
+    def test_connect_to_iscsi_portal_already_logged_in(self):
+        location = '10.0.2.15:3260'
+        iqn = 'iqn.2010-10.org.openstack:volume-00000001'
+        props = {'target_portal': location, 'target_iqn': iqn}
+        self.connector._connect_to_iscsi_portal(
+            props, sessions=set([(location, iqn)]))
+        self.assertEqual(self.cmds,
+                         ['iscsiadm -m node -T %s -p %s' % (iqn, location)])
+
+    def test_get_iscsi_sessions(self):
+        out = ('tcp: [1] 10.0.2.15:3260,1 iqn.2010-10.org.openstack:vol1\n'
+               'tcp: [2] 10.0.3.15:3260,1 iqn.2010-10.org.openstack:vol2\n')
+        self.stubs.Set(self.connector, '_execute',
+                       lambda *args, **kwargs: (out, None))
+        self.assertEqual(self.connector._get_iscsi_sessions(),
+                         set([('10.0.2.15:3260',
+                               'iqn.2010-10.org.openstack:vol1'),
+                              ('10.0.3.15:3260',
+                               'iqn.2010-10.org.openstack:vol2')]))
+
+    def test_connect_volume_locks_target(self):
+        location = '10.0.2.15:3260'
+        iqn = 'iqn.2010-10.org.openstack:volume-00000001'
+        props = {'target_portal': location, 'target_iqn': iqn,
+                 'target_lun': 1}
+        locks = []
+
+        def fake_synchronized(name):
+            locks.append(name)
+            return lambda f: f
+
+        self.stubs.Set(connector, 'synchronized', fake_synchronized)
+        device_info = self.connector.connect_volume(props)
+        self.connector.disconnect_volume(props, device_info)
+        self.assertEqual(locks, ['connect_volume-%s' % iqn] * 2)
+
+    def test_connect_volume_with_multipath_locks_all_targets(self):
+        location = '10.0.2.15:3260'
+        iqn = 'iqn.2010-10.org.openstack:volume-00000001'
+        props = {'target_portal': location, 'target_iqn': iqn,
+                 'target_lun': 1}
+        locks = []
+
+        def fake_synchronized(name):
+            locks.append(name)
+            return lambda f: f
+
+        self.stubs.Set(connector, 'synchronized', fake_synchronized)
+        multipath_connector = connector.ISCSIConnector(None,
+                                                       use_multipath=True)
+        self.stubs.Set(multipath_connector, '_connect_volume',
+                       lambda props: {})
+        self.stubs.Set(multipath_connector, '_disconnect_volume',
+                       lambda props, device_info: None)
+        device_info = multipath_connector.connect_volume(props)
+        multipath_connector.disconnect_volume(props, device_info)
+        self.assertEqual(locks, ['connect_volume'] * 2)
+
     def test_get_target_portals_from_iscsiadm_output(self):
         connector = self.connector
         test_output = '''10.15.84.19:3260 iqn.1992-08.com.netapp:sn.33615311
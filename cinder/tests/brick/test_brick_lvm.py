@@ -19,6 +19,7 @@ import mox
 from cinder.brick.local_dev import lvm as brick
 from cinder.openstack.common import log as logging
 from cinder.openstack.common import processutils
+from cinder.openstack.common import timeutils
 from cinder import test
 from cinder.volume import configuration as conf
 
@@ -131,6 +132,70 @@ class BrickLvmTestCase(test.TestCase):
     def test_get_volume(self):
         self.assertEqual(self.vg.get_volume('fake-1')['name'], 'fake-1')
 
+    def _count_lvs_calls(self):
+        calls = []
+
+        def fake_execute(*cmd, **kwargs):
+            if 'lvs' in cmd:
+                calls.append(cmd[-1])
+            return self.fake_execute(*cmd, **kwargs)
+
+        self.stubs.Set(processutils, 'execute', fake_execute)
+        return calls
+
+    def test_get_volume_queries_single_lv_once(self):
+        calls = self._count_lvs_calls()
+        self.assertEqual(self.vg.get_volume('fake-2')['name'], 'fake-2')
+        self.assertEqual(self.vg.get_volume('fake-2')['name'], 'fake-2')
+        self.assertEqual(calls, ['fake-vg/fake-2'])
+
+    def test_get_volumes_fills_cache(self):
+        calls = self._count_lvs_calls()
+        self.vg.get_volumes()
+        self.assertEqual(self.vg.get_volume('fake-1')['name'], 'fake-1')
+        self.assertEqual(self.vg.get_volume('fake-2')['name'], 'fake-2')
+        self.assertEqual(calls, ['fake-vg'])
+
+    def test_get_volume_expires_removed_lv(self):
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        self.assertEqual(self.vg.get_volume('fake-1')['name'], 'fake-1')
+
+        # Another process removes the LV.
+        def fake_execute(*cmd, **kwargs):
+            raise processutils.ProcessExecutionError(
+                stderr='  One or more specified logical volume(s) not found.')
+
+        self.stubs.Set(processutils, 'execute', fake_execute)
+        timeutils.advance_time_seconds(brick.LV_CACHE_TTL)
+        self.assertEqual(self.vg.get_volume('fake-1')['name'], 'fake-1')
+        timeutils.advance_time_seconds(1)
+        self.assertIsNone(self.vg.get_volume('fake-1'))
+
+    def test_get_volume_not_found(self):
+        def fake_execute(*cmd, **kwargs):
+            raise processutils.ProcessExecutionError(
+                stderr='  One or more specified logical volume(s) not found.')
+
+        self.stubs.Set(processutils, 'execute', fake_execute)
+        self.assertIsNone(self.vg.get_volume('fake-3'))
+
+    def test_get_volume_error(self):
+        def fake_execute(*cmd, **kwargs):
+            raise processutils.ProcessExecutionError(stderr='lock failed')
+
+        self.stubs.Set(processutils, 'execute', fake_execute)
+        self.assertRaises(processutils.ProcessExecutionError,
+                          self.vg.get_volume, 'fake-3')
+
+    def test_changed_volume_is_queried_again(self):
+        calls = self._count_lvs_calls()
+        self.vg.get_volume('fake-1')
+        self.vg.set_execute(lambda *cmd, **kwargs: ("", ""))
+        self.vg.extend_volume('fake-1', '2g')
+        self.vg.get_volume('fake-1')
+        self.assertEqual(calls, ['fake-vg/fake-1', 'fake-vg/fake-1'])
+
     def test_get_all_physical_volumes(self):
         # Filtered VG version
         pvs = self.vg.get_all_physical_volumes('sudo', 'fake-vg')
@@ -23,11 +23,14 @@ CONF = cfg.CONF
 
 CONF.import_opt('iscsi_num_targets', 'cinder.volume.drivers.lvm')
 CONF.import_opt('policy_file', 'cinder.policy')
+CONF.import_opt('quota_volume_type_cache_ttl', 'cinder.quota')
 CONF.import_opt('volume_driver', 'cinder.volume.manager')
 CONF.import_opt('xiv_ds8k_proxy',
                 'cinder.volume.drivers.ibm.xiv_ds8k')
 CONF.import_opt('backup_driver', 'cinder.backup.manager')
 CONF.import_opt('fixed_key', 'cinder.keymgr.conf_key_mgr', group='keymgr')
+CONF.import_opt('glance_client_pool_size', 'cinder.image.glance')
+CONF.import_opt('glance_image_meta_cache_ttl', 'cinder.image.glance')
 CONF.import_opt('scheduler_driver', 'cinder.scheduler.manager')
 
 def_vol_type = 'fake_vol_type'
@@ -45,6 +48,13 @@ def set_defaults(conf):
     conf.set_default('connection', 'sqlite://', group='database')
     conf.set_default('sqlite_synchronous', False)
     conf.set_default('policy_file', 'cinder/tests/policy.json')
+    # NOTE: tests create volume types straight in the database, so the
+    # quota engine must not keep volume types from earlier tests.
+    conf.set_default('quota_volume_type_cache_ttl', 0)
+    # NOTE: tests stub out the glance client, so neither clients nor image
+    # metadata may be reused between tests.
+    conf.set_default('glance_client_pool_size', 0)
+    conf.set_default('glance_image_meta_cache_ttl', 0)
     conf.set_default(
         'xiv_ds8k_proxy',
         'cinder.tests.test_ibm_xiv_ds8k.XIVDS8KFakeProxyDriver')
@@ -0,0 +1,87 @@
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Tests for the image cache of the volume host."""
+
+import os
+import shutil
+import tempfile
+
+from cinder.image import cache as image_cache
+from cinder import test
+
+
+class ImageCacheTestCase(test.TestCase):
+
+    def setUp(self):
+        super(ImageCacheTestCase, self).setUp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+    def _add(self, cache, key, size):
+        with cache.staging_file() as staging:
+            with open(staging, 'wb') as f:
+                f.write('x' * size)
+            return cache.add(key, staging)
+
+    def test_miss_then_hit(self):
+        cache = image_cache.ImageCache(self.cache_dir, 100)
+        self.assertIsNone(cache.get('a'))
+        path = self._add(cache, 'a', 10)
+
+        self.assertEqual(cache.get('a'), path)
+        stats = cache.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['entries'], 1)
+
+    def test_staging_file_is_removed(self):
+        cache = image_cache.ImageCache(self.cache_dir, 100)
+        with cache.staging_file() as staging:
+            self.assertTrue(os.path.exists(staging))
+        self.assertFalse(os.path.exists(staging))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = image_cache.ImageCache(self.cache_dir, 25)
+        path_a = self._add(cache, 'a', 10)
+        path_b = self._add(cache, 'b', 10)
+        cache.get('a')
+        self._add(cache, 'c', 10)
+
+        self.assertTrue(os.path.exists(path_a))
+        self.assertFalse(os.path.exists(path_b))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get_stats()['evictions'], 1)
+
+    def test_entry_in_use_is_not_evicted(self):
+        cache = image_cache.ImageCache(self.cache_dir, 15)
+        path_a = self._add(cache, 'a', 10)
+        with cache.in_use('a'):
+            with cache.in_use('b'):
+                path_b = self._add(cache, 'b', 10)
+            self.assertTrue(os.path.exists(path_a))
+            self.assertTrue(os.path.exists(path_b))
+
+    def test_entries_survive_a_restart(self):
+        cache = image_cache.ImageCache(self.cache_dir, 100)
+        self._add(cache, 'a', 10)
+        open(os.path.join(self.cache_dir,
+                          image_cache.STAGING_PREFIX + 'stale'), 'w').close()
+
+        cache = image_cache.ImageCache(self.cache_dir, 100)
+        self.assertIsNotNone(cache.get('a'))
+        self.assertEqual(os.listdir(self.cache_dir), ['a'])
+
+    def test_get_cache_disabled_by_default(self):
+        self.assertIsNone(image_cache.get_cache())
@@ -15,6 +15,8 @@
 
 
 import datetime
+import hashlib
+import StringIO
 
 import glanceclient.exc
 import glanceclient.v2.client
@@ -24,8 +26,10 @@ from oslo.config import cfg
 from cinder import context
 from cinder import exception
 from cinder.image import glance
+from cinder.openstack.common import timeutils
 from cinder import test
 from cinder.tests.glance import stubs as glance_stubs
+from cinder import units
 
 
 CONF = cfg.CONF
@@ -398,6 +402,58 @@ class TestGlanceImageService(test.TestCase):
                           self.context,
                           image_id)
 
+    def _count_gets(self):
+        client = self.service._client.client
+        calls = []
+
+        def fake_get(image_id):
+            calls.append(image_id)
+            return client.get(image_id)
+
+        self.stubs.Set(client.images, 'get', fake_get)
+        return calls
+
+    def test_show_reuses_image_meta(self):
+        self.flags(glance_image_meta_cache_ttl=10)
+        self.addCleanup(glance._IMAGE_META.clear)
+        fixture = self._make_fixture(name='image1', is_public=True)
+        image_id = self.service.create(self.context, fixture)['id']
+        calls = self._count_gets()
+
+        image_meta = self.service.show(self.context, image_id)
+        image_meta['name'] = 'changed by the caller'
+        self.assertEqual(self.service.show(self.context, image_id)['name'],
+                         'image1')
+        self.assertEqual(len(calls), 1)
+
+        other_context = context.RequestContext('fake', 'other',
+                                               auth_token=True)
+        self.service.show(other_context, image_id)
+        self.assertEqual(len(calls), 2)
+
+        self.service.update(self.context, image_id, {'name': 'image2'})
+        self.assertEqual(self.service.show(self.context, image_id)['name'],
+                         'image2')
+        self.assertEqual(len(calls), 3)
+
+    def test_show_image_meta_expires(self):
+        self.flags(glance_image_meta_cache_ttl=10)
+        self.addCleanup(glance._IMAGE_META.clear)
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        fixture = self._make_fixture(name='image1', is_public=True)
+        image_id = self.service.create(self.context, fixture)['id']
+        calls = self._count_gets()
+
+        self.service.show(self.context, image_id)
+        timeutils.advance_time_seconds(10)
+        self.service.show(self.context, image_id)
+        self.assertEqual(len(calls), 1)
+
+        timeutils.advance_time_seconds(1)
+        self.service.show(self.context, image_id)
+        self.assertEqual(len(calls), 2)
+
     def test_detail_passes_through_to_client(self):
         fixture = self._make_fixture(name='image10', is_public=True)
         image_id = self.service.create(self.context, fixture)['id']
@@ -543,6 +599,108 @@ class TestGlanceImageService(test.TestCase):
             self.assertEqual(service._client.netloc, ipv6_url)
 
 
+class FakeRangedClient(object):
+    """Client wrapper serving image data with or without range support."""
+
+    def __init__(self, data, ranged=True, fail_at=None):
+        self.data = data
+        self.ranged = ranged
+        self.fail_at = fail_at
+        self.requests = []
+
+    def call(self, context, method, image_id):
+        assert method == 'data'
+        self.requests.append('data')
+        return [self.data]
+
+    def data_range(self, context, image_id, start, end):
+        self.requests.append((start, end))
+        if not self.ranged:
+            return False, None
+
+        def body():
+            for offset in xrange(start, end + 1, 64 * units.KiB):
+                if self.fail_at is not None and offset >= self.fail_at:
+                    self.fail_at = None
+                    raise IOError('connection reset')
+                yield self.data[offset:min(offset + 64 * units.KiB,
+                                           end + 1)]
+        return True, body()
+
+
+class TestGlanceRangedDownload(test.TestCase):
+
+    def setUp(self):
+        super(TestGlanceRangedDownload, self).setUp()
+        self.flags(glance_download_ranges=3,
+                   glance_download_range_size_mb=1,
+                   glance_num_retries=1)
+        self.stubs.Set(glance.time, 'sleep', lambda s: None)
+        self.context = context.RequestContext('fake', 'fake', auth_token=True)
+        self.data = ''.join(chr(i % 251) for i in xrange(5 * units.MiB / 2))
+
+    def _download(self, client, checksum=None):
+        service = glance.GlanceImageService(client=client)
+        if checksum is None:
+            checksum = hashlib.md5(self.data).hexdigest()
+        image_meta = {'id': 'fake', 'size': len(self.data),
+                      'checksum': checksum}
+        self.stubs.Set(service, 'show', lambda context, image_id: image_meta)
+        writer = StringIO.StringIO()
+        service.download(self.context, 'fake', writer)
+        return writer.getvalue()
+
+    def test_download_in_ranges(self):
+        client = FakeRangedClient(self.data)
+        self.assertEqual(self._download(client), self.data)
+        self.assertEqual(client.requests,
+                         [(0, units.MiB - 1),
+                          (units.MiB, 2 * units.MiB - 1),
+                          (2 * units.MiB, len(self.data) - 1)])
+
+    def test_download_resumes_range(self):
+        client = FakeRangedClient(self.data, fail_at=units.MiB + units.KiB)
+        self.assertEqual(self._download(client), self.data)
+        self.assertIn((units.MiB + 64 * units.KiB, 2 * units.MiB - 1),
+                      client.requests)
+
+    def test_download_without_range_support(self):
+        client = FakeRangedClient(self.data, ranged=False)
+        self.assertEqual(self._download(client), self.data)
+        self.assertEqual(client.requests, [(0, units.MiB - 1), 'data'])
+
+    def test_download_checksum_mismatch(self):
+        client = FakeRangedClient(self.data)
+        self.assertRaises(exception.ImageUnacceptable,
+                          self._download, client, checksum='bad')
+
+    def test_data_range_closes_full_response(self):
+        class FakeResponse(object):
+            status = 200
+            closed = False
+
+            def close(self):
+                self.closed = True
+
+        class FakeHTTPClient(object):
+            def raw_request(self, method, url, headers=None):
+                self.headers = headers
+                return resp, iter(['data'])
+
+        class FakeClient(object):
+            http_client = FakeHTTPClient()
+
+        resp = FakeResponse()
+        client_wrapper = glance.GlanceClientWrapper(version=1)
+        client_wrapper.client = FakeClient()
+        self.assertEqual(client_wrapper.data_range(self.context, 'fake',
+                                                   0, units.MiB - 1),
+                         (False, None))
+        self.assertTrue(resp.closed)
+        self.assertEqual(client_wrapper.client.http_client.headers,
+                         {'Range': 'bytes=0-%d' % (units.MiB - 1)})
+
+
 class TestGlanceClientVersion(test.TestCase):
     """Tests the version of the glance client generated."""
     def setUp(self):
@@ -605,6 +763,32 @@ class TestGlanceImageServiceClient(test.TestCase):
         self.context = context.RequestContext('fake', 'fake', auth_token=True)
         self.stubs.Set(glance.time, 'sleep', lambda s: None)
 
+    def test_glance_clients_are_pooled(self):
+        self.flags(auth_strategy='keystone')
+        self.flags(glance_client_pool_size=2)
+        self.addCleanup(glance._CLIENTS.clear)
+        self.stubs.Set(glance, '_create_glance_client',
+                       lambda context, netloc, use_ssl, version: object())
+        other_context = context.RequestContext('fake', 'fake',
+                                               auth_token='other')
+
+        client = glance._get_glance_client(self.context, 'fake_host:9292',
+                                           False)
+        self.assertIs(glance._get_glance_client(self.context,
+                                                'fake_host:9292', False),
+                      client)
+        self.assertIsNot(glance._get_glance_client(other_context,
+                                                   'fake_host:9292', False),
+                         client)
+        self.assertIsNot(glance._get_glance_client(self.context,
+                                                   'fake_host:9292', False,
+                                                   version=2),
+                         client)
+        # The pool holds two clients, the first one has been dropped.
+        self.assertIsNot(glance._get_glance_client(self.context,
+                                                   'fake_host:9292', False),
+                         client)
+
     def test_create_glance_client(self):
         self.flags(auth_strategy='keystone')
         self.flags(glance_request_timeout=60)
@@ -22,6 +22,7 @@ from oslo.config import cfg
 
 from cinder import exception
 from cinder.openstack.common.scheduler import filters
+from cinder.openstack.common.scheduler.filters import capabilities_filter
 from cinder.openstack.common import timeutils
 from cinder.scheduler import host_manager
 from cinder import test
@@ -123,6 +124,8 @@ class HostManagerTestCase(test.TestCase):
                                  _mock_service_get_all_by_topic):
         context = 'fake_context'
         topic = CONF.volume_topic
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
 
         services = [
             dict(id=1, host='host1', topic='volume', disabled=False,
@@ -167,6 +170,7 @@ class HostManagerTestCase(test.TestCase):
         _mock_service_is_up.side_effect = [True, True, True, False, True]
         _mock_service_get_all_by_topic.reset_mock()
         _mock_warning.reset_mock()
+        timeutils.advance_time_seconds(CONF.report_interval + 1)
 
         # Get all states, make sure hosts 4 and 5 is reported as down/disabled
         self.host_manager.get_all_host_states(context)
@@ -191,6 +195,121 @@ class HostManagerTestCase(test.TestCase):
                              volume_node)
 
 
+    def _set_up_host_states(self, _mock_service_get_all_by_topic):
+        services = [
+            dict(id=1, host='host1', topic='volume', disabled=False,
+                 availability_zone='zone1', updated_at=timeutils.utcnow()),
+            dict(id=2, host='host2', topic='volume', disabled=False,
+                 availability_zone='zone1', updated_at=timeutils.utcnow()),
+            dict(id=3, host='host3', topic='volume', disabled=False,
+                 availability_zone='zone2', updated_at=timeutils.utcnow()),
+        ]
+        _mock_service_get_all_by_topic.return_value = services
+        for i, backend in enumerate(['lvm', 'lvm', 'ceph'], 1):
+            self.host_manager.update_service_capabilities(
+                'volume', 'host%d' % i,
+                dict(volume_backend_name=backend, storage_protocol='iSCSI',
+                     total_capacity_gb=100, free_capacity_gb=100,
+                     reserved_percentage=0))
+        return services
+
+    @mock.patch('cinder.db.service_get_all_by_topic')
+    @mock.patch('cinder.utils.service_is_up')
+    def test_get_all_host_states_refreshes_changed_hosts(
+            self, _mock_service_is_up, _mock_service_get_all_by_topic):
+        _mock_service_is_up.return_value = True
+        self._set_up_host_states(_mock_service_get_all_by_topic)
+        self.host_manager.get_all_host_states('fake_context')
+
+        with mock.patch.object(host_manager.HostState,
+                               'update_from_volume_capability') as update:
+            self.host_manager.get_all_host_states('fake_context')
+            self.assertFalse(update.called)
+
+            self.host_manager.update_service_capabilities(
+                'volume', 'host2',
+                dict(volume_backend_name='ceph', total_capacity_gb=100,
+                     free_capacity_gb=50, reserved_percentage=0))
+            self.host_manager.get_all_host_states('fake_context')
+            self.assertEqual(1, update.call_count)
+
+        host_state = self.host_manager.host_state_map['host2']
+        self.assertEqual('ceph',
+                         host_state.capabilities['volume_backend_name'])
+
+    @mock.patch('cinder.db.service_get_all_by_topic')
+    @mock.patch('cinder.utils.service_is_up')
+    def test_get_all_host_states_reads_services_when_needed(
+            self, _mock_service_is_up, _mock_service_get_all_by_topic):
+        _mock_service_is_up.return_value = True
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        self._set_up_host_states(_mock_service_get_all_by_topic)
+        self.host_manager.get_all_host_states('fake_context')
+        self.assertEqual(1, _mock_service_get_all_by_topic.call_count)
+
+        # Rows are not read again while they are recent.
+        self.host_manager.get_all_host_states('fake_context')
+        self.assertEqual(1, _mock_service_get_all_by_topic.call_count)
+
+        # A host without a row reports its capabilities.
+        timeutils.advance_time_seconds(1)
+        self.host_manager.update_service_capabilities(
+            'volume', 'host4', dict(volume_backend_name='lvm'))
+        self.host_manager.get_all_host_states('fake_context')
+        self.assertEqual(2, _mock_service_get_all_by_topic.call_count)
+        self.host_manager.get_all_host_states('fake_context')
+        self.assertEqual(2, _mock_service_get_all_by_topic.call_count)
+
+        # The rows are as old as the report interval.
+        timeutils.advance_time_seconds(CONF.report_interval + 1)
+        self.host_manager.get_all_host_states('fake_context')
+        self.assertEqual(3, _mock_service_get_all_by_topic.call_count)
+
+    @mock.patch('cinder.db.service_get_all_by_topic')
+    @mock.patch('cinder.utils.service_is_up')
+    def test_get_filtered_hosts_starts_from_indexed_hosts(
+            self, _mock_service_is_up, _mock_service_get_all_by_topic):
+        _mock_service_is_up.return_value = True
+        self._set_up_host_states(_mock_service_get_all_by_topic)
+        hosts = list(self.host_manager.get_all_host_states('fake_context'))
+
+        def _filtered(filter_properties):
+            with mock.patch.object(capabilities_filter.CapabilitiesFilter,
+                                   'host_passes') as host_passes:
+                host_passes.return_value = True
+                self.host_manager.get_filtered_hosts(
+                    hosts, filter_properties,
+                    filter_class_names=['AvailabilityZoneFilter',
+                                        'CapabilitiesFilter'])
+                return sorted(call[0][0].host
+                              for call in host_passes.call_args_list)
+
+        extra_specs = {'volume_backend_name': 'lvm'}
+        self.assertEqual(['host1', 'host2'], _filtered(
+            {'resource_type': {'extra_specs': extra_specs}}))
+
+        extra_specs = {'capabilities:volume_backend_name':
+                       '<or> lvm <or> ceph'}
+        self.assertEqual(['host1', 'host2', 'host3'], _filtered(
+            {'resource_type': {'extra_specs': extra_specs}}))
+
+        request_spec = {'resource_properties': {'availability_zone': 'zone2'}}
+        self.assertEqual(['host3'], _filtered(
+            {'resource_type': {'extra_specs': {}},
+             'request_spec': request_spec}))
+
+        extra_specs = {'volume_backend_name': 'lvm'}
+        self.assertEqual([], _filtered(
+            {'resource_type': {'extra_specs': extra_specs},
+             'request_spec': request_spec}))
+
+        # Requests for unindexed capabilities are filtered over all hosts.
+        extra_specs = {'QoS_support': '<is> True'}
+        self.assertEqual(['host1', 'host2', 'host3'], _filtered(
+            {'resource_type': {'extra_specs': extra_specs}}))
+
+
 class HostStateTestCase(test.TestCase):
     """Test case for HostState class."""
 
@@ -23,12 +23,14 @@ import os
 import tempfile
 import zlib
 
+import eventlet
 from swiftclient import client as swift
 
 from cinder.backup.drivers.swift import SwiftBackupDriver
 from cinder import context
 from cinder import db
 from cinder import exception
+from cinder.openstack.common import importutils
 from cinder.openstack.common import log as logging
 from cinder import test
 from cinder.tests.backup.fake_swift_client import FakeSwiftClient
@@ -55,10 +57,12 @@ class BackupSwiftTestCase(test.TestCase):
                'status': 'available'}
         return db.volume_create(self.ctxt, vol)['id']
 
-    def _create_backup_db_entry(self, container='test-container'):
-        backup = {'id': 123,
+    def _create_backup_db_entry(self, container='test-container',
+                                backup_id=123, status='creating'):
+        backup = {'id': backup_id,
                   'size': 1,
                   'container': container,
+                  'status': status,
                   'volume_id': '1234-5678-1234-8888'}
         return db.backup_create(self.ctxt, backup)['id']
 
@@ -131,6 +135,143 @@ class BackupSwiftTestCase(test.TestCase):
                           service.backup,
                           backup, self.volume_file)
 
+    def test_backup_parallel_uploads_keep_object_order(self):
+        self.flags(backup_swift_object_size=16 * 1024)
+        self.flags(backup_swift_concurrency=3)
+        self._create_backup_db_entry()
+        service = SwiftBackupDriver(self.ctxt)
+
+        uploads = []
+
+        def fake_put_object(container, object_name, data, md5):
+            # later objects complete first
+            eventlet.sleep(0.01 * (8 - len(uploads)))
+            uploads.append(object_name)
+
+        self.stubs.Set(service, '_put_object', fake_put_object)
+
+        written = {}
+
+        def fake_write_metadata(backup, volume_id, container, object_list,
+                                volume_meta, **kwargs):
+            written['objects'] = object_list
+
+        self.stubs.Set(service, '_write_metadata', fake_write_metadata)
+
+        self.volume_file.seek(0)
+        backup = db.backup_get(self.ctxt, 123)
+        service.backup(backup, self.volume_file)
+        self.assertEqual(len(uploads), 8)
+        offsets = [obj.values()[0]['offset'] for obj in written['objects']]
+        self.assertEqual(offsets, [i * 16 * 1024 for i in range(8)])
+        for obj in written['objects']:
+            self.assertEqual(obj.values()[0]['compression'], 'zlib')
+            self.assertEqual(obj.values()[0]['md5'], 'fake-md5-sum')
+
+    def test_backup_records_zero_chunks_as_holes(self):
+        self.flags(backup_swift_object_size=32 * 1024)
+        self._create_backup_db_entry()
+        service = SwiftBackupDriver(self.ctxt)
+        self.volume_file.seek(32 * 1024)
+        self.volume_file.write('\0' * 32 * 1024)
+
+        uploads = []
+        self.stubs.Set(service, '_put_object',
+                       lambda container, name, data, md5: uploads.append(name))
+
+        written = {}
+
+        def fake_write_metadata(backup, volume_id, container, object_list,
+                                volume_meta, **kwargs):
+            written['objects'] = object_list
+
+        self.stubs.Set(service, '_write_metadata', fake_write_metadata)
+
+        self.volume_file.seek(0)
+        backup = db.backup_get(self.ctxt, 123)
+        service.backup(backup, self.volume_file)
+        self.assertEqual(len(uploads), 3)
+        holes = [obj.values()[0] for obj in written['objects']
+                 if obj.values()[0].get('hole')]
+        self.assertEqual(holes, [{'offset': 32 * 1024, 'length': 32 * 1024,
+                                  'compression': 'none', 'hole': True}])
+
+    def test_restore_hole(self):
+        service = SwiftBackupDriver(self.ctxt)
+        with tempfile.NamedTemporaryFile() as volume_file:
+            volume_file.write('a' * 4096)
+            volume_file.seek(1024)
+            service._write_hole(volume_file, 8192)
+            self.assertEqual(volume_file.tell(), 1024 + 8192)
+            volume_file.seek(0)
+            data = volume_file.read()
+        self.assertEqual(data, 'a' * 1024 + '\0' * 8192)
+
+    def test_backup_incremental(self):
+        self.flags(backup_swift_enable_incremental=True)
+        self.flags(backup_swift_object_size=32 * 1024)
+        self._create_backup_db_entry(backup_id=122, status='available')
+        self._create_backup_db_entry()
+        service = SwiftBackupDriver(self.ctxt)
+
+        # the parent holds the first two chunks as they are now
+        self.volume_file.seek(0)
+        sha256s = [hashlib.sha256(self.volume_file.read(32 * 1024)).
+                   hexdigest() for i in range(2)]
+        sha256s.extend(['changed', 'changed'])
+        parent_meta = {'version': '1.1.0', 'sha256s': sha256s,
+                       'chain_depth': 0, 'chunk_size': 32 * 1024}
+        self.stubs.Set(service, '_read_metadata', lambda b: parent_meta)
+
+        offsets = []
+
+        def fake_backup_chunk(backup, container, data, data_offset,
+                              object_meta):
+            offsets.append(data_offset)
+
+        self.stubs.Set(service, '_backup_chunk', fake_backup_chunk)
+
+        self.volume_file.seek(0)
+        backup = db.backup_get(self.ctxt, 123)
+        service.backup(backup, self.volume_file)
+        self.assertEqual(offsets, [64 * 1024, 96 * 1024])
+        backup = db.backup_get(self.ctxt, 123)
+        self.assertEqual(backup['parent_id'], '122')
+
+    def test_backup_incremental_no_fingerprints(self):
+        self.flags(backup_swift_enable_incremental=True)
+        self._create_backup_db_entry(backup_id=122, status='available')
+        self._create_backup_db_entry()
+        service = SwiftBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = db.backup_get(self.ctxt, 123)
+        service.backup(backup, self.volume_file)
+        backup = db.backup_get(self.ctxt, 123)
+        self.assertIsNone(backup['parent_id'])
+
+    def test_restore_incremental_restores_parent_first(self):
+        self._create_backup_db_entry(backup_id=122, status='available')
+        self._create_backup_db_entry()
+        service = SwiftBackupDriver(self.ctxt)
+        self.stubs.Set(service, '_read_metadata',
+                       lambda b: {'version': '1.1.0', 'objects': []})
+
+        restored = []
+
+        def fake_restore_objects(backup, volume_id, metadata, volume_file,
+                                 seek=False):
+            self.assertTrue(seek)
+            restored.append(backup['id'])
+
+        self.stubs.Set(service, '_restore_objects', fake_restore_objects)
+
+        with tempfile.NamedTemporaryFile() as volume_file:
+            backup = db.backup_get(self.ctxt, 123)
+            metadata = {'version': '1.1.0', 'objects': [], 'parent_id': 122}
+            service._restore_v1_1(backup, '1234-5678-1234-8888', metadata,
+                                  volume_file)
+        self.assertEqual(restored, ['122', '123'])
+
     def test_restore(self):
         self._create_backup_db_entry()
         service = SwiftBackupDriver(self.ctxt)
@@ -184,4 +325,12 @@ class BackupSwiftTestCase(test.TestCase):
         self.assertEqual(compressor, zlib)
         compressor = service._get_compressor('bz2')
         self.assertEqual(compressor, bz2)
+        compressor = service._get_compressor('gzip')
+        self.assertEqual(compressor, zlib)
         self.assertRaises(ValueError, service._get_compressor, 'fake')
+
+    def test_get_compressor_module_not_installed(self):
+        service = SwiftBackupDriver(self.ctxt)
+        self.stubs.Set(importutils, 'try_import',
+                       lambda import_str, default=None: default)
+        self.assertRaises(ValueError, service._get_compressor, 'zstd')
@@ -19,6 +19,7 @@ from oslo.config import cfg
 
 from cinder import context
 from cinder import db
+from cinder.db.sqlalchemy import api as sqlalchemy_api
 from cinder import exception
 from cinder.openstack.common import uuidutils
 from cinder.quota import ReservableResource
@@ -371,6 +372,47 @@ class DBAPIVolumeTestCase(BaseTest):
         self._assertEqualListsOfObjects(volumes[2:], db.volume_get_all(
                                         self.ctxt, 2, 2, 'id', None))
 
+    def test_volume_get_all_filters(self):
+        vol1 = db.volume_create(self.ctxt, {'display_name': 'vol1',
+                                            'status': 'available',
+                                            'metadata': {'key1': 'value1'}})
+        vol2 = db.volume_create(self.ctxt, {'display_name': 'vol2',
+                                            'status': 'in-use',
+                                            'metadata': {'key1': 'value2'}})
+        vol3 = db.volume_create(self.ctxt, {'display_name': 'vol3',
+                                            'status': 'available',
+                                            'metadata': {'key1': 'value2',
+                                                         'key2': 'value3'}})
+
+        def _get_all(filters, limit=None):
+            volumes = db.volume_get_all(self.ctxt, None, limit, 'created_at',
+                                        'asc', filters=filters)
+            return sorted(volume['id'] for volume in volumes)
+
+        self.assertEqual(sorted([vol1['id'], vol3['id']]),
+                         _get_all({'status': 'available'}))
+        self.assertEqual(sorted([vol2['id'], vol3['id']]),
+                         _get_all({'metadata': {'key1': 'value2'}}))
+        self.assertEqual([vol3['id']],
+                         _get_all({'status': 'available',
+                                   'metadata': {'key1': 'value2'}}))
+        self.assertEqual([vol3['id']],
+                         _get_all({'metadata': {'key1': 'value2',
+                                                'key2': 'value3'}}))
+        self.assertEqual([], _get_all({'metadata': {'key1': 'value3'}}))
+        self.assertEqual([], _get_all({'no_such_attribute': 'value'}))
+        # The limit applies to the filtered volumes.
+        self.assertEqual([vol3['id']],
+                         _get_all({'metadata': {'key2': 'value3'}}, limit=1))
+
+    def test_volume_get_all_no_migration_targets(self):
+        volumes = [db.volume_create(self.ctxt, {'migration_status': status})
+                   for status in (None, 'migrating', 'target:fake-id')]
+
+        self._assertEqualListsOfObjects(volumes[:2], db.volume_get_all(
+            self.ctxt, None, None, 'created_at', 'asc',
+            filters={'no_migration_targets': True}))
+
     def test_volume_get_all_by_host(self):
         volumes = []
         for i in xrange(3):
@@ -410,6 +452,18 @@ class DBAPIVolumeTestCase(BaseTest):
                                             self.ctxt, 'p%d' % i, None,
                                             None, 'host', None))
 
+    def test_volume_get_all_by_project_filters(self):
+        vol1 = db.volume_create(self.ctxt, {'project_id': 'p1',
+                                            'display_name': 'vol1'})
+        db.volume_create(self.ctxt, {'project_id': 'p1',
+                                     'display_name': 'vol2'})
+        db.volume_create(self.ctxt, {'project_id': 'p2',
+                                     'display_name': 'vol1'})
+
+        self._assertEqualListsOfObjects([vol1], db.volume_get_all_by_project(
+            self.ctxt, 'p1', None, None, 'host', None,
+            filters={'display_name': 'vol1'}))
+
     def test_volume_get_iscsi_target_num(self):
         target = db.iscsi_target_create_safe(self.ctxt, {'volume_id': 42,
                                                          'target_num': 43})
@@ -487,6 +541,22 @@ class DBAPISnapshotTestCase(BaseTest):
                                         db.snapshot_get_all(self.ctxt),
                                         ignored_keys=['metadata', 'volume'])
 
+    def test_snapshot_get_all_filters_and_pagination(self):
+        db.volume_create(self.ctxt, {'id': 1})
+        for i, status in ((1, 'available'), (2, 'error'), (3, 'available')):
+            db.snapshot_create(self.ctxt, {'id': str(i), 'volume_id': 1,
+                                           'volume_size': i,
+                                           'status': status})
+
+        snapshots = db.snapshot_get_all(self.ctxt, None, None, 'volume_size',
+                                        'asc', filters={'status': 'available'})
+        self.assertEqual(['1', '3'], [s['id'] for s in snapshots])
+        snapshots = db.snapshot_get_all(self.ctxt, '1', 1, 'volume_size',
+                                        'asc', filters={'status': 'available'})
+        self.assertEqual(['3'], [s['id'] for s in snapshots])
+        self.assertEqual([], db.snapshot_get_all(
+            self.ctxt, filters={'no_such_attribute': 'value'}))
+
     def test_snapshot_metadata_get(self):
         metadata = {'a': 'b', 'c': 'd'}
         db.volume_create(self.ctxt, {'id': 1})
@@ -874,6 +944,39 @@ class DBAPIQuotaTestCase(BaseTest):
             self.assertIn(reservation.resource, res_names)
             res_names.remove(reservation.resource)
 
+    def test_quota_reserve_interleaved(self):
+        quotas = {'volumes': db.quota_create(self.ctxt, 'p1', 'volumes', 10)}
+        resources = {'volumes': ReservableResource('volumes',
+                                                   '_sync_volumes')}
+        expire = datetime.datetime.utcnow() + datetime.timedelta(days=1)
+
+        def reserve():
+            return db.quota_reserve(self.ctxt, resources, quotas,
+                                    {'volumes': 1}, expire, 0, 0, 'p1')
+
+        reserve()
+        real_get_quota_usages = sqlalchemy_api._get_quota_usages
+        interleaved = []
+
+        def fake_get_quota_usages(context, session, project_id,
+                                  resources=None, lock=True):
+            usages = real_get_quota_usages(context, session, project_id,
+                                           resources=resources, lock=lock)
+            if not lock and not interleaved:
+                # Another request reserves between the unlocked read
+                # and the locked one.
+                interleaved.append(reserve())
+            return usages
+
+        self.stubs.Set(sqlalchemy_api, '_get_quota_usages',
+                       fake_get_quota_usages)
+        reserve()
+
+        self.assertEqual(len(interleaved), 1)
+        quota_usage = db.quota_usage_get(self.ctxt, 'p1', 'volumes')
+        self.assertEqual(quota_usage.in_use, 0)
+        self.assertEqual(quota_usage.reserved, 3)
+
     def test_quota_destroy(self):
         db.quota_create(self.ctxt, 'project1', 'resource1', 41)
         self.assertIsNone(db.quota_destroy(self.ctxt, 'project1',
@@ -1011,6 +1114,17 @@ class DBAPIBackupTestCase(BaseTest):
                                               self.created[1]['project_id'])
         self._assertEqualObjects(self.created[1], byproj[0])
 
+    def test_backup_get_all_filters(self):
+        backups = db.backup_get_all(self.ctxt, filters={'status': 'status2'})
+        self._assertEqualListsOfObjects([self.created[1]], backups)
+        self.assertEqual([], db.backup_get_all(
+            self.ctxt, filters={'no_such_attribute': 'value'}))
+
+    def test_backup_get_all_marker_and_limit(self):
+        backups = db.backup_get_all(self.ctxt, self.created[0]['id'], 1,
+                                    'size', 'asc')
+        self._assertEqualListsOfObjects([self.created[1]], backups)
+
     def test_backup_update_nonexistent(self):
         self.assertRaises(exception.BackupNotFound,
                           db.backup_update,
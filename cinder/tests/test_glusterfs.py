@@ -87,6 +87,7 @@ class GlusterFsDriverTestCase(test.TestCase):
         self._configuration.glusterfs_disk_util = 'df'
         self._configuration.glusterfs_sparsed_volumes = True
         self._configuration.glusterfs_qcow2_volumes = False
+        self._configuration.glusterfs_share_capacity_max_age = 600
 
         self.stubs = stubout.StubOutForTesting()
         self._driver =\
@@ -482,6 +483,28 @@ class GlusterFsDriverTestCase(test.TestCase):
 
         mox.VerifyAll()
 
+    def test_find_share_uses_counted_capacity(self):
+        """_find_share should not count shares again for every volume."""
+        mox = self._mox
+        drv = self._driver
+
+        drv._mounted_shares = [self.TEST_EXPORT1, self.TEST_EXPORT2]
+
+        mox.StubOutWithMock(drv, '_get_available_capacity')
+        drv._get_available_capacity(self.TEST_EXPORT1).\
+            AndReturn((2 * units.GiB, 5 * units.GiB))
+        drv._get_available_capacity(self.TEST_EXPORT2).\
+            AndReturn((3 * units.GiB, 10 * units.GiB))
+
+        mox.ReplayAll()
+
+        self.assertEqual(self.TEST_EXPORT2,
+                         drv._find_share(self.TEST_SIZE_IN_GB))
+        self.assertEqual(self.TEST_EXPORT2,
+                         drv._find_share(self.TEST_SIZE_IN_GB))
+
+        mox.VerifyAll()
+
     def test_find_share_should_throw_error_if_there_is_no_enough_place(self):
         """_find_share should throw error if there is no share to host vol."""
         mox = self._mox
@@ -693,6 +716,7 @@ class GlusterFsDriverTestCase(test.TestCase):
         volume = DumbVolume()
         volume['name'] = 'volume-123'
         volume['provider_location'] = self.TEST_EXPORT1
+        volume['size'] = self.TEST_SIZE_IN_GB
 
         mox.StubOutWithMock(drv, 'local_path')
         drv.local_path(volume).AndReturn(self.TEST_LOCAL_PATH)
@@ -716,6 +740,7 @@ class GlusterFsDriverTestCase(test.TestCase):
         volume = DumbVolume()
         volume['name'] = 'volume-123'
         volume['provider_location'] = self.TEST_EXPORT1
+        volume['size'] = self.TEST_SIZE_IN_GB
 
         mox.StubOutWithMock(drv, '_ensure_share_mounted')
         drv._ensure_share_mounted(self.TEST_EXPORT1)
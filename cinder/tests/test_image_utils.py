@@ -17,15 +17,18 @@
 
 import contextlib
 import mox
+import shutil
 import tempfile
 
 from cinder import context
 from cinder import exception
+from cinder.image import cache as image_cache
 from cinder.image import image_utils
 from cinder.openstack.common import processutils
 from cinder import test
 from cinder import units
 from cinder import utils
+from cinder.volume import utils as volume_utils
 
 
 class FakeImageService:
@@ -191,7 +194,8 @@ class TestUtils(test.TestCase):
 
         self.assertEqual(str(inf), TEST_STR)
 
-    def _test_fetch_to_raw(self, has_qemu=True, src_inf=None, dest_inf=None):
+    def _test_fetch_to_raw(self, has_qemu=True, src_inf=None, dest_inf=None,
+                           copy_size=None):
         mox = self._mox
         mox.StubOutWithMock(image_utils, 'create_temporary_file')
         mox.StubOutWithMock(utils, 'execute')
@@ -222,6 +226,11 @@ class TestUtils(test.TestCase):
                     (src_inf, 'ignored')
                 )
 
+        if has_qemu and copy_size:
+            mox.StubOutWithMock(volume_utils, 'copy_volume')
+            volume_utils.copy_volume(self.TEST_DEV_PATH, self.TEST_DEV_PATH,
+                                     copy_size, mox.IgnoreArg())
+
         if has_qemu and dest_inf:
             utils.execute(
                 'qemu-img', 'convert', '-O', 'raw',
@@ -254,6 +263,19 @@ class TestUtils(test.TestCase):
                                  mox.IgnoreArg())
         self._mox.VerifyAll()
 
+    def test_fetch_to_raw_copies_raw_image(self):
+        SRC_INFO = ("image: qemu.raw\n"
+                    "file_format: raw\n"
+                    "virtual_size: 50M (52428800 bytes)\n"
+                    "disk_size: 196K (200704 bytes)")
+
+        self._test_fetch_to_raw(src_inf=SRC_INFO, copy_size=50)
+
+        image_utils.fetch_to_raw(context, self._image_service,
+                                 self.TEST_IMAGE_ID, self.TEST_DEV_PATH,
+                                 mox.IgnoreArg())
+        self._mox.VerifyAll()
+
     def test_fetch_to_raw_no_qemu_img(self):
         self._test_fetch_to_raw(has_qemu=False)
 
@@ -451,6 +473,148 @@ class TestUtils(test.TestCase):
         m.VerifyAll()
 
 
+class FakeRawImageService(FakeImageService):
+    def show(self, context, image_id):
+        return {'size': len(self._imagedata.get(image_id, '')),
+                'disk_format': 'raw',
+                'container_format': 'bare'}
+
+
+class TestFetchRawToVolume(test.TestCase):
+    TEST_IMAGE_ID = 321
+
+    def setUp(self):
+        super(TestFetchRawToVolume, self).setUp()
+        self.image_service = FakeRawImageService()
+        self.volume_file = tempfile.NamedTemporaryFile()
+        self.volume_file.write('\0' * 4096)
+        self.volume_file.flush()
+
+    def tearDown(self):
+        self.volume_file.close()
+        super(TestFetchRawToVolume, self).tearDown()
+
+    def test_raw_image_is_streamed_to_volume(self):
+        self.image_service._imagedata[self.TEST_IMAGE_ID] = 'x' * 1024
+        self.mox.StubOutWithMock(image_utils, 'create_temporary_file')
+        self.mox.StubOutWithMock(utils, 'execute')
+        self.mox.ReplayAll()
+
+        image_utils.fetch_to_raw(context, self.image_service,
+                                 self.TEST_IMAGE_ID, self.volume_file.name,
+                                 '1M', size=1)
+
+        with open(self.volume_file.name) as f:
+            self.assertEqual(f.read(), 'x' * 1024 + '\0' * 3072)
+
+    def test_small_raw_image_is_streamed_to_volume(self):
+        self.image_service._imagedata[self.TEST_IMAGE_ID] = 'xyz'
+        image_utils.fetch_to_raw(context, self.image_service,
+                                 self.TEST_IMAGE_ID, self.volume_file.name,
+                                 '1M')
+
+        with open(self.volume_file.name) as f:
+            self.assertEqual(f.read(3), 'xyz')
+
+    def test_raw_image_with_qcow2_header_is_refused(self):
+        self.image_service._imagedata[self.TEST_IMAGE_ID] = \
+            'QFI\xfb' + '\0' * 1020
+
+        self.assertRaises(exception.ImageUnacceptable,
+                          image_utils.fetch_to_raw,
+                          context, self.image_service,
+                          self.TEST_IMAGE_ID, self.volume_file.name, '1M')
+
+        with open(self.volume_file.name) as f:
+            self.assertEqual(f.read(), '\0' * 4096)
+
+    def test_raw_image_too_big_for_volume(self):
+        self.image_service._imagedata[self.TEST_IMAGE_ID] = 'x' * 1024
+        self.image_service.show = lambda context, image_id: {
+            'size': 2 * units.GiB, 'disk_format': 'raw',
+            'container_format': 'bare'}
+
+        self.assertRaises(exception.ImageUnacceptable,
+                          image_utils.fetch_to_raw,
+                          context, self.image_service,
+                          self.TEST_IMAGE_ID, self.volume_file.name, '1M',
+                          size=1)
+
+    def test_raw_image_bigger_than_reported_is_refused(self):
+        max_size = image_utils.RAW_HEADER_SIZE + 10
+        with open(self.volume_file.name, 'r+b') as f:
+            writer = image_utils.RawImageWriter(self.TEST_IMAGE_ID, f,
+                                                max_size)
+            writer.write('x' * image_utils.RAW_HEADER_SIZE)
+            writer.write('x' * 10)
+            self.assertRaises(exception.ImageUnacceptable,
+                              writer.write, 'x')
+
+
+class TestFetchThroughImageCache(test.TestCase):
+    TEST_IMAGE_ID = 321
+
+    def setUp(self):
+        super(TestFetchThroughImageCache, self).setUp()
+        self.image_service = FakeRawImageService()
+        self.image_service._imagedata[self.TEST_IMAGE_ID] = 'x' * 1024
+        self.image_service.show = lambda context, image_id: {
+            'size': 1024, 'disk_format': 'raw', 'container_format': 'bare',
+            'checksum': 'abc'}
+        self.downloads = 0
+        download = self.image_service.download
+
+        def _download(context, image_id, data):
+            self.downloads += 1
+            download(context, image_id, data)
+        self.image_service.download = _download
+
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        self.cache = image_cache.ImageCache(cache_dir, units.GiB)
+        self.stubs.Set(image_cache, 'get_cache', lambda: self.cache)
+        self.stubs.Set(volume_utils, 'copy_volume', self._fake_copy_volume)
+
+    def _fake_copy_volume(self, srcstr, deststr, size_in_m, blocksize):
+        with open(srcstr, 'rb') as src:
+            with open(deststr, 'r+b') as dest:
+                dest.write(src.read())
+
+    def _fetch(self, size=1):
+        volume_file = tempfile.NamedTemporaryFile()
+        self.addCleanup(volume_file.close)
+        volume_file.write('\0' * 4096)
+        volume_file.flush()
+        image_utils.fetch_to_raw(context, self.image_service,
+                                 self.TEST_IMAGE_ID, volume_file.name,
+                                 '1M', size=size)
+        with open(volume_file.name) as f:
+            return f.read()
+
+    def test_image_is_downloaded_once(self):
+        for i in range(3):
+            self.assertEqual(self._fetch(), 'x' * 1024 + '\0' * 3072)
+
+        self.assertEqual(self.downloads, 1)
+        stats = self.cache.get_stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 2)
+
+    def test_image_without_checksum_is_not_cached(self):
+        self.image_service.show = lambda context, image_id: {
+            'size': 1024, 'disk_format': 'raw', 'container_format': 'bare'}
+        self._fetch()
+        self._fetch()
+
+        self.assertEqual(self.downloads, 2)
+        self.assertEqual(self.cache.get_stats()['entries'], 0)
+
+    def test_cached_image_too_big_for_volume(self):
+        self._fetch()
+
+        self.assertRaises(exception.ImageUnacceptable, self._fetch, size=0)
+
+
 class TestExtractTo(test.TestCase):
     def test_extract_to_calls_tar(self):
         mox = self.mox
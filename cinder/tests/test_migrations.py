@@ -1074,3 +1074,59 @@ class TestMigrations(test.TestCase):
                                         metadata,
                                         autoload=True)
             self.assertNotIn('disabled_reason', services.c)
+
+    def test_migration_023(self):
+        """Test that adding parent_id column to backups works correctly."""
+        for (key, engine) in self.engines.items():
+            migration_api.version_control(engine,
+                                          TestMigrations.REPOSITORY,
+                                          migration.db_initial_version())
+            migration_api.upgrade(engine, TestMigrations.REPOSITORY, 22)
+            metadata = sqlalchemy.schema.MetaData()
+            metadata.bind = engine
+
+            migration_api.upgrade(engine, TestMigrations.REPOSITORY, 23)
+            backups = sqlalchemy.Table('backups',
+                                       metadata,
+                                       autoload=True)
+            self.assertIsInstance(backups.c.parent_id.type,
+                                  sqlalchemy.types.VARCHAR)
+
+            migration_api.downgrade(engine, TestMigrations.REPOSITORY, 22)
+            metadata = sqlalchemy.schema.MetaData()
+            metadata.bind = engine
+
+            backups = sqlalchemy.Table('backups',
+                                       metadata,
+                                       autoload=True)
+            self.assertNotIn('parent_id', backups.c)
+
+    def test_migration_024(self):
+        """Test adding the volume list filter indexes works correctly."""
+        for (key, engine) in self.engines.items():
+            migration_api.version_control(engine,
+                                          TestMigrations.REPOSITORY,
+                                          migration.db_initial_version())
+            migration_api.upgrade(engine, TestMigrations.REPOSITORY, 23)
+            metadata = sqlalchemy.schema.MetaData()
+            metadata.bind = engine
+
+            migration_api.upgrade(engine, TestMigrations.REPOSITORY, 24)
+            volumes = sqlalchemy.Table('volumes', metadata, autoload=True)
+            volume_metadata = sqlalchemy.Table('volume_metadata',
+                                               metadata,
+                                               autoload=True)
+            indexes = [i.name for i in volumes.indexes]
+            self.assertIn('volumes_project_id_deleted_idx', indexes)
+            self.assertIn('volumes_status_idx', indexes)
+            indexes = [i.name for i in volume_metadata.indexes]
+            self.assertIn('volume_metadata_key_value_idx', indexes)
+
+            migration_api.downgrade(engine, TestMigrations.REPOSITORY, 23)
+            metadata = sqlalchemy.schema.MetaData()
+            metadata.bind = engine
+
+            volumes = sqlalchemy.Table('volumes', metadata, autoload=True)
+            indexes = [i.name for i in volumes.indexes]
+            self.assertNotIn('volumes_project_id_deleted_idx', indexes)
+            self.assertNotIn('volumes_status_idx', indexes)
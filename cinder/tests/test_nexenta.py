@@ -580,6 +580,26 @@ class TestNexentaNfsDriver(test.TestCase):
         self.assertRaises(nexenta.NexentaException, self.drv._do_create_volume,
                           volume)
 
+    def test_create_volume(self):
+        drv = nfs.NexentaNfsDriver(configuration=conf.Configuration(None))
+        volume = {'size': 1, 'name': 'volume-1'}
+
+        self.mox.StubOutWithMock(drv, '_ensure_shares_mounted')
+        self.mox.StubOutWithMock(drv, '_get_capacity_info')
+        self.mox.StubOutWithMock(drv, '_do_create_volume')
+        drv._ensure_shares_mounted()
+        drv._get_capacity_info(self.TEST_EXPORT1).AndReturn(
+            (10 * units.GiB, 8 * units.GiB, 2 * units.GiB))
+        drv._do_create_volume(volume)
+
+        self.mox.ReplayAll()
+
+        drv._mounted_shares = [self.TEST_EXPORT1]
+        self.assertEqual(drv.create_volume(volume),
+                         {'provider_location': self.TEST_EXPORT1})
+        self.assertEqual(drv._get_share_capacity(self.TEST_EXPORT1),
+                         (10 * units.GiB, 8 * units.GiB, 3 * units.GiB))
+
     def test_create_sparsed_file(self):
         self.nms_mock.appliance.execute('dd if=/dev/zero of=/tmp/path bs=1M '
                                         'count=0 seek=1024')
@@ -713,6 +733,7 @@ class TestNexentaNfsDriver(test.TestCase):
         self.drv.delete_volume({
             'id': '1',
             'name': 'volume-1',
+            'size': 1,
             'provider_location': self.TEST_EXPORT1
         })
         self.mox.ResetAll()
@@ -728,6 +749,7 @@ class TestNexentaNfsDriver(test.TestCase):
         self.drv.delete_volume({
             'id': '1',
             'name': 'volume-1',
+            'size': 1,
             'provider_location': self.TEST_EXPORT1
         })
         self.mox.ResetAll()
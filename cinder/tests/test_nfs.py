@@ -28,6 +28,8 @@ from oslo.config import cfg
 from cinder import context
 from cinder import exception
 from cinder.image import image_utils
+from cinder.openstack.common import processutils as putils
+from cinder.openstack.common import timeutils
 from cinder import test
 from cinder import units
 from cinder.volume import configuration as conf
@@ -70,6 +72,21 @@ class RemoteFsDriverTestCase(test.TestCase):
         (mox, drv) = self._mox, self._driver
 
         mox.StubOutWithMock(drv, '_execute')
+        drv._execute('fallocate', '-l', '1G', '/path', run_as_root=True)
+
+        mox.ReplayAll()
+
+        drv._create_regular_file('/path', 1)
+
+        mox.VerifyAll()
+
+    def test_create_regular_file_without_fallocate(self):
+        (mox, drv) = self._mox, self._driver
+
+        mox.StubOutWithMock(drv, '_execute')
+        drv._execute('fallocate', '-l', '1G', '/path', run_as_root=True).\
+            AndRaise(putils.ProcessExecutionError(
+                stderr='fallocate failed: Operation not supported'))
         drv._execute('dd', 'if=/dev/zero', 'of=/path', 'bs=1M', 'count=1024',
                      run_as_root=True)
 
@@ -135,6 +152,7 @@ class NfsDriverTestCase(test.TestCase):
         self.configuration.nfs_oversub_ratio = 1.0
         self.configuration.nfs_mount_point_base = self.TEST_MNT_POINT_BASE
         self.configuration.nfs_mount_options = None
+        self.configuration.nfs_share_capacity_max_age = 600
         self.configuration.volume_dd_blocksize = '1M'
         self._driver = nfs.NfsDriver(configuration=self.configuration)
         self._driver.shares = {}
@@ -411,18 +429,12 @@ class NfsDriverTestCase(test.TestCase):
         drv._mounted_shares = [self.TEST_NFS_EXPORT1, self.TEST_NFS_EXPORT2]
 
         mox.StubOutWithMock(drv, '_get_capacity_info')
-        drv._get_capacity_info(self.TEST_NFS_EXPORT1).\
-            AndReturn((5 * units.GiB, 2 * units.GiB,
-                       2 * units.GiB))
         drv._get_capacity_info(self.TEST_NFS_EXPORT1).\
             AndReturn((5 * units.GiB, 2 * units.GiB,
                        2 * units.GiB))
         drv._get_capacity_info(self.TEST_NFS_EXPORT2).\
             AndReturn((10 * units.GiB, 3 * units.GiB,
                        1 * units.GiB))
-        drv._get_capacity_info(self.TEST_NFS_EXPORT2).\
-            AndReturn((10 * units.GiB, 3 * units.GiB,
-                       1 * units.GiB))
 
         mox.ReplayAll()
 
@@ -431,6 +443,72 @@ class NfsDriverTestCase(test.TestCase):
 
         mox.VerifyAll()
 
+    def test_find_share_accounts_for_created_volumes(self):
+        """_find_share should not count shares again for every volume."""
+        drv = self._driver
+
+        drv._mounted_shares = [self.TEST_NFS_EXPORT1, self.TEST_NFS_EXPORT2]
+        capacity = {self.TEST_NFS_EXPORT1: (10 * units.GiB, 8 * units.GiB,
+                                            1 * units.GiB),
+                    self.TEST_NFS_EXPORT2: (10 * units.GiB, 8 * units.GiB,
+                                            2 * units.GiB)}
+
+        with mock.patch.object(drv, '_get_capacity_info',
+                               side_effect=capacity.get) as mock_info:
+            self.assertEqual(self.TEST_NFS_EXPORT1,
+                             drv._find_share(self.TEST_SIZE_IN_GB))
+            drv._account_share_capacity(self.TEST_NFS_EXPORT1, 2)
+            self.assertEqual(self.TEST_NFS_EXPORT2,
+                             drv._find_share(self.TEST_SIZE_IN_GB))
+            drv._account_share_capacity(self.TEST_NFS_EXPORT1, -2)
+            self.assertEqual(self.TEST_NFS_EXPORT1,
+                             drv._find_share(self.TEST_SIZE_IN_GB))
+
+            self.assertEqual(mock_info.call_count, 2)
+
+    def test_account_share_capacity_takes_available_space_when_thick(self):
+        """Thick volumes should reduce the available space of a share."""
+        drv = self._driver
+        self.configuration.nfs_sparsed_volumes = False
+
+        drv._mounted_shares = [self.TEST_NFS_EXPORT1]
+        with mock.patch.object(drv, '_get_capacity_info',
+                               return_value=(10 * units.GiB, 8 * units.GiB,
+                                             1 * units.GiB)):
+            drv._find_share(self.TEST_SIZE_IN_GB)
+            drv._account_share_capacity(self.TEST_NFS_EXPORT1, 2)
+            self.assertEqual(drv._get_share_capacity(self.TEST_NFS_EXPORT1),
+                             (10 * units.GiB, 6 * units.GiB, 3 * units.GiB))
+
+            # The used ratio of the share now counts the thick volumes.
+            drv._account_share_capacity(self.TEST_NFS_EXPORT1, 6)
+            self.assertRaises(exception.NfsNoSuitableShareFound,
+                              drv._find_share, self.TEST_SIZE_IN_GB)
+
+            drv._account_share_capacity(self.TEST_NFS_EXPORT1, -8)
+            self.assertEqual(drv._get_share_capacity(self.TEST_NFS_EXPORT1),
+                             (10 * units.GiB, 8 * units.GiB, 1 * units.GiB))
+
+    def test_find_share_counts_shares_again_when_count_is_old(self):
+        """_find_share should count shares older than the max age."""
+        drv = self._driver
+
+        drv._mounted_shares = [self.TEST_NFS_EXPORT1]
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+
+        with mock.patch.object(drv, '_get_capacity_info',
+                               return_value=(10 * units.GiB, 8 * units.GiB,
+                                             1 * units.GiB)) as mock_info:
+            drv._find_share(self.TEST_SIZE_IN_GB)
+            timeutils.advance_time_seconds(600)
+            drv._find_share(self.TEST_SIZE_IN_GB)
+            self.assertEqual(mock_info.call_count, 1)
+
+            timeutils.advance_time_seconds(1)
+            drv._find_share(self.TEST_SIZE_IN_GB)
+            self.assertEqual(mock_info.call_count, 2)
+
     def test_find_share_should_throw_error_if_there_is_no_enough_place(self):
         """_find_share should throw error if there is no share to host vol."""
         mox = self._mox
@@ -544,6 +622,81 @@ class NfsDriverTestCase(test.TestCase):
 
         mox.VerifyAll()
 
+    def _clone_volumes(self):
+        src_vref = {'id': '1', 'name': 'volume-1', 'size': 10,
+                    'provider_location': self.TEST_NFS_EXPORT1}
+        volume = {'id': '2', 'name': 'volume-2', 'size': 10,
+                  'provider_location': None}
+        return volume, src_vref
+
+    def test_create_cloned_volume(self):
+        """create_cloned_volume copies the volume on its own share."""
+        drv = self._driver
+        volume, src_vref = self._clone_volumes()
+        drv._mounted_shares = [self.TEST_NFS_EXPORT1, self.TEST_NFS_EXPORT2]
+        mount_point = drv._get_mount_point_for_share(self.TEST_NFS_EXPORT1)
+
+        with mock.patch.object(drv, '_ensure_shares_mounted'):
+            with mock.patch.object(drv, '_is_share_eligible',
+                                   return_value=True):
+                with mock.patch.object(drv, '_execute') as mock_execute:
+                    result = drv.create_cloned_volume(volume, src_vref)
+
+        self.assertEqual(result,
+                         {'provider_location': self.TEST_NFS_EXPORT1})
+        mock_execute.assert_any_call(
+            'cp', '--reflink=auto', '--sparse=always',
+            os.path.join(mount_point, 'volume-1'),
+            os.path.join(mount_point, 'volume-2'), run_as_root=True)
+
+    def test_create_cloned_volume_thick(self):
+        """create_cloned_volume makes thick copies of thick volumes."""
+        drv = self._driver
+        self.configuration.nfs_sparsed_volumes = False
+        volume, src_vref = self._clone_volumes()
+        drv._mounted_shares = [self.TEST_NFS_EXPORT1]
+        mount_point = drv._get_mount_point_for_share(self.TEST_NFS_EXPORT1)
+
+        with mock.patch.object(drv, '_ensure_shares_mounted'):
+            with mock.patch.object(drv, '_is_share_eligible',
+                                   return_value=True):
+                with mock.patch.object(drv, '_execute') as mock_execute:
+                    drv.create_cloned_volume(volume, src_vref)
+
+        mock_execute.assert_any_call(
+            'cp', '--reflink=auto', '--sparse=never',
+            os.path.join(mount_point, 'volume-1'),
+            os.path.join(mount_point, 'volume-2'), run_as_root=True)
+
+    def test_create_cloned_volume_on_other_share(self):
+        """create_cloned_volume copies to another share when it is full."""
+        drv = self._driver
+        volume, src_vref = self._clone_volumes()
+        volume['size'] = 20
+        drv._mounted_shares = [self.TEST_NFS_EXPORT1, self.TEST_NFS_EXPORT2]
+        src_path = os.path.join(
+            drv._get_mount_point_for_share(self.TEST_NFS_EXPORT1), 'volume-1')
+        dest_path = os.path.join(
+            drv._get_mount_point_for_share(self.TEST_NFS_EXPORT2), 'volume-2')
+
+        with mock.patch.object(drv, '_ensure_shares_mounted'):
+            with mock.patch.object(drv, '_is_share_eligible',
+                                   return_value=False):
+                with mock.patch.object(drv, '_find_share',
+                                       return_value=self.TEST_NFS_EXPORT2):
+                    with mock.patch.object(drv, '_execute') as mock_execute:
+                        with mock.patch.object(image_utils,
+                                               'resize_image') as mock_resize:
+                            result = drv.create_cloned_volume(volume,
+                                                              src_vref)
+
+        self.assertEqual(result,
+                         {'provider_location': self.TEST_NFS_EXPORT2})
+        mock_execute.assert_any_call(
+            'cp', '--reflink=auto', '--sparse=always', src_path, dest_path,
+            run_as_root=True)
+        mock_resize.assert_called_once_with(dest_path, 20)
+
     def test_delete_volume(self):
         """delete_volume simple test case."""
         mox = self._mox
@@ -629,3 +782,7 @@ class NfsDriverTestCase(test.TestCase):
         self.assertEqual(drv._stats['free_capacity_gb'], 5.0)
 
         mox.VerifyAll()
+
+        # The shares counted for the stats are used to place volumes.
+        self.assertEqual(drv._get_share_capacity(self.TEST_NFS_EXPORT2),
+                         (20 * units.GiB, 3 * units.GiB, 3 * units.GiB))
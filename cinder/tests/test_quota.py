@@ -31,6 +31,7 @@ from cinder import quota
 from cinder import test
 import cinder.tests.image.fake
 from cinder import volume
+from cinder.volume import volume_types
 
 
 CONF = cfg.CONF
@@ -714,6 +715,80 @@ class VolumeTypeQuotaEngineTestCase(test.TestCase):
         db.volume_type_destroy(ctx, vtype['id'])
         db.volume_type_destroy(ctx, vtype2['id'])
 
+    def _stub_volume_types(self):
+        self.calls = []
+
+        def fake_vtga(context, inactive=False, filters=None):
+            self.calls.append('volume_type_get_all')
+            return {'type1': {'id': 'type1-id', 'name': 'type1'}}
+
+        def fake_vtgbn(context, name):
+            self.calls.append(('volume_type_get_by_name', name))
+            if name != 'type1':
+                raise exception.VolumeTypeNotFoundByName(
+                    volume_type_name=name)
+            return {'id': 'type1-id', 'name': 'type1'}
+
+        self.stubs.Set(db, 'volume_type_get_all', fake_vtga)
+        self.stubs.Set(db, 'volume_type_get_by_name', fake_vtgbn)
+
+    def test_resources_are_cached(self):
+        self.flags(quota_volume_type_cache_ttl=60)
+        self._stub_volume_types()
+
+        engine = quota.VolumeTypeQuotaEngine()
+        self.assertIn('volumes_type1', engine.resources)
+        self.assertIn('gigabytes_type1', engine.resources)
+        self.assertEqual(self.calls, ['volume_type_get_all'])
+
+        engine.invalidate_volume_types()
+        self.assertIn('volumes_type1', engine.resources)
+        self.assertEqual(self.calls, ['volume_type_get_all',
+                                      'volume_type_get_all'])
+
+    def test_resources_not_cached_without_ttl(self):
+        self.flags(quota_volume_type_cache_ttl=0)
+        self._stub_volume_types()
+
+        engine = quota.VolumeTypeQuotaEngine()
+        engine.resources
+        engine.resources
+        self.assertEqual(self.calls, ['volume_type_get_all',
+                                      'volume_type_get_all'])
+
+    def test_get_resources_looks_up_named_types(self):
+        self.flags(quota_volume_type_cache_ttl=60)
+        self._stub_volume_types()
+
+        engine = quota.VolumeTypeQuotaEngine()
+        for i in range(2):
+            resources = engine._get_resources(['volumes', 'gigabytes_type1',
+                                               'volumes_type1'])
+            self.assertEqual(sorted(resources.keys()),
+                             ['gigabytes_type1', 'volumes', 'volumes_type1'])
+            self.assertEqual(resources['volumes_type1'].volume_type_id,
+                             'type1-id')
+        self.assertEqual(self.calls, [('volume_type_get_by_name', 'type1')])
+
+    def test_get_resources_leaves_out_unknown(self):
+        self._stub_volume_types()
+
+        engine = quota.VolumeTypeQuotaEngine()
+        resources = engine._get_resources(['volumes_type2', 'unknown',
+                                           'bogus_type1'])
+        self.assertEqual(resources, {})
+        self.assertEqual(self.calls, [('volume_type_get_by_name', 'type2')])
+
+    def test_volume_type_changes_invalidate_cache(self):
+        ctx = context.get_admin_context()
+        self.mox.StubOutWithMock(quota.QUOTAS, 'invalidate_volume_types')
+        quota.QUOTAS.invalidate_volume_types()
+        quota.QUOTAS.invalidate_volume_types()
+        self.mox.ReplayAll()
+
+        vtype = volume_types.create(ctx, 'type1')
+        volume_types.destroy(ctx, vtype['id'])
+
 
 class DbQuotaDriverTestCase(test.TestCase):
     def setUp(self):
@@ -1102,6 +1177,7 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
             def fake_sync(context, project_id, volume_type_id=None,
                           volume_type_name=None, session=None):
                 self.sync_called.add(res_name)
+                self.events.append(('sync', res_name))
                 if res_name in self.usages:
                     if self.usages[res_name].in_use < 0:
                         return {res_name: 2}
@@ -1127,7 +1203,12 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
         def fake_get_session():
             return FakeSession()
 
-        def fake_get_quota_usages(context, session, project_id):
+        self.events = []
+
+        def fake_get_quota_usages(context, session, project_id,
+                                  resources=None, lock=True):
+            self.events.append(('get_quota_usages',
+                                sorted(resources or []), lock))
             return self.usages.copy()
 
         def fake_quota_usage_create(context, project_id, resource, in_use,
@@ -1476,3 +1557,91 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
                                        usage_id=self.usages['gigabytes'],
                                        project_id='test_project',
                                        delta=-2 * 1024), ])
+
+    def test_quota_reserve_locks_only_deltas(self):
+        self.init_usage('test_project', 'volumes', 3, 0, until_refresh=1)
+        self.init_usage('test_project', 'gigabytes', 3, 0)
+        context = FakeContext('test_project', 'test_class')
+        quotas = dict(volumes=5, gigabytes=10 * 1024, )
+        deltas = dict(volumes=1, )
+        sqa_api.quota_reserve(context, self.resources, quotas,
+                              deltas, self.expire, 5, 0)
+
+        # The refresh runs before the usage is locked.
+        self.assertEqual(self.events,
+                         [('get_quota_usages', ['volumes'], False),
+                          ('sync', 'volumes'),
+                          ('get_quota_usages', ['volumes'], True)])
+        self.compare_usage(self.usages, [dict(resource='volumes',
+                                              in_use=2,
+                                              reserved=1,
+                                              until_refresh=5),
+                                         dict(resource='gigabytes',
+                                              in_use=3,
+                                              reserved=0,
+                                              until_refresh=None), ])
+
+    def test_quota_reserve_saves_only_changed_usages(self):
+        self.init_usage('test_project', 'volumes', 3, 0)
+        self.init_usage('test_project', 'gigabytes', 3, 0)
+        context = FakeContext('test_project', 'test_class')
+        quotas = dict(volumes=5, gigabytes=10 * 1024, )
+        deltas = dict(volumes=1, gigabytes=-1, )
+        with mock.patch.object(FakeUsage, 'save') as mock_save:
+            sqa_api.quota_reserve(context, self.resources, quotas,
+                                  deltas, self.expire, 0, 0)
+        self.assertEqual(mock_save.call_count, 1)
+
+    def test_quota_reserve_syncs_under_lock_when_changed(self):
+        self.init_usage('test_project', 'volumes', 3, 0)
+        self.init_usage('test_project', 'gigabytes', 3, 0)
+        context = FakeContext('test_project', 'test_class')
+        quotas = dict(volumes=5, gigabytes=10 * 1024, )
+        deltas = dict(volumes=1, )
+
+        def fake_get_quota_usages(context, session, project_id,
+                                  resources=None, lock=True):
+            self.events.append(('get_quota_usages', lock))
+            if lock:
+                # Another request made the usage go negative.
+                self.usages['volumes'].in_use = -1
+            return self.usages.copy()
+
+        self.stubs.Set(sqa_api, '_get_quota_usages', fake_get_quota_usages)
+        sqa_api.quota_reserve(context, self.resources, quotas,
+                              deltas, self.expire, 0, 0)
+
+        self.assertEqual(self.events, [('get_quota_usages', False),
+                                       ('get_quota_usages', True),
+                                       ('sync', 'volumes')])
+        self.compare_usage(self.usages, [dict(resource='volumes',
+                                              in_use=2,
+                                              reserved=1), ])
+
+    def test_quota_reserve_resyncs_when_changed_after_sync(self):
+        self.init_usage('test_project', 'volumes', 3, 0, until_refresh=1)
+        self.init_usage('test_project', 'gigabytes', 3, 0)
+        context = FakeContext('test_project', 'test_class')
+        quotas = dict(volumes=5, gigabytes=10 * 1024, )
+        deltas = dict(volumes=1, )
+
+        def fake_get_quota_usages(context, session, project_id,
+                                  resources=None, lock=True):
+            self.events.append(('get_quota_usages', lock))
+            if lock:
+                # Another request reserved after the sync ran.
+                self.usages['volumes'].reserved = 1
+            return self.usages.copy()
+
+        self.stubs.Set(sqa_api, '_get_quota_usages', fake_get_quota_usages)
+        sqa_api.quota_reserve(context, self.resources, quotas,
+                              deltas, self.expire, 5, 0)
+
+        self.assertEqual(self.events, [('get_quota_usages', False),
+                                       ('sync', 'volumes'),
+                                       ('get_quota_usages', True),
+                                       ('sync', 'volumes')])
+        self.compare_usage(self.usages, [dict(resource='volumes',
+                                              in_use=2,
+                                              reserved=2,
+                                              until_refresh=5), ])
@@ -129,6 +129,27 @@ class TestUtil(test.TestCase):
         self.assertRaises(UnicodeEncodeError,
                           driver.ascii_str, 'foo' + unichr(300))
 
+    @mock.patch.object(driver, 'native_call_stats', driver.NativeCallStats())
+    def test_execute_native(self):
+        def flatten(*args, **kwargs):
+            return args, kwargs
+
+        self.assertEqual(((1, 2), {'x': 3}),
+                         driver.execute_native(flatten, 1, 2, x=3))
+        self.assertRaises(ValueError, driver.execute_native, int, 'x')
+
+        stats = driver.native_call_stats.get()
+        self.assertEqual(1, stats['flatten']['count'])
+        self.assertEqual(1, stats['int']['count'])
+
+    @mock.patch.object(driver, 'time')
+    def test_execute_native_warns_on_slow_calls(self, mock_time):
+        self.flags(rbd_slow_call_warning_seconds=10)
+        mock_time.time.side_effect = [0, 11]
+        with mock.patch.object(driver.LOG, 'warn') as mock_warn:
+            driver.execute_native(lambda: None)
+            self.assertTrue(mock_warn.called)
+
 
 class RBDTestCase(test.TestCase):
 
@@ -143,6 +164,7 @@ class RBDTestCase(test.TestCase):
         self.cfg.rbd_ceph_conf = None
         self.cfg.rbd_secret_uuid = None
         self.cfg.rbd_user = None
+        self.cfg.rbd_connection_pool_size = 4
         self.cfg.volume_dd_blocksize = '1M'
 
         mock_exec = mock.Mock()
@@ -724,6 +746,86 @@ class RBDTestCase(test.TestCase):
         self.mock_rados.Rados.shutdown.assert_called_once()
 
 
+class RADOSConnectionPoolTestCase(test.TestCase):
+    def setUp(self):
+        super(RADOSConnectionPoolTestCase, self).setUp()
+        self.rados = mock.Mock()
+        self.rados.Error = MockException
+        self.rados.Rados.side_effect = self._new_client
+        self.clients = []
+        self.pool = driver.RADOSConnectionPool(self.rados, 'user', 'conf', 1)
+
+    def _new_client(self, rados_id, conffile):
+        client = mock.Mock()
+        client.state = 'connected'
+        self.clients.append(client)
+        return client
+
+    def test_client_and_ioctx_are_reused(self):
+        client, ioctx = self.pool.get('rbd')
+        self.pool.put(client)
+        self.assertEqual((client, ioctx), self.pool.get('rbd'))
+
+        self.assertEqual(len(self.clients), 1)
+        client.connect.assert_called_once_with()
+        client.open_ioctx.assert_called_once_with('rbd')
+        self.assertFalse(client.shutdown.called)
+
+    def test_ioctx_per_pool(self):
+        client, _ioctx = self.pool.get('rbd')
+        self.pool.put(client)
+        self.pool.get('backups')
+
+        self.assertEqual(len(self.clients), 1)
+        self.assertEqual([mock.call('rbd'), mock.call('backups')],
+                         client.open_ioctx.call_args_list)
+
+    def test_idle_clients_are_bounded(self):
+        client1, ioctx1 = self.pool.get('rbd')
+        client2, _ioctx2 = self.pool.get('rbd')
+        self.pool.put(client1)
+        self.pool.put(client2)
+
+        self.assertFalse(client1.shutdown.called)
+        client2.shutdown.assert_called_once_with()
+        self.assertEqual((client1, ioctx1), self.pool.get('rbd'))
+
+    def test_failed_client_is_shut_down(self):
+        client, ioctx = self.pool.get('rbd')
+        self.pool.put(client, failed=True)
+
+        ioctx.close.assert_called_once_with()
+        client.shutdown.assert_called_once_with()
+        self.assertNotEqual(client, self.pool.get('rbd')[0])
+
+    def test_disconnected_client_is_replaced(self):
+        client, _ioctx = self.pool.get('rbd')
+        self.pool.put(client)
+        client.state = 'shutdown'
+
+        self.assertNotEqual(client, self.pool.get('rbd')[0])
+        client.shutdown.assert_called_once_with()
+        self.assertEqual(len(self.clients), 2)
+
+    def test_connect_error(self):
+        self.rados.Rados.side_effect = None
+        client = self.rados.Rados.return_value
+        client.connect.side_effect = MockException
+
+        self.assertRaises(MockException, self.pool.get, 'rbd')
+        client.shutdown.assert_called_once_with()
+
+    @mock.patch.dict(driver._connection_pools, clear=True)
+    def test_get_connection_pool(self):
+        pool = driver.get_connection_pool(self.rados, 'user', 'conf', 1)
+        self.assertIs(pool,
+                      driver.get_connection_pool(self.rados, 'user', 'conf',
+                                                 1))
+        self.assertIsNot(pool,
+                         driver.get_connection_pool(self.rados, 'other',
+                                                    'conf', 1))
+
+
 class RBDImageIOWrapperTestCase(test.TestCase):
     def setUp(self):
         super(RBDImageIOWrapperTestCase, self).setUp()
@@ -490,6 +490,12 @@ class GenericUtilsTestCase(test.TestCase):
         h2 = hashlib.sha1(data).hexdigest()
         self.assertEqual(h1, h2)
 
+    def test_is_zero_data(self):
+        self.assertTrue(utils.is_zero_data(''))
+        self.assertTrue(utils.is_zero_data('\0' * 4096))
+        self.assertFalse(utils.is_zero_data('\0' * 4095 + 'a'))
+        self.assertFalse(utils.is_zero_data('a' + '\0' * 4095))
+
     def test_check_ssh_injection(self):
         cmd_list = ['ssh', '-D', 'my_name@name_of_remote_computer']
         self.assertIsNone(utils.check_ssh_injection(cmd_list))
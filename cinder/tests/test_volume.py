@@ -154,6 +154,44 @@ class VolumeTestCase(BaseVolumeTestCase):
         self.assertEqual(volume['status'], "error")
         self.volume.delete_volume(self.context, volume_id)
 
+    def test_init_host_recovers_volumes_concurrently(self):
+        self.flags(volume_service_inithost_workers=3)
+        for i in xrange(6):
+            tests_utils.create_volume(self.context, status='in-use',
+                                      size=1, host=CONF.host)
+        running = {'now': 0, 'max': 0}
+
+        def fake_ensure_export(context, volume):
+            running['now'] += 1
+            running['max'] = max(running['max'], running['now'])
+            eventlet.sleep(0)
+            running['now'] -= 1
+
+        self.stubs.Set(self.volume.driver, 'ensure_export',
+                       fake_ensure_export)
+        self.volume.init_host()
+        self.assertEqual(3, running['max'])
+        self.assertEqual(6, self.volume.stats['allocated_capacity_gb'])
+        self.assertTrue(self.volume.driver.initialized)
+
+    def test_init_host_offload(self):
+        self.flags(volume_service_inithost_offload=True)
+        with mock.patch.object(self.volume, '_add_to_threadpool') as \
+                mock_add:
+            self.volume.init_host()
+            mock_add.assert_called_once_with(self.volume._recover_volumes,
+                                             mock.ANY, [])
+        self.assertTrue(self.volume.driver.initialized)
+
+    def test_init_host_download_cleanup_fails(self):
+        tests_utils.create_volume(self.context, status='downloading',
+                                  size=0, host=CONF.host)
+        self.volume.driver._initialized = False
+        with mock.patch.object(self.volume.driver, 'clear_download',
+                               side_effect=exception.CinderException):
+            self.volume.init_host()
+        self.assertFalse(self.volume.driver.initialized)
+
     @mock.patch.object(QUOTAS, 'reserve')
     @mock.patch.object(QUOTAS, 'commit')
     @mock.patch.object(QUOTAS, 'rollback')
@@ -2864,7 +2902,7 @@ class LVMISCSIVolumeDriverTestCase(DriverTestCase):
 
         self.stubs.Set(volutils, 'copy_volume',
                        lambda x, y, z, sync=False, execute='foo',
-                       blocksize=mox.IgnoreArg(): None)
+                       blocksize=mox.IgnoreArg(), sparse=False: None)
 
         self.stubs.Set(volutils, 'get_all_volume_groups',
                        get_all_volume_groups)
@@ -3017,6 +3055,91 @@ class LVMVolumeDriverTestCase(DriverTestCase):
 
         lvm_driver._delete_volume(fake_snapshot, is_snapshot=True)
 
+    def _deferred_clear_driver(self, lvs):
+        configuration = conf.Configuration(fake_opt, 'fake_group')
+        configuration.volume_clear = 'zero'
+        configuration.volume_clear_size = 0
+        configuration.lvm_deferred_clear = True
+        vg = mock.Mock()
+        vg.get_volumes.return_value = lvs
+        lvm_driver = lvm.LVMVolumeDriver(configuration=configuration,
+                                         vg_obj=vg)
+        with mock.patch.object(lvm.greenthread, 'spawn_n') as mock_spawn:
+            lvm_driver._start_deferred_clear()
+            mock_spawn.assert_called_once_with(
+                lvm_driver._clear_pending_volumes)
+        return lvm_driver
+
+    def test_delete_volume_deferred_clear(self):
+        lvm_driver = self._deferred_clear_driver([])
+        volume = dict(self.FAKE_VOLUME, size=2)
+
+        with mock.patch.object(volutils, 'clear_volume') as mock_clear:
+            lvm_driver._delete_volume(volume)
+            self.assertFalse(mock_clear.called)
+
+        lvm_driver.vg.rename_volume.assert_called_once_with(
+            'test1', 'pending-clear-test1')
+        self.assertFalse(lvm_driver.vg.delete.called)
+        self.assertEqual({'pending-clear-test1': 2},
+                         lvm_driver._pending_clear)
+
+    def test_deferred_clear_resumes_pending_volumes(self):
+        lvm_driver = self._deferred_clear_driver(
+            [{'name': 'volume-1', 'size': '1.00'},
+             {'name': 'pending-clear-volume-2', 'size': '2.00'}])
+        self.assertEqual({'pending-clear-volume-2': 2.0},
+                         lvm_driver._pending_clear)
+
+    def test_clear_pending_volumes(self):
+        lvm_driver = self._deferred_clear_driver(
+            [{'name': 'pending-clear-volume-2', 'size': '2.00'}])
+        lvm_driver.configuration.lvm_deferred_clear_bps_limit = 1024
+
+        # The worker runs until the queue is empty and then blocks.
+        with mock.patch.object(lvm_driver._clear_queue, 'get',
+                               side_effect=[lvm_driver._clear_queue.get(),
+                                            StopIteration]):
+            with mock.patch.object(volutils, 'clear_volume') as mock_clear:
+                self.assertRaises(StopIteration,
+                                  lvm_driver._clear_pending_volumes)
+
+        mock_clear.assert_called_once_with(
+            2048, '/dev/mapper/cinder--volumes-pending--clear--volume--2',
+            volume_clear='zero', volume_clear_size=0,
+            volume_clear_ionice=None, bps_limit=1024)
+        lvm_driver.vg.delete.assert_called_once_with(
+            'pending-clear-volume-2')
+        self.assertEqual({}, lvm_driver._pending_clear)
+
+    def test_clear_pending_volumes_ionice(self):
+        lvm_driver = self._deferred_clear_driver(
+            [{'name': 'pending-clear-volume-2', 'size': '2.00'}])
+        lvm_driver.configuration.volume_clear_ionice = '-c3'
+
+        with mock.patch.object(lvm_driver._clear_queue, 'get',
+                               side_effect=[lvm_driver._clear_queue.get(),
+                                            StopIteration]):
+            with mock.patch.object(volutils, 'clear_volume') as mock_clear:
+                self.assertRaises(StopIteration,
+                                  lvm_driver._clear_pending_volumes)
+
+        mock_clear.assert_called_once_with(
+            2048, '/dev/mapper/cinder--volumes-pending--clear--volume--2',
+            volume_clear='zero', volume_clear_size=0,
+            volume_clear_ionice='-c3', bps_limit=None)
+
+    def test_deferred_clear_bps_limit_requires_native_copy(self):
+        self.flags(volume_copy_method='dd')
+        configuration = conf.Configuration(fake_opt, 'fake_group')
+        configuration.volume_clear = 'zero'
+        configuration.lvm_deferred_clear = True
+        configuration.lvm_deferred_clear_bps_limit = 1024
+        lvm_driver = lvm.LVMVolumeDriver(configuration=configuration,
+                                         vg_obj=mock.Mock())
+        self.assertRaises(exception.InvalidConfigurationValue,
+                          lvm_driver._start_deferred_clear)
+
 
 class ISCSITestCase(DriverTestCase):
     """Test Case for ISCSIDriver"""
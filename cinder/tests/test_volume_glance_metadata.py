@@ -101,11 +101,57 @@ class VolumeGlanceMetadataTestCase(test.TestCase):
         self._assert_metadata_equals('2', 'key2', 'value2', metadata[1])
         self._assert_metadata_equals('2', 'key22', 'value22', metadata[2])
 
+    def test_vols_get_glance_metadata_by_volume_ids(self):
+        ctxt = context.get_admin_context()
+        db.volume_create(ctxt, {'id': '1'})
+        db.volume_create(ctxt, {'id': '2'})
+        db.volume_create(ctxt, {'id': '3'})
+        db.volume_glance_metadata_create(ctxt, '1', 'key1', 'value1')
+        db.volume_glance_metadata_create(ctxt, '2', 'key2', 'value2')
+        db.volume_glance_metadata_create(ctxt, '3', 'key3', 'value3')
+
+        metadata = db.volume_glance_metadata_get_all_by_volume_ids(
+            ctxt, ['2', '3'])
+        self.assertEqual(len(metadata), 2)
+        self._assert_metadata_equals('2', 'key2', 'value2', metadata[0])
+        self._assert_metadata_equals('3', 'key3', 'value3', metadata[1])
+        self.assertEqual(
+            db.volume_glance_metadata_get_all_by_volume_ids(ctxt, []), [])
+
+    def test_vols_get_glance_metadata_by_volume_ids_for_project(self):
+        ctxt = context.get_admin_context()
+        db.volume_create(ctxt, {'id': '1', 'project_id': 'project1'})
+        db.volume_create(ctxt, {'id': '2', 'project_id': 'project2'})
+        db.volume_glance_metadata_create(ctxt, '1', 'key1', 'value1')
+        db.volume_glance_metadata_create(ctxt, '2', 'key2', 'value2')
+
+        user_ctxt = context.RequestContext('user1', 'project1')
+        metadata = db.volume_glance_metadata_get_all_by_volume_ids(
+            user_ctxt, ['1', '2'])
+        self.assertEqual(len(metadata), 1)
+        self._assert_metadata_equals('1', 'key1', 'value1', metadata[0])
+
     def _assert_metadata_equals(self, volume_id, key, value, observed):
         self.assertEqual(volume_id, observed.volume_id)
         self.assertEqual(key, observed.key)
         self.assertEqual(value, observed.value)
 
+    def test_vol_glance_metadata_bulk_create(self):
+        vol = db.volume_create(self.ctxt, {})
+        db.volume_glance_metadata_create(self.ctxt, vol['id'], 'm1', 'v1')
+        db.volume_glance_metadata_bulk_create(self.ctxt, vol['id'],
+                                              {'m1': 'other', 'm2': 'v2',
+                                               'm3': 3})
+
+        metadata = db.volume_glance_metadata_get(self.ctxt, vol['id'])
+        metadata = dict([(m['key'], m['value']) for m in metadata])
+        self.assertEqual(metadata, {'m1': 'v1', 'm2': 'v2', 'm3': '3'})
+
+    def test_vol_glance_metadata_bulk_create_bad_vol_id(self):
+        self.assertRaises(exception.VolumeNotFound,
+                          db.volume_glance_metadata_bulk_create,
+                          self.ctxt, 1, {'key1': 'value1'})
+
     def test_vol_delete_glance_metadata(self):
         ctxt = context.get_admin_context()
         db.volume_create(ctxt, {'id': 1})
@@ -160,6 +206,21 @@ class VolumeGlanceMetadataTestCase(test.TestCase):
         metadata = dict([(m['key'], m['value']) for m in metadata])
         self.assertEqual(metadata, {'m1': 'v1'})
 
+    def test_volume_glance_metadata_copy_all_keys(self):
+        vol1 = db.volume_create(self.ctxt, {})
+        vol2 = db.volume_create(self.ctxt, {})
+        expected = dict(('key%d' % i, 'value%d' % i) for i in range(30))
+        db.volume_glance_metadata_bulk_create(self.ctxt, vol1['id'], expected)
+        snapshot = db.snapshot_create(self.ctxt, {'volume_id': vol1['id']})
+        db.volume_glance_metadata_copy_to_snapshot(self.ctxt, snapshot['id'],
+                                                   vol1['id'])
+        db.volume_glance_metadata_copy_to_volume(self.ctxt, vol2['id'],
+                                                 snapshot['id'])
+
+        metadata = db.volume_glance_metadata_get(self.ctxt, vol2['id'])
+        metadata = dict([(m['key'], m['value']) for m in metadata])
+        self.assertEqual(metadata, expected)
+
     def test_volume_snapshot_glance_metadata_get_nonexistent(self):
         vol = db.volume_create(self.ctxt, {})
         snapshot = db.snapshot_create(self.ctxt, {'volume_id': vol['id']})
@@ -17,6 +17,7 @@
 
 import os
 import re
+import tempfile
 
 from oslo.config import cfg
 
@@ -27,6 +28,7 @@ from cinder.openstack.common import importutils
 from cinder.openstack.common import log as logging
 from cinder import test
 from cinder.tests import fake_notifier
+from cinder import units
 from cinder import utils
 from cinder.volume import utils as volume_utils
 
@@ -115,7 +117,8 @@ class ClearVolumeTestCase(test.TestCase):
         self.mox.StubOutWithMock(volume_utils, 'copy_volume')
         volume_utils.copy_volume("/dev/zero", "volume_path", 1024,
                                  CONF.volume_dd_blocksize, sync=True,
-                                 ionice=None, execute=utils.execute)
+                                 ionice=None, execute=utils.execute,
+                                 bps_limit=None)
         self.mox.ReplayAll()
         volume_utils.clear_volume(1024, "volume_path")
 
@@ -126,7 +129,8 @@ class ClearVolumeTestCase(test.TestCase):
         self.mox.StubOutWithMock(volume_utils, 'copy_volume')
         volume_utils.copy_volume("/dev/zero", "volume_path", 1,
                                  CONF.volume_dd_blocksize, sync=True,
-                                 ionice=None, execute=utils.execute)
+                                 ionice=None, execute=utils.execute,
+                                 bps_limit=None)
         self.mox.ReplayAll()
         volume_utils.clear_volume(1024, "volume_path")
 
@@ -139,7 +143,7 @@ class ClearVolumeTestCase(test.TestCase):
         volume_utils.copy_volume("/dev/zero", "volume_path", 1024,
                                  CONF.volume_dd_blocksize, sync=True,
                                  ionice=CONF.volume_clear_ionice,
-                                 execute=utils.execute)
+                                 execute=utils.execute, bps_limit=None)
         self.mox.ReplayAll()
         volume_utils.clear_volume(1024, "volume_path")
 
@@ -151,7 +155,7 @@ class ClearVolumeTestCase(test.TestCase):
         volume_utils.copy_volume("/dev/zero", "volume_path", 1,
                                  CONF.volume_dd_blocksize, sync=True,
                                  ionice=CONF.volume_clear_ionice,
-                                 execute=utils.execute)
+                                 execute=utils.execute, bps_limit=None)
         self.mox.ReplayAll()
         volume_utils.clear_volume(1024, "volume_path")
 
@@ -200,3 +204,73 @@ class ClearVolumeTestCase(test.TestCase):
 
         self.stubs.Set(volume_utils, 'copy_volume', fake_copy_volume)
         volume_utils.clear_volume(123, vol_path)
+
+
+class CopyVolumeTestCase(test.TestCase):
+
+    def setUp(self):
+        super(CopyVolumeTestCase, self).setUp()
+        self.src = tempfile.NamedTemporaryFile()
+        self.dest = tempfile.NamedTemporaryFile()
+        self.data = (os.urandom(units.MiB) + '\0' * units.MiB +
+                     os.urandom(units.MiB))
+        self.src.write(self.data)
+        self.src.flush()
+
+    def tearDown(self):
+        self.src.close()
+        self.dest.close()
+        super(CopyVolumeTestCase, self).tearDown()
+
+    def test_copy_volume_dd_sparse(self):
+        cmds = []
+
+        def fake_execute(*cmd, **kwargs):
+            cmds.append(cmd)
+
+        volume_utils.copy_volume('/dev/src', '/dev/dest', 3, '1M',
+                                 execute=fake_execute, sparse=True)
+        self.assertEqual(cmds[-1],
+                         ('dd', 'if=/dev/src', 'of=/dev/dest', 'count=3',
+                          'bs=1M', 'iflag=direct', 'oflag=direct',
+                          'conv=sparse'))
+
+    def test_copy_volume_native(self):
+        self.flags(volume_copy_method='native')
+        volume_utils.copy_volume(self.src.name, self.dest.name, 3, '1M')
+        self.assertEqual(open(self.dest.name).read(), self.data)
+
+    def test_copy_volume_native_overwrites_old_data_with_zeros(self):
+        self.flags(volume_copy_method='native')
+        self.dest.write('a' * 3 * units.MiB)
+        self.dest.flush()
+        volume_utils.copy_volume(self.src.name, self.dest.name, 3, '1M',
+                                 sync=True)
+        self.assertEqual(open(self.dest.name).read(), self.data)
+
+    def test_copy_volume_native_sparse_skips_zeros(self):
+        self.flags(volume_copy_method='native')
+        self.mox.StubOutWithMock(utils, 'punch_hole')
+        self.mox.ReplayAll()
+        volume_utils.copy_volume(self.src.name, self.dest.name, 3, '1M',
+                                 sparse=True)
+        self.assertEqual(open(self.dest.name).read(), self.data)
+
+    def test_copy_volume_native_does_not_chown_dev_zero(self):
+        self.flags(volume_copy_method='native')
+        chowned = []
+        real_temporary_chown = utils.temporary_chown
+
+        def fake_temporary_chown(path, owner_uid=None):
+            chowned.append(path)
+            return real_temporary_chown(path, owner_uid)
+
+        self.stubs.Set(utils, 'temporary_chown', fake_temporary_chown)
+        volume_utils.copy_volume('/dev/zero', self.dest.name, 1, '1M',
+                                 sparse=True)
+        self.assertEqual(chowned, [self.dest.name])
+
+    def test_copy_volume_native_stops_at_end_of_source(self):
+        self.flags(volume_copy_method='native')
+        volume_utils.copy_volume(self.src.name, self.dest.name, 10, '1M')
+        self.assertEqual(open(self.dest.name).read(), self.data)
@@ -19,7 +19,10 @@
 
 
 import contextlib
+import ctypes
+import ctypes.util
 import datetime
+import errno
 import hashlib
 import inspect
 import os
@@ -55,6 +58,10 @@ LOG = logging.getLogger(__name__)
 ISO_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
 PERFECT_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
 
+# fallocate(2) flags, see linux/falloc.h
+FALLOC_FL_KEEP_SIZE = 0x01
+FALLOC_FL_PUNCH_HOLE = 0x02
+
 synchronized = lockutils.synchronized_with_prefix('cinder-')
 
 
@@ -650,6 +657,39 @@ def hash_file(file_like_object):
     return checksum.hexdigest()
 
 
+def is_zero_data(data):
+    """Check whether a buffer is empty or holds only zero bytes."""
+    # Most chunks holding data are rejected by their first bytes.
+    head = data[:512]
+    if head.count('\0') != len(head):
+        return False
+    return data.count('\0') == len(data)
+
+
+_libc = None
+
+
+def punch_hole(fileno, offset, length):
+    """Deallocate a range of an open file, leaving it reading as zeros.
+
+    :returns: False if the file or the kernel does not support punching
+              holes, True otherwise.
+    """
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    ret = _libc.fallocate(fileno,
+                          FALLOC_FL_PUNCH_HOLE | FALLOC_FL_KEEP_SIZE,
+                          ctypes.c_longlong(offset),
+                          ctypes.c_longlong(length))
+    if ret == 0:
+        return True
+    err = ctypes.get_errno()
+    if err in (errno.EOPNOTSUPP, errno.ENOSYS, errno.ENODEV, errno.EINVAL):
+        return False
+    raise OSError(err, os.strerror(err))
+
+
 def service_is_up(service):
     """Check whether a service is up based on last heartbeat."""
     last_heartbeat = service['updated_at'] or service['created_at']
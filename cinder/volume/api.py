@@ -280,16 +280,7 @@ class API(base.Base):
             msg = _('limit param must be an integer')
             raise exception.InvalidInput(reason=msg)
 
-        if (context.is_admin and 'all_tenants' in filters):
-            # Need to remove all_tenants to pass the filtering below.
-            del filters['all_tenants']
-            volumes = self.db.volume_get_all(context, marker, limit, sort_key,
-                                             sort_dir)
-        else:
-            volumes = self.db.volume_get_all_by_project(context,
-                                                        context.project_id,
-                                                        marker, limit,
-                                                        sort_key, sort_dir)
+        filters = filters.copy()
 
         # Non-admin shouldn't see temporary target of a volume migration
         if not context.is_admin:
@@ -298,42 +289,17 @@ class API(base.Base):
         if filters:
             LOG.debug(_("Searching by: %s") % filters)
 
-            def _check_metadata_match(volume, searchdict):
-                volume_metadata = {}
-                for i in volume.get('volume_metadata'):
-                    volume_metadata[i['key']] = i['value']
-
-                for k, v in searchdict.iteritems():
-                    if (k not in volume_metadata.keys() or
-                            volume_metadata[k] != v):
-                        return False
-                return True
-
-            def _check_migration_target(volume, searchdict):
-                status = volume['migration_status']
-                if status and status.startswith('target:'):
-                    return False
-                return True
-
-            # search_option to filter_name mapping.
-            filter_mapping = {'metadata': _check_metadata_match,
-                              'no_migration_targets': _check_migration_target}
-
-            result = []
-            not_found = object()
-            for volume in volumes:
-                # go over all filters in the list
-                for opt, values in filters.iteritems():
-                    try:
-                        filter_func = filter_mapping[opt]
-                    except KeyError:
-                        def filter_func(volume, value):
-                            return volume.get(opt, not_found) == value
-                    if not filter_func(volume, values):
-                        break  # volume doesn't match this filter
-                else:  # did not break out loop
-                    result.append(volume)  # volume matches all filters
-            volumes = result
+        if (context.is_admin and 'all_tenants' in filters):
+            # all_tenants is not a volume attribute to filter on.
+            del filters['all_tenants']
+            volumes = self.db.volume_get_all(context, marker, limit, sort_key,
+                                             sort_dir, filters=filters)
+        else:
+            volumes = self.db.volume_get_all_by_project(context,
+                                                        context.project_id,
+                                                        marker, limit,
+                                                        sort_key, sort_dir,
+                                                        filters=filters)
 
         return volumes
 
@@ -347,31 +313,26 @@ class API(base.Base):
         rv = self.db.volume_get(context, volume_id)
         return dict(rv.iteritems())
 
-    def get_all_snapshots(self, context, search_opts=None):
+    def get_all_snapshots(self, context, search_opts=None, marker=None,
+                          limit=None, sort_key='created_at', sort_dir='asc'):
         check_policy(context, 'get_all_snapshots')
 
-        search_opts = search_opts or {}
+        search_opts = dict(search_opts or {})
+
+        if search_opts:
+            LOG.debug(_("Searching by: %s") % search_opts)
 
         if (context.is_admin and 'all_tenants' in search_opts):
-            # Need to remove all_tenants to pass the filtering below.
+            # all_tenants is not a snapshot attribute to filter on.
             del search_opts['all_tenants']
-            snapshots = self.db.snapshot_get_all(context)
+            snapshots = self.db.snapshot_get_all(context, marker, limit,
+                                                 sort_key, sort_dir,
+                                                 filters=search_opts)
         else:
             snapshots = self.db.snapshot_get_all_by_project(
-                context, context.project_id)
+                context, context.project_id, marker, limit, sort_key,
+                sort_dir, filters=search_opts)
 
-        if search_opts:
-            LOG.debug(_("Searching by: %s") % search_opts)
-
-            results = []
-            not_found = object()
-            for snapshot in snapshots:
-                for opt, value in search_opts.iteritems():
-                    if snapshot.get(opt, not_found) != value:
-                        break
-                else:
-                    results.append(snapshot)
-            snapshots = results
         return snapshots
 
     @wrap_check_policy
@@ -712,9 +673,18 @@ class API(base.Base):
     def get_snapshot_metadata_value(self, snapshot, key):
         pass
 
-    def get_volumes_image_metadata(self, context):
+    def get_volumes_image_metadata(self, context, volume_ids=None):
+        """Return the image metadata of volumes, keyed by volume id.
+
+        If volume_ids is given only those volumes are looked up, otherwise
+        the metadata of every volume visible to the context is returned.
+        """
         check_policy(context, 'get_volumes_image_metadata')
-        db_data = self.db.volume_glance_metadata_get_all(context)
+        if volume_ids is None:
+            db_data = self.db.volume_glance_metadata_get_all(context)
+        else:
+            db_data = self.db.volume_glance_metadata_get_all_by_volume_ids(
+                context, volume_ids)
         results = collections.defaultdict(dict)
         for meta_entry in db_data:
             results[meta_entry['volume_id']].update({meta_entry['key']:
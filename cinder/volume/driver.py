@@ -103,6 +103,16 @@ volume_opts = [
                default='1M',
                help='The default block size used when copying/clearing '
                     'volumes'),
+    cfg.StrOpt('volume_copy_method',
+               default='dd',
+               help='How volumes are copied and cleared: "dd" runs dd as '
+                    'root, "native" copies in the volume service with '
+                    'O_DIRECT and leaves holes for zero regions on '
+                    'targets that support it'),
+    cfg.IntOpt('volume_copy_bps_limit',
+               default=0,
+               help='The upper limit of bandwidth in bytes per second of '
+                    'a native volume copy. 0 => unlimited'),
 ]
 
 # for backward compatibility
@@ -51,6 +51,12 @@ volume_opts = [
     cfg.StrOpt('glusterfs_mount_point_base',
                default='$state_path/mnt',
                help='Base dir containing mount points for gluster shares.'),
+    cfg.IntOpt('glusterfs_share_capacity_max_age',
+               default=600,
+               help=('Seconds the space counted on a gluster share is used '
+                     'to place new volumes before the share is counted '
+                     'again. Shares are also counted on every volume stats '
+                     'update. 0 counts the shares for every new volume.')),
 ]
 
 CONF = cfg.CONF
@@ -204,6 +210,9 @@ class GlusterfsDriver(nfs.RemoteFsDriver):
         finally:
             self._delete_snapshot(temp_snapshot)
 
+        self._account_share_capacity(src_vref['provider_location'],
+                                     src_vref['size'])
+
         return {'provider_location': src_vref['provider_location']}
 
     @utils.synchronized('glusterfs', external=False)
@@ -217,6 +226,8 @@ class GlusterfsDriver(nfs.RemoteFsDriver):
         LOG.info(_('casted to %s') % volume['provider_location'])
 
         self._do_create_volume(volume)
+        self._account_share_capacity(volume['provider_location'],
+                                     volume['size'])
 
         return {'provider_location': volume['provider_location']}
 
@@ -236,6 +247,8 @@ class GlusterfsDriver(nfs.RemoteFsDriver):
         volume['provider_location'] = self._find_share(volume['size'])
 
         self._do_create_volume(volume)
+        self._account_share_capacity(volume['provider_location'],
+                                     volume['size'])
 
         self._copy_volume_from_snapshot(snapshot,
                                         volume,
@@ -296,6 +309,8 @@ class GlusterfsDriver(nfs.RemoteFsDriver):
         mounted_path = self.local_path(volume)
 
         self._execute('rm', '-f', mounted_path, run_as_root=True)
+        self._account_share_capacity(volume['provider_location'],
+                                     -volume['size'])
 
     @utils.synchronized('glusterfs', external=False)
     def create_snapshot(self, snapshot):
@@ -995,6 +1010,8 @@ class GlusterfsDriver(nfs.RemoteFsDriver):
 
         # qemu-img can resize both raw and qcow2 files
         image_utils.resize_image(volume_path, size_gb)
+        self._account_share_capacity(volume['provider_location'],
+                                     size_gb - volume['size'])
 
     def _do_create_volume(self, volume):
         """Create a volume on given glusterfs_share.
@@ -1082,7 +1099,8 @@ class GlusterfsDriver(nfs.RemoteFsDriver):
 
     def _find_share(self, volume_size_for):
         """Choose GlusterFS share among available ones for given volume size.
-        Current implementation looks for greatest capacity.
+        Current implementation looks for greatest capacity, as last counted
+        by _get_share_capacity.
         :param volume_size_for: int size in GB
         """
 
@@ -1093,7 +1111,7 @@ class GlusterfsDriver(nfs.RemoteFsDriver):
         greatest_share = None
 
         for glusterfs_share in self._mounted_shares:
-            capacity = self._get_available_capacity(glusterfs_share)[0]
+            capacity = self._get_share_capacity(glusterfs_share)[1]
             if capacity > greatest_size:
                 greatest_share = glusterfs_share
                 greatest_size = capacity
@@ -22,6 +22,8 @@ import math
 import os
 import socket
 
+from eventlet import greenthread
+from eventlet import queue
 from oslo.config import cfg
 
 from cinder.brick import exception as brick_exception
@@ -49,11 +51,27 @@ volume_opts = [
     cfg.StrOpt('lvm_type',
                default='default',
                help='Type of LVM volumes to deploy; (default or thin)'),
+    cfg.BoolOpt('lvm_deferred_clear',
+                default=False,
+                help='Wipe deleted volumes in the background instead of '
+                     'before the delete completes. Volumes waiting to be '
+                     'wiped are kept as renamed LVs, so their space is '
+                     'freed once they are wiped, and they are wiped after '
+                     'a restart of the service'),
+    cfg.IntOpt('lvm_deferred_clear_bps_limit',
+               default=0,
+               help='The maximum bytes per second written by background '
+                    'wipes. Requires the native volume_copy_method, '
+                    'volume_clear=zero and no volume_clear_ionice. 0 => '
+                    'volume_copy_bps_limit applies'),
 ]
 
 CONF = cfg.CONF
 CONF.register_opts(volume_opts)
 
+# Prefix of the LVs of deleted volumes waiting for a background wipe.
+PENDING_CLEAR_PREFIX = 'pending-clear-'
+
 
 class LVMVolumeDriver(driver.VolumeDriver):
     """Executes commands relating to Volumes."""
@@ -68,6 +86,9 @@ class LVMVolumeDriver(driver.VolumeDriver):
         self.backend_name =\
             self.configuration.safe_get('volume_backend_name') or 'LVM'
         self.protocol = 'local'
+        # LV name -> size in GiB of the LVs waiting for a background wipe
+        self._pending_clear = {}
+        self._clear_queue = None
 
     def set_execute(self, execute):
         self._execute = execute
@@ -113,6 +134,80 @@ class LVMVolumeDriver(driver.VolumeDriver):
                     raise exception.VolumeBackendAPIException(
                         data=exception_message)
 
+        if self._deferred_clear_enabled() and self._clear_queue is None:
+            self._start_deferred_clear()
+
+    def _deferred_clear_enabled(self):
+        return (self.configuration.lvm_deferred_clear and
+                self.configuration.volume_clear != 'none' and
+                self.configuration.lvm_type != 'thin')
+
+    def _start_deferred_clear(self):
+        """Start the background wipe of deleted volumes.
+
+        Volumes left waiting for a wipe by a previous run are queued first.
+        """
+        # Only the native copy can be rate limited, volume_clear_ionice
+        # and shred run a child process instead.
+        if (self.configuration.lvm_deferred_clear_bps_limit and
+                (CONF.volume_copy_method != 'native' or
+                 self.configuration.volume_clear != 'zero' or
+                 self.configuration.volume_clear_ionice)):
+            LOG.error(_('lvm_deferred_clear_bps_limit requires the native '
+                        'volume_copy_method, volume_clear=zero and no '
+                        'volume_clear_ionice'))
+            raise exception.InvalidConfigurationValue(
+                option='lvm_deferred_clear_bps_limit',
+                value=self.configuration.lvm_deferred_clear_bps_limit)
+
+        self._clear_queue = queue.LightQueue()
+        for lv in self.vg.get_volumes():
+            if lv['name'].startswith(PENDING_CLEAR_PREFIX):
+                self._queue_clear(lv['name'], float(lv['size']))
+        greenthread.spawn_n(self._clear_pending_volumes)
+
+    def _queue_clear(self, name, size_in_g):
+        self._pending_clear[name] = size_in_g
+        self._clear_queue.put(name)
+
+    def _clear_pending_volumes(self):
+        """Wipe and remove the LVs of deleted volumes, one at a time."""
+        while True:
+            name = self._clear_queue.get()
+            size_in_g = self._pending_clear[name]
+            try:
+                volutils.clear_volume(
+                    int(size_in_g * units.KiB),
+                    self.local_path({'name': name}),
+                    volume_clear=self.configuration.volume_clear,
+                    volume_clear_size=self.configuration.volume_clear_size,
+                    volume_clear_ionice=(
+                        self.configuration.volume_clear_ionice),
+                    bps_limit=(self.configuration.lvm_deferred_clear_bps_limit
+                               or None))
+                self.vg.delete(name)
+            except Exception:
+                LOG.exception(_('Failed to wipe %s, it will be wiped again '
+                                'when the volume service restarts'), name)
+            else:
+                LOG.info(_('Wiped and removed %s'), name)
+            del self._pending_clear[name]
+
+    def _defer_clear(self, volume):
+        """Rename the LV of a deleted volume and queue it for a wipe."""
+        size_in_g = volume.get('size', volume.get('volume_size', None))
+        if size_in_g is None:
+            msg = (_("Size for volume: %s not found, "
+                     "cannot secure delete.") % volume['id'])
+            LOG.error(msg)
+            raise exception.InvalidParameterValue(msg)
+
+        pending_name = PENDING_CLEAR_PREFIX + volume['name']
+        self.vg.rename_volume(volume['name'], pending_name)
+        self._queue_clear(pending_name, size_in_g)
+        LOG.info(_('Volume %s will be wiped in the background'),
+                 volume['name'])
+
     def _sizestr(self, size_in_g):
         if int(size_in_g) == 0:
             return '100m'
@@ -123,6 +218,12 @@ class LVMVolumeDriver(driver.VolumeDriver):
 
     def _delete_volume(self, volume, is_snapshot=False):
         """Deletes a logical volume."""
+        # Snapshots are still wiped inline, as their origin cannot be
+        # deleted while they exist.
+        if self._clear_queue is not None and not is_snapshot:
+            self._defer_clear(volume)
+            return
+
         if self.configuration.volume_clear != 'none' and \
                 self.configuration.lvm_type != 'thin':
             self._clear_volume(volume, is_snapshot)
@@ -134,7 +235,6 @@ class LVMVolumeDriver(driver.VolumeDriver):
 
     def _clear_volume(self, volume, is_snapshot=False):
         # zero out old volumes to prevent data leaking between users
-        # TODO(ja): reclaiming space should be done lazy and low priority
         if is_snapshot:
             # if the volume to be cleared is a snapshot of another volume
             # we need to clear out the volume using the -cow instead of the
@@ -212,7 +312,8 @@ class LVMVolumeDriver(driver.VolumeDriver):
                              self.local_path(volume),
                              snapshot['volume_size'] * units.KiB,
                              self.configuration.volume_dd_blocksize,
-                             execute=self._execute)
+                             execute=self._execute,
+                             sparse=self.configuration.lvm_type == 'thin')
 
     def delete_volume(self, volume):
         """Deletes a logical volume."""
@@ -306,7 +407,8 @@ class LVMVolumeDriver(driver.VolumeDriver):
                 self.local_path(volume),
                 src_vref['size'] * units.KiB,
                 self.configuration.volume_dd_blocksize,
-                execute=self._execute)
+                execute=self._execute,
+                sparse=self.configuration.lvm_type == 'thin')
         finally:
             self.delete_snapshot(temp_snapshot)
 
@@ -372,6 +474,8 @@ class LVMVolumeDriver(driver.VolumeDriver):
             data['free_capacity_gb'] = self.vg.vg_free_space
         data['reserved_percentage'] = self.configuration.reserved_percentage
         data['QoS_support'] = False
+        if self._clear_queue is not None:
+            data['pending_clear_gb'] = sum(self._pending_clear.values())
         data['location_info'] =\
             ('LVMVolumeDriver:%(hostname)s:%(vg)s'
              ':%(lvm_type)s:%(lvm_mirrors)s' %
@@ -587,7 +691,8 @@ class LVMISCSIDriver(LVMVolumeDriver, driver.ISCSIDriver):
                              self.local_path(volume, vg=dest_vg),
                              volume['size'],
                              self.configuration.volume_dd_blocksize,
-                             execute=self._execute)
+                             execute=self._execute,
+                             sparse=lvm_type == 'thin')
         self._delete_volume(volume)
         model_update = self._create_export(ctxt, volume, vg=dest_vg)
 
@@ -76,7 +76,12 @@ NEXENTA_NFS_OPTIONS = [
     cfg.BoolOpt('nexenta_nms_cache_volroot',
                 default=True,
                 help=('If set True cache NexentaStor appliance volroot option '
-                      'value.'))
+                      'value.')),
+    cfg.IntOpt('nexenta_share_capacity_max_age',
+               default=600,
+               help=('Seconds the space counted on a share is used to place '
+                     'new volumes before the share is counted again. 0 '
+                     'counts the shares for every new volume.')),
 ]
 
 NEXENTA_VOLUME_OPTIONS = [
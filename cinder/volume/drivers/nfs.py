@@ -24,6 +24,7 @@ from cinder import exception
 from cinder.image import image_utils
 from cinder.openstack.common import log as logging
 from cinder.openstack.common import processutils as putils
+from cinder.openstack.common import timeutils
 from cinder import units
 from cinder import utils
 from cinder.volume import driver
@@ -58,6 +59,14 @@ volume_opts = [
                default=None,
                help=('Mount options passed to the nfs client. See section '
                      'of the nfs man page for details.')),
+    cfg.IntOpt('nfs_share_capacity_max_age',
+               default=600,
+               help=('Seconds the space counted on an nfs share is used to '
+                     'place new volumes before the share is counted again. '
+                     'Shares are also counted on every volume stats update '
+                     'and volumes created or deleted in between are '
+                     'accounted for. 0 counts the shares for every new '
+                     'volume.')),
 ]
 
 nas_opts = [
@@ -93,6 +102,7 @@ class RemoteFsDriver(driver.VolumeDriver):
         super(RemoteFsDriver, self).__init__(*args, **kwargs)
         self.shares = {}
         self._mounted_shares = []
+        self._share_capacity = {}
 
     def check_for_setup_error(self):
         """Just to override parent behavior."""
@@ -141,6 +151,8 @@ class RemoteFsDriver(driver.VolumeDriver):
         LOG.info(_('casted to %s') % volume['provider_location'])
 
         self._do_create_volume(volume)
+        self._account_share_capacity(volume['provider_location'],
+                                     volume['size'])
 
         return {'provider_location': volume['provider_location']}
 
@@ -197,6 +209,8 @@ class RemoteFsDriver(driver.VolumeDriver):
         mounted_path = self.local_path(volume)
 
         self._execute('rm', '-f', mounted_path, run_as_root=True)
+        self._account_share_capacity(volume['provider_location'],
+                                     -volume['size'])
 
     def ensure_export(self, ctx, volume):
         """Synchronously recreates an export for a logical volume."""
@@ -224,10 +238,21 @@ class RemoteFsDriver(driver.VolumeDriver):
                       path, run_as_root=True)
 
     def _create_regular_file(self, path, size):
-        """Creates regular file of given size. Takes a lot of time for large
-        files.
+        """Creates regular file of given size.
+
+        The space is preallocated with fallocate, file systems that do not
+        support it get the file written with zeros, which takes a lot of
+        time for large files.
         """
 
+        try:
+            self._execute('fallocate', '-l', '%sG' % size,
+                          path, run_as_root=True)
+            return
+        except putils.ProcessExecutionError as exc:
+            LOG.debug(_('fallocate of %(path)s failed, writing zeros '
+                        'instead: %(err)s'), {'path': path, 'err': exc})
+
         block_size_mb = 1
         block_count = size * units.GiB / (block_size_mb * units.MiB)
 
@@ -356,7 +381,7 @@ class RemoteFsDriver(driver.VolumeDriver):
         global_capacity = 0
         global_free = 0
         for share in self._mounted_shares:
-            capacity, free, used = self._get_capacity_info(share)
+            capacity, free, used = self._count_share_capacity(share)
             global_capacity += capacity
             global_free += free
 
@@ -384,6 +409,60 @@ class RemoteFsDriver(driver.VolumeDriver):
     def _get_capacity_info(self, nfs_share):
         raise NotImplementedError()
 
+    def _count_share_capacity(self, share):
+        """Count the space on a share and remember it for placement."""
+        total_size, total_available, total_allocated = \
+            self._get_capacity_info(share)
+        self._share_capacity[share] = {'total_size': total_size,
+                                       'total_available': total_available,
+                                       'total_allocated': total_allocated,
+                                       'counted_at': timeutils.utcnow()}
+        return total_size, total_available, total_allocated
+
+    def _get_share_capacity(self, share):
+        """Return the space on a share as last counted.
+
+        Volumes this driver created, extended or deleted on the share since
+        it was counted are included in the allocated space.  The share is
+        counted again once the count is older than the
+        <driver_prefix>_share_capacity_max_age option.
+        """
+        # NOTE: this is a ledger seeded by counting the share rather than
+        # one built from the volumes in the DB.  The count also sees files
+        # cinder did not create, but changes made by other hosts sharing
+        # the export, snapshots and clones are only seen once the share
+        # is counted again, at the latest after max_age seconds or on the
+        # next volume stats update.
+        max_age = getattr(self.configuration,
+                          self.driver_prefix + '_share_capacity_max_age')
+        capacity = self._share_capacity.get(share)
+        if (capacity is None or max_age <= 0 or
+                timeutils.is_older_than(capacity['counted_at'], max_age)):
+            return self._count_share_capacity(share)
+        return (capacity['total_size'], capacity['total_available'],
+                capacity['total_allocated'])
+
+    def _account_share_capacity(self, share, size_in_gib):
+        """Add the size of a volume to the space allocated on a share.
+
+        Volumes which are not sparse take their size from the available
+        space as well.
+
+        :param share: share the volume lives on
+        :param size_in_gib: int size in GB, negative for freed space
+        """
+        capacity = self._share_capacity.get(share)
+        if capacity is None:
+            # NOTE: the share is counted before a volume is placed on it.
+            return
+        capacity['total_allocated'] = max(
+            0, capacity['total_allocated'] + size_in_gib * units.GiB)
+        if not getattr(self.configuration,
+                       self.driver_prefix + '_sparsed_volumes'):
+            capacity['total_available'] = min(
+                capacity['total_size'],
+                max(0, capacity['total_available'] - size_in_gib * units.GiB))
+
     def _find_share(self, volume_size_in_gib):
         raise NotImplementedError()
 
@@ -463,6 +542,48 @@ class NfsDriver(RemoteFsDriver):
             else:
                 raise exc
 
+    def create_cloned_volume(self, volume, src_vref):
+        """Creates a clone of the specified volume.
+
+        The clone is placed on the share of the source volume when it is
+        eligible, so that the copy can share blocks with the source where
+        the file system supports it.
+        """
+        LOG.info(_('Cloning volume %(src)s to volume %(dst)s') %
+                 {'src': src_vref['id'], 'dst': volume['id']})
+
+        self._ensure_shares_mounted()
+
+        nfs_share = src_vref['provider_location']
+        if (nfs_share not in self._mounted_shares or
+                not self._is_share_eligible(nfs_share, volume['size'])):
+            nfs_share = self._find_share(volume['size'])
+        volume['provider_location'] = nfs_share
+
+        volume_path = self.local_path(volume)
+        self._copy_volume_file(self.local_path(src_vref), volume_path)
+        if volume['size'] > src_vref['size']:
+            image_utils.resize_image(volume_path, volume['size'])
+        self._set_rw_permissions_for_all(volume_path)
+        self._account_share_capacity(nfs_share, volume['size'])
+
+        return {'provider_location': nfs_share}
+
+    def _copy_volume_file(self, src_path, dest_path):
+        """Copies a volume file.
+
+        cp clones the file when the file system supports reflinks or
+        server side copies.  Otherwise the copy is sparse or thick,
+        following the nfs_sparsed_volumes option.
+        """
+        if getattr(self.configuration,
+                   self.driver_prefix + '_sparsed_volumes'):
+            sparse = '--sparse=always'
+        else:
+            sparse = '--sparse=never'
+        self._execute('cp', '--reflink=auto', sparse,
+                      src_path, dest_path, run_as_root=True)
+
     def _ensure_share_mounted(self, nfs_share):
         mnt_flags = []
         if self.shares.get(nfs_share) is not None:
@@ -488,7 +609,7 @@ class NfsDriver(RemoteFsDriver):
             if not self._is_share_eligible(nfs_share, volume_size_in_gib):
                 continue
             total_size, total_available, total_allocated = \
-                self._get_capacity_info(nfs_share)
+                self._get_share_capacity(nfs_share)
             if target_share is not None:
                 if target_share_reserved > total_allocated:
                     target_share = nfs_share
@@ -524,7 +645,7 @@ class NfsDriver(RemoteFsDriver):
         requested_volume_size = volume_size_in_gib * units.GiB
 
         total_size, total_available, total_allocated = \
-            self._get_capacity_info(nfs_share)
+            self._get_share_capacity(nfs_share)
         apparent_size = max(0, total_size * oversub_ratio)
         apparent_available = max(0, apparent_size - total_allocated)
         used = (total_size - total_available) / total_size
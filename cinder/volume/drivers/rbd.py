@@ -14,12 +14,15 @@
 """RADOS Block Device Driver"""
 
 from __future__ import absolute_import
+import collections
 import io
 import json
 import os
 import tempfile
+import time
 import urllib
 
+from eventlet import tpool
 from oslo.config import cfg
 
 from cinder import exception
@@ -66,7 +69,16 @@ rbd_opts = [
                default=5,
                help='maximum number of nested clones that can be taken of a '
                     'volume before enforcing a flatten prior to next clone. '
-                    'A value of zero disables cloning')]
+                    'A value of zero disables cloning'),
+    cfg.IntOpt('rbd_connection_pool_size',
+               default=4,
+               help='maximum number of idle connections to the ceph cluster '
+                    'kept open for reuse by later operations. A value of '
+                    'zero connects to the cluster for every operation'),
+    cfg.IntOpt('rbd_slow_call_warning_seconds',
+               default=60,
+               help='log a warning when a single librados or librbd call '
+                    'takes longer than this number of seconds')]
 
 CONF = cfg.CONF
 CONF.register_opts(rbd_opts)
@@ -83,6 +95,138 @@ def ascii_str(string):
     return str(string)
 
 
+class NativeCallStats(object):
+    """Call count and latency of the librados/librbd calls of a process."""
+
+    def __init__(self):
+        # call name -> [count, total seconds, max seconds]
+        self._stats = collections.defaultdict(lambda: [0, 0.0, 0.0])
+
+    def add(self, name, elapsed):
+        stats = self._stats[name]
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] = max(stats[2], elapsed)
+
+    def get(self):
+        return dict((name, {'count': count,
+                            'mean_seconds': total / count,
+                            'max_seconds': max_elapsed})
+                    for name, (count, total, max_elapsed)
+                    in self._stats.items())
+
+
+native_call_stats = NativeCallStats()
+
+
+def execute_native(func, *args, **kwargs):
+    """Run a blocking librados or librbd call in a native thread.
+
+    The python bindings of librados and librbd block the calling OS thread,
+    so calling them from a green thread stalls every other green thread of
+    the service, including its RPC handling. tpool runs them on eventlet's
+    bounded pool of native threads instead.
+    """
+    name = getattr(func, '__name__', str(func))
+    start = time.time()
+    try:
+        return tpool.execute(func, *args, **kwargs)
+    finally:
+        elapsed = time.time() - start
+        native_call_stats.add(name, elapsed)
+        if elapsed > CONF.rbd_slow_call_warning_seconds:
+            LOG.warn(_("rbd call %(name)s took %(elapsed).1f seconds") %
+                     {'name': name, 'elapsed': elapsed})
+
+
+class RADOSConnectionPool(object):
+    """Pool of connected RADOS clients shared by volume operations.
+
+    Connecting to a ceph cluster costs a round trip to the monitors, so
+    clients are kept connected once an operation is done with them and
+    handed to the next one. Every client keeps the ioctxs it opened, one
+    per RADOS pool. At most max_size idle clients are kept; a client is
+    shut down instead of kept if the operation using it failed with a
+    rados error, or if it is no longer connected when taken from the pool.
+    """
+
+    def __init__(self, rados_module, user, conf, max_size):
+        self.rados = rados_module
+        self.user = user
+        self.conf = conf
+        self.max_size = max_size
+        self._idle = collections.deque()
+        self._ioctxs = {}
+
+    def _connect(self):
+        client = self.rados.Rados(rados_id=self.user, conffile=self.conf)
+        try:
+            client.connect()
+        except self.rados.Error:
+            # shutdown cannot raise an exception
+            client.shutdown()
+            raise
+        self._ioctxs[client] = {}
+        return client
+
+    @staticmethod
+    def _is_connected(client):
+        return client.state == 'connected'
+
+    def _shutdown(self, client):
+        # closing an ioctx cannot raise an exception
+        for ioctx in self._ioctxs.pop(client, {}).values():
+            ioctx.close()
+        client.shutdown()
+
+    def get(self, pool):
+        """Return a connected client and an ioctx for the given pool."""
+        client = None
+        while self._idle:
+            client = self._idle.pop()
+            if self._is_connected(client):
+                break
+            LOG.debug(_('dropping disconnected rados client'))
+            self._shutdown(client)
+            client = None
+        if client is None:
+            client = self._connect()
+
+        ioctxs = self._ioctxs.setdefault(client, {})
+        if pool not in ioctxs:
+            try:
+                ioctxs[pool] = client.open_ioctx(pool)
+            except self.rados.Error:
+                self._shutdown(client)
+                raise
+        return client, ioctxs[pool]
+
+    def put(self, client, failed=False):
+        """Return a client taken with get() to the pool."""
+        if failed or len(self._idle) >= self.max_size:
+            self._shutdown(client)
+        else:
+            self._idle.append(client)
+
+
+_connection_pools = {}
+
+
+def get_connection_pool(rados_module, user, conf, max_size):
+    """Return the connection pool of this process for a ceph cluster."""
+    key = (rados_module, user, conf)
+    if key not in _connection_pools:
+        _connection_pools[key] = RADOSConnectionPool(rados_module, user,
+                                                     conf, max_size)
+    return _connection_pools[key]
+
+
+def _is_rados_error(rados_module, exc_type):
+    error = getattr(rados_module, 'Error', None)
+    return (exc_type is not None and isinstance(error, type) and
+            issubclass(exc_type, error))
+
+
 class RBDImageMetadata(object):
     """RBD image metadata to be used with RBDImageIOWrapper."""
     def __init__(self, image, pool, user, conf):
@@ -139,10 +283,11 @@ class RBDImageIOWrapper(io.RawIOBase):
             length = total - offset
 
         self._inc_offset(length)
-        return self._rbd_meta.image.read(int(offset), int(length))
+        return execute_native(self._rbd_meta.image.read, int(offset),
+                              int(length))
 
     def write(self, data):
-        self._rbd_meta.image.write(data, self._offset)
+        execute_native(self._rbd_meta.image.write, data, self._offset)
         self._inc_offset(len(data))
 
     def seekable(self):
@@ -208,7 +353,7 @@ class RBDVolumeProxy(object):
                                            read_only=read_only)
         except driver.rbd.Error:
             LOG.exception(_("error opening rbd image %s"), name)
-            driver._disconnect_from_rados(client, ioctx)
+            driver._disconnect_from_rados(client, ioctx, failed=True)
             raise
         self.driver = driver
         self.client = client
@@ -218,10 +363,12 @@ class RBDVolumeProxy(object):
         return self
 
     def __exit__(self, type_, value, traceback):
+        failed = _is_rados_error(self.driver.rados, type_)
         try:
             self.volume.close()
         finally:
-            self.driver._disconnect_from_rados(self.client, self.ioctx)
+            self.driver._disconnect_from_rados(self.client, self.ioctx,
+                                               failed=failed)
 
     def __getattr__(self, attrib):
         return getattr(self.volume, attrib)
@@ -237,7 +384,9 @@ class RADOSClient(object):
         return self
 
     def __exit__(self, type_, value, traceback):
-        self.driver._disconnect_from_rados(self.cluster, self.ioctx)
+        self.driver._disconnect_from_rados(
+            self.cluster, self.ioctx,
+            failed=_is_rados_error(self.driver.rados, type_))
 
 
 class RBDDriver(driver.VolumeDriver):
@@ -274,24 +423,20 @@ class RBDDriver(driver.VolumeDriver):
             args.extend(['--conf', self.configuration.rbd_ceph_conf])
         return args
 
+    def _get_connection_pool(self):
+        return get_connection_pool(
+            self.rados,
+            ascii_str(self.configuration.rbd_user),
+            ascii_str(self.configuration.rbd_ceph_conf),
+            self.configuration.rbd_connection_pool_size)
+
     def _connect_to_rados(self, pool=None):
-        ascii_user = ascii_str(self.configuration.rbd_user)
-        ascii_conf = ascii_str(self.configuration.rbd_ceph_conf)
-        client = self.rados.Rados(rados_id=ascii_user, conffile=ascii_conf)
-        try:
-            client.connect()
-            pool_to_open = str(pool or self.configuration.rbd_pool)
-            ioctx = client.open_ioctx(pool_to_open)
-            return client, ioctx
-        except self.rados.Error:
-            # shutdown cannot raise an exception
-            client.shutdown()
-            raise
+        pool_to_open = str(pool or self.configuration.rbd_pool)
+        return self._get_connection_pool().get(pool_to_open)
 
-    def _disconnect_from_rados(self, client, ioctx):
-        # closing an ioctx cannot raise an exception
-        ioctx.close()
-        client.shutdown()
+    def _disconnect_from_rados(self, client, ioctx, failed=False):
+        # the ioctx stays open with the client for the next operation
+        self._get_connection_pool().put(client, failed=failed)
 
     def _get_backup_snaps(self, rbd_image):
         """Get list of any backup snapshots that exist on this volume.
@@ -338,12 +483,13 @@ class RBDDriver(driver.VolumeDriver):
 
         try:
             with RADOSClient(self) as client:
-                new_stats = client.cluster.get_cluster_stats()
+                new_stats = execute_native(client.cluster.get_cluster_stats)
             stats['total_capacity_gb'] = new_stats['kb'] / units.MiB
             stats['free_capacity_gb'] = new_stats['kb_avail'] / units.MiB
         except self.rados.Error:
             # just log and return unknown capacities
             LOG.exception(_('error refreshing volume stats'))
+        LOG.debug(_('rbd call latencies: %s'), native_call_stats.get())
         self._stats = stats
 
     def get_volume_stats(self, refresh=False):
@@ -397,7 +543,7 @@ class RBDDriver(driver.VolumeDriver):
         # Do full copy if requested
         if CONF.rbd_max_clone_depth <= 0:
             with RBDVolumeProxy(self, src_name, read_only=True) as vol:
-                vol.copy(vol.ioctx, dest_name)
+                execute_native(vol.copy, vol.ioctx, dest_name)
 
             return
 
@@ -421,7 +567,7 @@ class RBDDriver(driver.VolumeDriver):
                                                               src_name)
                     # Flatten source volume
                     LOG.debug(_("flattening source volume %s") % (src_name))
-                    src_volume.flatten()
+                    execute_native(src_volume.flatten)
                     # Delete parent clone snap
                     parent_volume = self.rbd.Image(client.ioctx, parent)
                     try:
@@ -446,9 +592,9 @@ class RBDDriver(driver.VolumeDriver):
                             "'%(dest)s'") %
                           {'src_vol': src_name, 'src_snap': clone_snap,
                            'dest': dest_name})
-                self.rbd.RBD().clone(client.ioctx, src_name, clone_snap,
-                                     client.ioctx, dest_name,
-                                     features=self.rbd.RBD_FEATURE_LAYERING)
+                execute_native(self.rbd.RBD().clone, client.ioctx, src_name,
+                               clone_snap, client.ioctx, dest_name,
+                               features=self.rbd.RBD_FEATURE_LAYERING)
             except Exception as exc:
                 src_volume.unprotect_snap(clone_snap)
                 src_volume.remove_snap(clone_snap)
@@ -484,7 +630,7 @@ class RBDDriver(driver.VolumeDriver):
         LOG.debug(_('flattening %(pool)s/%(img)s') %
                   dict(pool=pool, img=volume_name))
         with RBDVolumeProxy(self, volume_name, pool) as vol:
-            vol.flatten()
+            execute_native(vol.flatten)
 
     def _clone(self, volume, src_pool, src_image, src_snap):
         LOG.debug(_('cloning %(pool)s/%(img)s@%(snap)s to %(dst)s') %
@@ -492,12 +638,13 @@ class RBDDriver(driver.VolumeDriver):
                        dst=volume['name']))
         with RADOSClient(self, src_pool) as src_client:
             with RADOSClient(self) as dest_client:
-                self.rbd.RBD().clone(src_client.ioctx,
-                                     str(src_image),
-                                     str(src_snap),
-                                     dest_client.ioctx,
-                                     str(volume['name']),
-                                     features=self.rbd.RBD_FEATURE_LAYERING)
+                execute_native(self.rbd.RBD().clone,
+                               src_client.ioctx,
+                               str(src_image),
+                               str(src_snap),
+                               dest_client.ioctx,
+                               str(volume['name']),
+                               features=self.rbd.RBD_FEATURE_LAYERING)
 
     def _resize(self, volume, **kwargs):
         size = kwargs.get('size', None)
@@ -505,7 +652,7 @@ class RBDDriver(driver.VolumeDriver):
             size = int(volume['size']) * units.GiB
 
         with RBDVolumeProxy(self, volume['name']) as vol:
-            vol.resize(size)
+            execute_native(vol.resize, size)
 
     def create_volume_from_snapshot(self, volume, snapshot):
         """Creates a volume from a snapshot."""
@@ -577,7 +724,7 @@ class RBDDriver(driver.VolumeDriver):
         # keep walking up the chain if it is itself a clone.
         if (not parent_has_snaps) and parent_name.endswith('.deleted'):
             LOG.debug(_("deleting parent %s") % (parent_name))
-            self.rbd.RBD().remove(client.ioctx, parent_name)
+            execute_native(self.rbd.RBD().remove, client.ioctx, parent_name)
 
             # Now move up to grandparent if there is one
             if g_parent:
@@ -624,7 +771,8 @@ class RBDDriver(driver.VolumeDriver):
             if clone_snap is None:
                 LOG.debug(_("deleting rbd volume %s") % (volume_name))
                 try:
-                    self.rbd.RBD().remove(client.ioctx, volume_name)
+                    execute_native(self.rbd.RBD().remove, client.ioctx,
+                                   volume_name)
                 except self.rbd.ImageBusy:
                     msg = (_("ImageBusy error raised while deleting rbd "
                              "volume. This may have been caused by a "
@@ -44,6 +44,7 @@ from oslo import messaging
 from cinder import compute
 from cinder import context
 from cinder import exception
+from cinder.image import cache as image_cache
 from cinder.image import glance
 from cinder import manager
 from cinder.openstack.common import excutils
@@ -79,8 +80,14 @@ volume_manager_opts = [
                     'when performing volume migration (seconds)'),
     cfg.BoolOpt('volume_service_inithost_offload',
                 default=False,
-                help='Offload pending volume delete during '
-                     'volume service startup'),
+                help='Offload the recovery of volumes during volume service '
+                     'startup, i.e. re-exports, cleanup of downloads and '
+                     'pending deletes, so that the service handles '
+                     'requests while it runs'),
+    cfg.IntOpt('volume_service_inithost_workers',
+               default=1,
+               help='The number of volumes recovered concurrently during '
+                    'volume service startup'),
     cfg.StrOpt('zoning_mode',
                default='none',
                help='FC Zoning mode configured'),
@@ -253,59 +260,99 @@ class VolumeManager(manager.SchedulerDependentManager):
         volumes = self.db.volume_get_all_by_host(ctxt, self.host)
         LOG.debug(_("Re-exporting %s volumes"), len(volumes))
 
-        try:
-            sum = 0
-            self.stats.update({'allocated_capacity_gb': sum})
-            for volume in volumes:
-                if volume['status'] in ['in-use']:
-                    # calculate allocated capacity for driver
-                    sum += volume['size']
-                    self.stats['allocated_capacity_gb'] = sum
-                    try:
-                        self.driver.ensure_export(ctxt, volume)
-                    except Exception as export_ex:
-                        LOG.error(_("Failed to re-export volume %s: "
-                                    "setting to error state"), volume['id'])
-                        LOG.exception(export_ex)
-                        self.db.volume_update(ctxt,
-                                              volume['id'],
-                                              {'status': 'error'})
-                elif volume['status'] == 'downloading':
-                    LOG.info(_("volume %s stuck in a downloading state"),
-                             volume['id'])
-                    self.driver.clear_download(ctxt, volume)
-                    self.db.volume_update(ctxt,
-                                          volume['id'],
-                                          {'status': 'error'})
-                else:
-                    LOG.info(_("volume %s: skipping export"), volume['id'])
-        except Exception as ex:
+        # calculate allocated capacity for driver
+        self.stats['allocated_capacity_gb'] = sum(
+            volume['size'] for volume in volumes
+            if volume['status'] in ['in-use'])
+
+        if CONF.volume_service_inithost_offload:
+            # Recover the volumes in the background to prevent the main
+            # volume service thread from being blocked.
+            self.driver.set_initialized()
+            self._add_to_threadpool(self._recover_volumes, ctxt, volumes)
+        elif not self._recover_volumes(ctxt, volumes):
+            return
+
+        # collect and publish service capabilities
+        self.publish_service_capabilities(ctxt)
+
+    def _recover_volumes(self, ctxt, volumes):
+        """Re-export, clean up and resume deleting the volumes of this host.
+
+        :returns: False if the re-exporting phase failed, in which case the
+                  driver is not marked as initialized.
+        """
+        if not self._run_for_volumes(
+                self._recover_export, ctxt, volumes,
+                _('Recovered %(done)d of %(total)d volumes')):
             LOG.error(_("Error encountered during "
                         "re-exporting phase of driver initialization: "
                         " %(name)s") %
                       {'name': self.driver.__class__.__name__})
-            LOG.exception(ex)
-            return
+            return False
 
         # at this point the driver is considered initialized.
         self.driver.set_initialized()
 
         LOG.debug(_('Resuming any in progress delete operations'))
-        for volume in volumes:
-            if volume['status'] == 'deleting':
-                LOG.info(_('Resuming delete on volume: %s') % volume['id'])
-                if CONF.volume_service_inithost_offload:
-                    # Offload all the pending volume delete operations to the
-                    # threadpool to prevent the main volume service thread
-                    # from being blocked.
-                    self._add_to_threadpool(self.delete_volume(ctxt,
-                                                               volume['id']))
-                else:
-                    # By default, delete volumes sequentially
-                    self.delete_volume(ctxt, volume['id'])
+        deleting = [volume for volume in volumes
+                    if volume['status'] == 'deleting']
+        self._run_for_volumes(
+            self._resume_delete, ctxt, deleting,
+            _('Resumed deleting %(done)d of %(total)d volumes'))
+        return True
 
-        # collect and publish service capabilities
-        self.publish_service_capabilities(ctxt)
+    def _recover_export(self, ctxt, volume):
+        if volume['status'] in ['in-use']:
+            try:
+                self.driver.ensure_export(ctxt, volume)
+            except Exception as export_ex:
+                LOG.error(_("Failed to re-export volume %s: "
+                            "setting to error state"), volume['id'])
+                LOG.exception(export_ex)
+                self.db.volume_update(ctxt,
+                                      volume['id'],
+                                      {'status': 'error'})
+        elif volume['status'] == 'downloading':
+            LOG.info(_("volume %s stuck in a downloading state"),
+                     volume['id'])
+            self.driver.clear_download(ctxt, volume)
+            self.db.volume_update(ctxt,
+                                  volume['id'],
+                                  {'status': 'error'})
+        else:
+            LOG.info(_("volume %s: skipping export"), volume['id'])
+
+    def _resume_delete(self, ctxt, volume):
+        LOG.info(_('Resuming delete on volume: %s') % volume['id'])
+        self.delete_volume(ctxt, volume['id'])
+
+    def _run_for_volumes(self, func, ctxt, volumes, progress_msg):
+        """Call func for every volume, volume_service_inithost_workers at a
+        time, and log the progress with progress_msg.
+
+        :returns: False if func raised an exception for any volume
+        """
+        pool = GreenPool(max(1, CONF.volume_service_inithost_workers))
+        progress = {'done': 0, 'failed': 0}
+        total = len(volumes)
+        report_every = max(1, total / 10)
+
+        def run(volume):
+            try:
+                func(ctxt, volume)
+            except Exception as ex:
+                progress['failed'] += 1
+                LOG.exception(ex)
+            progress['done'] += 1
+            if not progress['done'] % report_every:
+                LOG.info(progress_msg % {'done': progress['done'],
+                                         'total': total})
+
+        for volume in volumes:
+            pool.spawn_n(run, volume)
+        pool.waitall()
+        return not progress['failed']
 
     def create_volume(self, context, volume_id, request_spec=None,
                       filter_properties=None, allow_reschedule=True,
@@ -1095,6 +1142,9 @@ class VolumeManager(manager.SchedulerDependentManager):
             if volume_stats:
                 # Append volume stats with 'allocated_capacity_gb'
                 volume_stats.update(self.stats)
+                cache = image_cache.get_cache()
+                if cache:
+                    volume_stats['image_cache'] = cache.get_stats()
                 # queue it to be sent to the Schedulers.
                 self.update_service_capabilities(volume_stats)
 
@@ -15,8 +15,18 @@
 """Volume-related Utilities and helpers."""
 
 
+import contextlib
+import errno
+import fcntl
+import io
 import math
+import mmap
+import os
+import stat
+import time
 
+from eventlet import greenthread
+from eventlet import tpool
 from oslo.config import cfg
 
 from cinder.brick.local_dev import lvm as brick_lvm
@@ -128,7 +138,22 @@ def _calculate_count(size_in_m, blocksize):
 
 
 def copy_volume(srcstr, deststr, size_in_m, blocksize, sync=False,
-                execute=utils.execute, ionice=None):
+                execute=utils.execute, ionice=None, sparse=False,
+                bps_limit=None):
+    """Copy size_in_m MiB from srcstr to deststr.
+
+    :param sparse: the destination is known to read back as zeros, e.g. a
+                   freshly created thin volume, so zero blocks of the
+                   source are skipped rather than written
+    :param bps_limit: bytes per second limit of the native copy, defaults
+                      to volume_copy_bps_limit
+    """
+    # ionice only applies to a child process, so keep using dd for it
+    if CONF.volume_copy_method == 'native' and ionice is None:
+        return _copy_volume_native(srcstr, deststr, size_in_m, blocksize,
+                                   sync=sync, sparse=sparse,
+                                   bps_limit=bps_limit)
+
     # Use O_DIRECT to avoid thrashing the system buffer cache
     extra_flags = ['iflag=direct', 'oflag=direct']
 
@@ -145,6 +170,9 @@ def copy_volume(srcstr, deststr, size_in_m, blocksize, sync=False,
     if sync and not extra_flags:
         extra_flags.append('conv=fdatasync')
 
+    if sparse:
+        extra_flags.append('conv=sparse')
+
     blocksize, count = _calculate_count(size_in_m, blocksize)
 
     cmd = ['dd', 'if=%s' % srcstr, 'of=%s' % deststr,
@@ -158,8 +186,117 @@ def copy_volume(srcstr, deststr, size_in_m, blocksize, sync=False,
     execute(*cmd, run_as_root=True)
 
 
+def _open_for_copy(path, flags):
+    """Open a path for copying, using O_DIRECT where it is supported."""
+    try:
+        fd = os.open(path, flags | os.O_DIRECT)
+    except OSError as e:
+        if e.errno != errno.EINVAL:
+            raise
+        LOG.debug(_('O_DIRECT is not supported on %s'), path)
+        fd = os.open(path, flags)
+    return io.FileIO(fd, 'rb' if flags == os.O_RDONLY else 'wb')
+
+
+def _write_block(dest, buf, length):
+    """Write a block, dropping O_DIRECT for a final unaligned block."""
+    if length % 512:
+        fd = dest.fileno()
+        fcntl.fcntl(fd, fcntl.F_SETFL,
+                    fcntl.fcntl(fd, fcntl.F_GETFL) & ~os.O_DIRECT)
+    # buffer() writes from the aligned memory without copying it
+    dest.write(buffer(buf, 0, length))
+
+
+@contextlib.contextmanager
+def _owned_for_copy(path):
+    """Own the device of a volume for a copy, /dev/zero is readable."""
+    if path == '/dev/zero':
+        yield
+    else:
+        with utils.temporary_chown(path):
+            yield
+
+
+def _copy_volume_native(srcstr, deststr, size_in_m, blocksize, sync=False,
+                        sparse=False, bps_limit=None):
+    """Copy a volume in the volume service, skipping zero regions.
+
+    Blocks are read and written through an O_DIRECT aligned buffer by a
+    native thread so that the copy does not block other green threads.
+    Blocks of zeros are skipped for sparse destinations, punched out of
+    destinations that support it, and written otherwise.
+    """
+    blocksize = _calculate_count(size_in_m, blocksize)[0]
+    block_bytes = strutils.string_to_bytes('%sB' % blocksize)
+    total_bytes = size_in_m * units.MiB
+    if bps_limit is None:
+        bps_limit = CONF.volume_copy_bps_limit
+
+    # mmap memory is page aligned, which O_DIRECT requires
+    buf = mmap.mmap(-1, block_bytes)
+    copied = 0
+    skipped = 0
+    start = last_report = time.time()
+    with _owned_for_copy(srcstr):
+        with _owned_for_copy(deststr):
+            src = _open_for_copy(srcstr, os.O_RDONLY)
+            dest = _open_for_copy(deststr, os.O_WRONLY)
+            try:
+                while copied < total_bytes:
+                    length = tpool.execute(src.readinto, buf)
+                    if not length:
+                        break
+                    length = min(length, total_bytes - copied)
+                    if (utils.is_zero_data(buf[:length]) and
+                            (sparse or tpool.execute(utils.punch_hole,
+                                                     dest.fileno(),
+                                                     copied, length))):
+                        dest.seek(copied + length)
+                        skipped += length
+                    else:
+                        tpool.execute(_write_block, dest, buf, length)
+                    copied += length
+
+                    now = time.time()
+                    if bps_limit:
+                        ahead = float(copied) / bps_limit - (now - start)
+                        if ahead > 0:
+                            greenthread.sleep(ahead)
+                    if now - last_report > 60:
+                        last_report = now
+                        LOG.info(_('Copied %(copied)d of %(total)d MiB from '
+                                   '%(src)s to %(dest)s') %
+                                 {'copied': copied / units.MiB,
+                                  'total': size_in_m,
+                                  'src': srcstr, 'dest': deststr})
+
+                # A punched hole never extends a file, so grow a regular
+                # file that ends with zeros to the size that was copied.
+                dest_stat = os.fstat(dest.fileno())
+                if (stat.S_ISREG(dest_stat.st_mode) and
+                        dest_stat.st_size < copied):
+                    os.ftruncate(dest.fileno(), copied)
+                if sync:
+                    tpool.execute(os.fsync, dest.fileno())
+            finally:
+                src.close()
+                dest.close()
+                buf.close()
+
+    duration = max(time.time() - start, 0.001)
+    LOG.info(_('Copied %(copied)d MiB from %(src)s to %(dest)s in '
+               '%(duration).1f seconds (%(rate).1f MiB/s), %(skipped)d MiB '
+               'of zeros were not written') %
+             {'copied': copied / units.MiB, 'src': srcstr, 'dest': deststr,
+              'duration': duration,
+              'rate': copied / units.MiB / duration,
+              'skipped': skipped / units.MiB})
+
+
 def clear_volume(volume_size, volume_path, volume_clear=None,
-                 volume_clear_size=None, volume_clear_ionice=None):
+                 volume_clear_size=None, volume_clear_ionice=None,
+                 bps_limit=None):
     """Unprovision old volumes to prevent data leaking between users."""
     if volume_clear is None:
         volume_clear = CONF.volume_clear
@@ -179,7 +316,7 @@ def clear_volume(volume_size, volume_path, volume_clear=None,
         return copy_volume('/dev/zero', volume_path, volume_clear_size,
                            CONF.volume_dd_blocksize,
                            sync=True, execute=utils.execute,
-                           ionice=volume_clear_ionice)
+                           ionice=volume_clear_ionice, bps_limit=bps_limit)
     elif volume_clear == 'shred':
         clear_cmd = ['shred', '-n3']
         if volume_clear_size:
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure quota reservation contention within a single project.
+
+Every worker thread reserves and rolls back quota for the same project,
+the way concurrent volume creates of one tenant do.  Run it against the
+database of a test deployment; the row locks it measures are not taken
+on sqlite.  The quotas of the benchmark project are made unlimited.
+
+Usage: tools/quota_benchmark.py --config-file /etc/cinder/cinder.conf
+           [--workers 1,8,32] [--requests 100] [--project bench]
+"""
+
+from __future__ import print_function
+
+import argparse
+import threading
+import time
+
+from oslo.config import cfg
+
+from cinder import context
+from cinder import db
+from cinder import exception
+from cinder import quota
+
+CONF = cfg.CONF
+QUOTAS = quota.QUOTAS
+
+
+def _unlimit(ctxt, project_id):
+    for resource in ('volumes', 'gigabytes'):
+        try:
+            db.quota_update(ctxt, project_id, resource, -1)
+        except exception.ProjectQuotaNotFound:
+            db.quota_create(ctxt, project_id, resource, -1)
+
+
+def _worker(ctxt, project_id, requests, timings, errors):
+    for i in xrange(requests):
+        start = time.time()
+        try:
+            reservations = QUOTAS.reserve(ctxt, project_id=project_id,
+                                          volumes=1, gigabytes=1)
+            QUOTAS.rollback(ctxt, reservations, project_id=project_id)
+        except Exception as e:
+            errors.append(e.__class__.__name__)
+            continue
+        timings.append(time.time() - start)
+
+
+def run(ctxt, project_id, workers, requests):
+    timings = []
+    errors = []
+    threads = [threading.Thread(target=_worker,
+                                args=(ctxt, project_id, requests,
+                                      timings, errors))
+               for i in xrange(workers)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+
+    if not timings:
+        print('%4d workers: all %d requests failed (%s)' %
+              (workers, len(errors), ', '.join(sorted(set(errors)))))
+        return
+    timings.sort()
+    mean = sum(timings) / len(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print('%4d workers: %8.1f req/s  mean %8.2f ms  p99 %8.2f ms  '
+          'errors %d' % (workers, len(timings) / elapsed, mean * 1000,
+                         p99 * 1000, len(errors)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--config-file', required=True,
+                        help='cinder configuration file of the deployment')
+    parser.add_argument('--workers', default='1,8,32',
+                        help='comma separated list of worker counts')
+    parser.add_argument('--requests', type=int, default=100,
+                        help='number of reservations per worker')
+    parser.add_argument('--project', default='quota-benchmark',
+                        help='project the reservations are made for')
+    args = parser.parse_args()
+
+    CONF([], project='cinder', default_config_files=[args.config_file])
+    ctxt = context.get_admin_context()
+    _unlimit(ctxt, args.project)
+    for workers in args.workers.split(','):
+        run(ctxt, args.project, int(workers), args.requests)
+
+
+if __name__ == '__main__':
+    main()
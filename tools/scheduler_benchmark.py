@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure scheduling latency over synthetic volume hosts.
+
+Each request goes through the same host manager calls as the filter
+scheduler: get_all_host_states, get_filtered_hosts and get_weighed_hosts.
+The service table is replaced by synthetic services, no database or
+message bus is needed.
+
+Usage: tools/scheduler_benchmark.py [--hosts 100,1000,5000] [--requests 200]
+"""
+
+from __future__ import print_function
+
+import argparse
+import datetime
+import random
+import time
+
+import mock
+from oslo.config import cfg
+
+from cinder.scheduler import host_manager
+
+CONF = cfg.CONF
+
+BACKENDS = 50
+ZONES = ('zone1', 'zone2', 'zone3')
+PROTOCOLS = ('iSCSI', 'FC', 'NFS', 'ceph')
+
+
+def _make_services(count):
+    now = datetime.datetime.utcnow()
+    return [dict(id=i, host='host%d' % i, topic='volume', disabled=False,
+                 availability_zone=ZONES[i % len(ZONES)], updated_at=now)
+            for i in xrange(count)]
+
+
+def _make_manager(services):
+    manager = host_manager.HostManager()
+    for i, service in enumerate(services):
+        manager.update_service_capabilities(
+            'volume', service['host'],
+            {'volume_backend_name': 'backend%d' % (i % BACKENDS),
+             'storage_protocol': PROTOCOLS[i % len(PROTOCOLS)],
+             'QoS_support': False,
+             'total_capacity_gb': 10240,
+             'free_capacity_gb': random.randint(0, 10240),
+             'allocated_capacity_gb': 0,
+             'reserved_percentage': 0})
+    return manager
+
+
+def _make_request():
+    backend = 'backend%d' % random.randrange(BACKENDS)
+    volume_properties = {'size': 1,
+                         'availability_zone': random.choice(ZONES)}
+    volume_type = {'extra_specs': {'volume_backend_name': backend}}
+    request_spec = {'volume_properties': volume_properties,
+                    'resource_properties': volume_properties,
+                    'volume_type': volume_type}
+    return {'request_spec': request_spec,
+            'resource_type': volume_type,
+            'volume_type': volume_type,
+            'size': 1,
+            'availability_zone': volume_properties['availability_zone'],
+            'config_options': {}}
+
+
+def run(host_count, requests):
+    services = _make_services(host_count)
+    with mock.patch('cinder.db.service_get_all_by_topic',
+                    return_value=services):
+        with mock.patch('cinder.utils.service_is_up', return_value=True):
+            manager = _make_manager(services)
+            # The first request builds the host state table.
+            manager.get_all_host_states(None)
+
+            timings = []
+            for i in xrange(requests):
+                filter_properties = _make_request()
+                start = time.time()
+                hosts = manager.get_all_host_states(None)
+                hosts = manager.get_filtered_hosts(hosts, filter_properties)
+                if hosts:
+                    manager.get_weighed_hosts(hosts, filter_properties)
+                timings.append(time.time() - start)
+
+    timings.sort()
+    mean = sum(timings) / len(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print('%6d hosts: mean %8.2f ms  p99 %8.2f ms' %
+          (host_count, mean * 1000, p99 * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hosts', default='100,1000,5000',
+                        help='comma separated list of host counts')
+    parser.add_argument('--requests', type=int, default=200,
+                        help='number of requests per host count')
+    args = parser.parse_args()
+
+    CONF([], project='cinder')
+    for host_count in args.hosts.split(','):
+        run(int(host_count), args.requests)
+
+
+if __name__ == '__main__':
+    main()